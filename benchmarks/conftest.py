@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+import pytest
+from capitaliq_xpressfeed_dbmanager import PostgresDatabase, TaskManagerRepository
+
+import synthetic_data
+
+YEARS = 5
+SEED = 7
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("capitaliq benchmarks")
+    group.addoption("--bench-dsn", default=os.getenv("CAPITALIQ_BENCH_DSN"),
+                    help="libpq connection string of a Postgres server the synthetic databases are created on "
+                         "(default: $CAPITALIQ_BENCH_DSN)")
+    group.addoption("--bench-scales", default=os.getenv("CAPITALIQ_BENCH_SCALES", "100,500"),
+                    help="comma separated numbers of companies, one synthetic database each")
+    group.addoption("--bench-reload", action="store_true", help="regenerate the synthetic databases")
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = [int(s) for s in metafunc.config.getoption("--bench-scales").split(",")]
+        metafunc.parametrize("scale", scales, ids=[f"{s}co" for s in scales], scope="session")
+
+
+def _connect(dsn: str, **kwargs):
+    return psycopg2.connect(psycopg2.extensions.make_dsn(dsn, **kwargs))
+
+
+def _ensure_database(dsn: str, scale: int, reload: bool) -> dict:
+    """Create and load the synthetic database of a scale unless it already exists.
+
+    Returns:
+        dict: Generator parameters stored with the data, including its `end` date
+    """
+    dbname = f"capitaliq_bench_{scale}"
+    admin = _connect(dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (dbname,))
+        exists = cur.fetchone() is not None
+        if exists and reload:
+            cur.execute(f"DROP DATABASE {dbname}")
+            exists = False
+        if not exists:
+            cur.execute(f"CREATE DATABASE {dbname}")
+    admin.close()
+
+    conn = _connect(dsn, dbname=dbname)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('bench_meta') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("SELECT companies, years, seed, enddate FROM bench_meta")
+                companies, years, seed, end = cur.fetchone()
+                if (companies, years, seed) == (scale, YEARS, SEED):
+                    return {"companies": companies, "years": years, "seed": seed, "end": pd.Timestamp(end)}
+
+        end = pd.Timestamp.now().normalize()
+        synthetic_data.load(conn, synthetic_data.generate(n_companies=scale, years=YEARS, seed=SEED, end=end))
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS bench_meta")
+            cur.execute("CREATE TABLE bench_meta (companies int, years int, seed int, enddate date)")
+            cur.execute("INSERT INTO bench_meta VALUES (%s, %s, %s, %s)", (scale, YEARS, SEED, end.date()))
+        conn.commit()
+        return {"companies": scale, "years": YEARS, "seed": SEED, "end": end}
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def synthetic(request, scale):
+    """Parameters of the synthetic database of the current scale."""
+    dsn = request.config.getoption("--bench-dsn")
+    if not dsn:
+        pytest.skip("no benchmark database: pass --bench-dsn or set CAPITALIQ_BENCH_DSN")
+    meta = _ensure_database(dsn, scale, request.config.getoption("--bench-reload"))
+    meta["dsn"] = psycopg2.extensions.make_dsn(dsn, dbname=f"capitaliq_bench_{scale}")
+    meta["companyids"] = [int(c) for c in synthetic_data.company_ids(scale)]
+    return meta
+
+
+@pytest.fixture(scope="session")
+def make_database(synthetic):
+    """Factory for PostgresDatabase instances on the synthetic database."""
+    params = psycopg2.extensions.parse_dsn(synthetic["dsn"])
+    databases = []
+
+    def make(**kwargs):
+        database = PostgresDatabase(
+            dbname=params["dbname"],
+            user=params.get("user", os.getenv("USER", "postgres")),
+            password=params.get("password", ""),
+            host=params.get("host", "localhost"),
+            port=int(params.get("port", 5432)),
+            **kwargs,
+        )
+        databases.append(database)
+        return database
+
+    yield make
+    for database in databases:
+        database.close()
+
+
+@pytest.fixture(scope="session")
+def task_manager(make_database):
+    return TaskManagerRepository(make_database(pool=True))
@@ -0,0 +1,395 @@
+"""Synthetic XpressFeed schema and data for benchmarking TaskManagerRepository.
+
+Creates the subset of `ciq*` tables the repository touches with realistic
+relative cardinalities (one primary security and trading item per company,
+a daily price history per trading item, a handful of dividend adjustment
+intervals, quarterly financials, consensus estimates and earnings call
+transcripts) and bulk loads it with `COPY`.
+"""
+import argparse
+import io
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+SCHEMA = """
+CREATE SCHEMA IF NOT EXISTS targetskma;
+
+CREATE TABLE ciqcountrygeo (countryid int PRIMARY KEY, isocountry2 char(2), country text);
+CREATE TABLE ciqcurrency (currencyid int PRIMARY KEY, isocode char(3), currencyname text);
+CREATE TABLE ciqexchange (exchangeid int PRIMARY KEY, exchangesymbol text, exchangename text);
+CREATE TABLE ciqtradingitemstatus (tradingitemstatusid int PRIMARY KEY, tradingitemstatusname text);
+CREATE TABLE ciqcompany (companyid int PRIMARY KEY, companyname text, countryid int, companytypeid int);
+CREATE TABLE ciqsecurity (securityid int PRIMARY KEY, companyid int, securityname text, primaryflag int);
+CREATE TABLE ciqtradingitem (tradingitemid int PRIMARY KEY, securityid int, tickersymbol text, exchangeid int,
+    currencyid int, primaryflag int, tradingitemstatusid int);
+CREATE TABLE ciqexchangerate (currencyid int, pricedate date, snapid int, priceclose numeric(28, 6), latestsnapflag int);
+CREATE TABLE ciqmarketcap (companyid int, pricingdate date, marketcap numeric(28, 6), sharesoutstanding numeric(28, 2));
+CREATE TABLE miadjprice (tradingitemid int, pricedate date, priceclose numeric(28, 6), priceopen numeric(28, 6),
+    pricehigh numeric(28, 6), pricelow numeric(28, 6), volume numeric(28, 4), vwap numeric(28, 6));
+CREATE TABLE ciqpriceequitydivadjfactor (tradingitemid int, fromdate date, todate date, divadjfactor numeric(28, 10));
+CREATE TABLE ciqdataitem (dataitemid int PRIMARY KEY, dataitemname text, dataitemdescription text);
+CREATE TABLE ciqfinperiod (financialperiodid bigint PRIMARY KEY, companyid int, periodtypeid int, calendarquarter int,
+    calendaryear int, fiscalquarter int, fiscalyear int);
+CREATE TABLE ciqfininstance (financialinstanceid bigint PRIMARY KEY, financialperiodid bigint, periodenddate date,
+    filingdate date, formtype text, currencyid int);
+CREATE TABLE ciqfininstancedate (financialinstanceid bigint, instancedate date);
+CREATE TABLE ciqfininstancetocollection (financialinstanceid bigint, financialcollectionid bigint);
+CREATE TABLE ciqfincollectiondata (financialcollectionid bigint, dataitemid int, dataitemvalue numeric(28, 6));
+CREATE TABLE ciqestimateperiod (estimateperiodid bigint PRIMARY KEY, companyid int, periodtypeid int,
+    periodenddate date, fiscalyear int, fiscalquarter int);
+CREATE TABLE ciqestimateconsensus (estimateconsensusid bigint PRIMARY KEY, estimateperiodid bigint);
+CREATE TABLE ciqestimatenumericdata (estimateconsensusid bigint, dataitemid int, currencyid int,
+    dataitemvalue numeric(28, 6), effectivedate timestamp, todate timestamp, estimatescaleid int);
+
+CREATE TABLE targetskma.ciqeventtype (keydeveventtypeid int PRIMARY KEY, keydeveventtypename text);
+CREATE TABLE targetskma.ciqevent (keydevid bigint PRIMARY KEY, mostimportantdateutc timestamp, announceddateutc timestamp);
+CREATE TABLE targetskma.ciqeventtoobjecttoeventtype (keydevid bigint, objectid int, keydeveventtypeid int);
+CREATE TABLE targetskma.ciqeventcallbasicinfo (keydevid bigint, fiscalyear int, fiscalquarter int);
+CREATE TABLE targetskma.ciqtranscript (transcriptid bigint PRIMARY KEY, keydevid bigint,
+    transcriptcreationdateutc timestamp, transcriptcollectiontypeid int);
+CREATE TABLE targetskma.ciqtranscriptcomponenttype (transcriptcomponenttypeid int PRIMARY KEY,
+    transcriptcomponenttypename text);
+CREATE TABLE targetskma.ciqtranscriptspeakertype (speakertypeid int PRIMARY KEY, speakertypename text);
+CREATE TABLE targetskma.ciqprofessional (proid bigint PRIMARY KEY, title text);
+CREATE TABLE targetskma.ciqtranscriptperson (transcriptpersonid bigint PRIMARY KEY, proid bigint, speakertypeid int,
+    transcriptpersonname text);
+CREATE TABLE targetskma.ciqtranscriptcomponent (transcriptcomponentid bigint PRIMARY KEY, transcriptid bigint,
+    componentorder int, transcriptcomponenttypeid int, transcriptpersonid bigint, componenttext text);
+"""
+
+INDEXES = """
+CREATE INDEX ON ciqsecurity (companyid);
+CREATE INDEX ON ciqtradingitem (securityid);
+CREATE INDEX ON ciqtradingitem (tickersymbol);
+CREATE INDEX ON ciqexchangerate (currencyid, pricedate);
+CREATE INDEX ON ciqmarketcap (pricingdate, companyid);
+CREATE INDEX ON miadjprice (tradingitemid, pricedate);
+CREATE INDEX ON ciqpriceequitydivadjfactor (tradingitemid, fromdate);
+CREATE INDEX ON ciqfinperiod (companyid);
+CREATE INDEX ON ciqfininstance (financialperiodid);
+CREATE INDEX ON ciqfininstancedate (financialinstanceid);
+CREATE INDEX ON ciqfininstancetocollection (financialinstanceid);
+CREATE INDEX ON ciqfincollectiondata (financialcollectionid, dataitemid);
+CREATE INDEX ON ciqestimateperiod (companyid);
+CREATE INDEX ON ciqestimateconsensus (estimateperiodid);
+CREATE INDEX ON ciqestimatenumericdata (estimateconsensusid);
+CREATE INDEX ON targetskma.ciqtranscript (keydevid);
+CREATE INDEX ON targetskma.ciqeventtoobjecttoeventtype (objectid);
+CREATE INDEX ON targetskma.ciqtranscriptcomponent (transcriptid, componentorder);
+"""
+
+# dataitems referenced by the repository and data/ref/fundamental.json
+FUNDAMENTAL_DATAITEMS = {8: "Cost Of Goods Sold", 9: "Depreciation & Amort.", 10: "Gross Profit",
+                         15: "Net Income", 21: "Operating Income", 28: "Total Revenue", 1293: "Total Assets",
+                         4051: "EBITDA"}
+ESTIMATE_DATAITEMS = {100186: "Revenue Actual", 100284: "EPS Actual", 100179: "EPS Normalized Actual"}
+COUNTRIES = [(1, "US", "United States"), (2, "CA", "Canada"), (3, "GB", "United Kingdom"), (4, "DE", "Germany")]
+CURRENCIES = [(160, "USD", "US Dollar"), (22, "CAD", "Canadian Dollar"), (134, "GBP", "British Pound"),
+              (52, "EUR", "Euro")]
+
+
+def company_ids(n_companies: int) -> np.ndarray:
+    """Return the company ids `generate` uses for a universe of `n_companies`."""
+    return np.arange(1, n_companies + 1) * 37 + 20000
+
+
+def generate(n_companies: int = 500, years: int = 5, transcripts_per_company: int = 8,
+             components_per_transcript: int = 40, seed: int = 7, end: str = None) -> dict:
+    """Generate synthetic tables as DataFrames keyed by table name.
+
+    Args:
+        n_companies: Number of companies in the universe
+        years: Years of daily price, market cap and exchange rate history
+        transcripts_per_company: Earnings call transcripts per company
+        components_per_transcript: Components (paragraphs) per transcript
+        seed: Random seed
+        end: Last business day of the history (default: today)
+
+    Returns:
+        dict: table name -> DataFrame, in load order
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.now().normalize())
+    dates = pd.bdate_range(end - pd.DateOffset(years=years), end)
+    tables = {}
+
+    tables["ciqcountrygeo"] = pd.DataFrame(COUNTRIES, columns=["countryid", "isocountry2", "country"])
+    tables["ciqcurrency"] = pd.DataFrame(CURRENCIES, columns=["currencyid", "isocode", "currencyname"])
+    tables["ciqexchange"] = pd.DataFrame([(458, "NYSE", "New York Stock Exchange"), (459, "NasdaqGS", "Nasdaq"),
+                                          (9, "TSX", "Toronto Stock Exchange"), (29, "LSE", "London Stock Exchange"),
+                                          (12, "XTRA", "Xetra")],
+                                         columns=["exchangeid", "exchangesymbol", "exchangename"])
+    tables["ciqtradingitemstatus"] = pd.DataFrame(
+        [(1, "Active"), (4, "Delisted"), (5, "Expired"), (8, "Merged"), (11, "Inactive"), (15, "Active")],
+        columns=["tradingitemstatusid", "tradingitemstatusname"])
+
+    companyids = company_ids(n_companies)
+    country_idx = rng.choice(len(COUNTRIES), n_companies, p=[0.6, 0.15, 0.15, 0.1])
+    countryids = np.array([c[0] for c in COUNTRIES])[country_idx]
+    currencyids = np.array([c[0] for c in CURRENCIES])[country_idx]
+    exchangeids = np.array([458, 9, 29, 12])[country_idx]
+    exchangeids[(country_idx == 0) & (rng.random(n_companies) < 0.4)] = 459
+    tickers = [_ticker(i) for i in range(n_companies)]
+    # a few tickers are listed in two countries to exercise the ambiguity checks
+    for i in range(0, n_companies, 50):
+        if i + 1 < n_companies:
+            tickers[i + 1] = tickers[i]
+
+    tables["ciqcompany"] = pd.DataFrame({
+        "companyid": companyids,
+        "companyname": [f"Synthetic Company {i} Inc." for i in range(n_companies)],
+        "countryid": countryids,
+        "companytypeid": rng.choice([4, 5], n_companies, p=[0.8, 0.2]),
+    })
+    securityids = companyids * 10 + 1
+    tradingitemids = companyids * 10 + 2
+    tables["ciqsecurity"] = pd.DataFrame({
+        "securityid": securityids, "companyid": companyids,
+        "securityname": "Common Stock", "primaryflag": 1,
+    })
+    statuses = np.where(rng.random(n_companies) < 0.05, 4, 15)
+    tables["ciqtradingitem"] = pd.DataFrame({
+        "tradingitemid": tradingitemids, "securityid": securityids, "tickersymbol": tickers,
+        "exchangeid": exchangeids, "currencyid": currencyids, "primaryflag": 1,
+        "tradingitemstatusid": statuses,
+    })
+
+    # exchange rates: USD per unit, one snapshot per day
+    rates = []
+    for currencyid, level in zip([c[0] for c in CURRENCIES], [1.0, 1.33, 0.79, 0.92]):
+        walk = level * np.exp(np.cumsum(rng.normal(0, 0.003, len(dates))))
+        if currencyid == 160:
+            walk = np.ones(len(dates))
+        rates.append(pd.DataFrame({"currencyid": currencyid, "pricedate": dates.date, "snapid": 6,
+                                   "priceclose": walk.round(6), "latestsnapflag": 1}))
+    tables["ciqexchangerate"] = pd.concat(rates, ignore_index=True)
+
+    # prices: geometric random walk per trading item
+    n_days = len(dates)
+    start_price = rng.lognormal(3.5, 0.8, n_companies)
+    log_returns = rng.normal(0.0002, 0.02, (n_companies, n_days))
+    close = start_price[:, None] * np.exp(np.cumsum(log_returns, axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (n_companies, n_days)))
+    volume = rng.lognormal(13, 1, (n_companies, n_days)).round(0)
+    tables["miadjprice"] = pd.DataFrame({
+        "tradingitemid": np.repeat(tradingitemids, n_days),
+        "pricedate": np.tile(dates.date, n_companies),
+        "priceclose": close.ravel().round(4),
+        "priceopen": (close * (1 + rng.normal(0, 0.005, close.shape))).ravel().round(4),
+        "pricehigh": (close * (1 + spread)).ravel().round(4),
+        "pricelow": (close * (1 - spread)).ravel().round(4),
+        "volume": volume.ravel(),
+        "vwap": close.ravel().round(4),
+    })
+
+    shares = rng.lognormal(18, 1.2, n_companies)
+    tables["ciqmarketcap"] = pd.DataFrame({
+        "companyid": np.repeat(companyids, n_days),
+        "pricingdate": np.tile(dates.date, n_companies),
+        "marketcap": (close * shares[:, None] / 1e6).ravel().round(4),
+        "sharesoutstanding": np.repeat(shares.round(0), n_days),
+    })
+
+    # dividend adjustment factors: quarterly intervals, the latest one open-ended
+    factors = []
+    boundaries = pd.date_range(dates[0], dates[-1], freq="QS")
+    for tradingitemid in tradingitemids[rng.random(n_companies) < 0.7]:
+        rows = []
+        for lo, hi in zip(boundaries[:-1], boundaries[1:]):
+            rows.append((tradingitemid, lo.date(), (hi - pd.Timedelta(days=1)).date()))
+        rows.append((tradingitemid, boundaries[-1].date(), None))
+        values = np.cumprod(1 + rng.uniform(0.002, 0.01, len(rows)))[::-1]
+        values = values / values[-1]
+        factors.append(pd.DataFrame(rows, columns=["tradingitemid", "fromdate", "todate"]).assign(
+            divadjfactor=(1 / values).round(10)))
+    tables["ciqpriceequitydivadjfactor"] = pd.concat(factors, ignore_index=True)
+
+    items = {**FUNDAMENTAL_DATAITEMS, **ESTIMATE_DATAITEMS}
+    extra = {i: f"Synthetic Data Item {i}" for i in range(100, 400)}
+    tables["ciqdataitem"] = pd.DataFrame(
+        [(k, v, f"Excel Formula: IQ_{k}") for k, v in {**items, **extra}.items()],
+        columns=["dataitemid", "dataitemname", "dataitemdescription"])
+
+    tables.update(_financials(rng, companyids, currencyids, end, years))
+    tables.update(_estimates(rng, companyids, currencyids, end, years))
+    tables.update(_transcripts(rng, companyids, end, transcripts_per_company, components_per_transcript))
+    return tables
+
+
+def _ticker(i: int) -> str:
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    out = ""
+    i += 26
+    while i:
+        i, r = divmod(i, 26)
+        out = letters[r] + out
+    return out
+
+
+def _financials(rng, companyids, currencyids, end, years):
+    periods, instances, instance_dates, links, data = [], [], [], [], []
+    instanceid = collectionid = 0
+    dataitemids = np.array(list(FUNDAMENTAL_DATAITEMS))
+    for c, (companyid, currencyid) in enumerate(zip(companyids, currencyids)):
+        scale = rng.lognormal(6, 1)
+        for year in range(end.year - years, end.year + 1):
+            for periodtypeid, quarters in ((1, [4]), (2, [1, 2, 3, 4])):
+                for quarter in quarters:
+                    periodenddate = pd.Timestamp(year=year, month=quarter * 3, day=1) + pd.offsets.MonthEnd(0)
+                    filingdate = periodenddate + pd.Timedelta(days=int(rng.integers(25, 80)))
+                    if filingdate > end:
+                        continue
+                    periodid = int(companyid) * 1000 + (year % 100) * 10 + quarter + (5 if periodtypeid == 1 else 0)
+                    periods.append((periodid, companyid, periodtypeid, quarter, year, quarter, year))
+                    # the original filing and, sometimes, a later restatement
+                    n_instances = 2 if rng.random() < 0.2 else 1
+                    for k in range(n_instances):
+                        instanceid += 1
+                        collectionid += 1
+                        filed = filingdate + pd.Timedelta(days=365 * k)
+                        instances.append((instanceid, periodid, periodenddate.date(), filed.date(),
+                                          "10-K" if periodtypeid == 1 else "10-Q", currencyid))
+                        instance_dates.append((instanceid, filed.date()))
+                        links.append((instanceid, collectionid))
+                        values = scale * rng.lognormal(0, 0.3, len(dataitemids)) * (4 if periodtypeid == 1 else 1)
+                        data.extend(zip([collectionid] * len(dataitemids), dataitemids, values.round(3)))
+    return {
+        "ciqfinperiod": pd.DataFrame(periods, columns=["financialperiodid", "companyid", "periodtypeid",
+                                                       "calendarquarter", "calendaryear", "fiscalquarter",
+                                                       "fiscalyear"]),
+        "ciqfininstance": pd.DataFrame(instances, columns=["financialinstanceid", "financialperiodid",
+                                                           "periodenddate", "filingdate", "formtype", "currencyid"]),
+        "ciqfininstancedate": pd.DataFrame(instance_dates, columns=["financialinstanceid", "instancedate"]),
+        "ciqfininstancetocollection": pd.DataFrame(links, columns=["financialinstanceid", "financialcollectionid"]),
+        "ciqfincollectiondata": pd.DataFrame(data, columns=["financialcollectionid", "dataitemid", "dataitemvalue"]),
+    }
+
+
+def _estimates(rng, companyids, currencyids, end, years):
+    periods, consensus, data = [], [], []
+    periodid = 0
+    dataitemids = list(ESTIMATE_DATAITEMS)
+    for companyid, currencyid in zip(companyids, currencyids):
+        level = rng.lognormal(5, 1)
+        for periodenddate in pd.date_range(end - pd.DateOffset(years=years), end, freq="QE"):
+            periodid += 1
+            periods.append((periodid, companyid, 2, periodenddate.date(), periodenddate.year,
+                            (periodenddate.month - 1) // 3 + 1))
+            consensus.append((periodid, periodid))
+            effective = periodenddate + pd.Timedelta(days=40)
+            for dataitemid in dataitemids:
+                value = level * rng.lognormal(0, 0.2) if dataitemid == 100186 else rng.normal(1.5, 0.8)
+                # superseded history row plus the current open-ended row
+                data.append((periodid, dataitemid, currencyid, round(value * 0.97, 4), effective,
+                             effective + pd.Timedelta(days=3), 0))
+                data.append((periodid, dataitemid, currencyid, round(value, 4), effective + pd.Timedelta(days=3),
+                             pd.Timestamp("2079-06-06"), 0))
+    return {
+        "ciqestimateperiod": pd.DataFrame(periods, columns=["estimateperiodid", "companyid", "periodtypeid",
+                                                            "periodenddate", "fiscalyear", "fiscalquarter"]),
+        "ciqestimateconsensus": pd.DataFrame(consensus, columns=["estimateconsensusid", "estimateperiodid"]),
+        "ciqestimatenumericdata": pd.DataFrame(data, columns=["estimateconsensusid", "dataitemid", "currencyid",
+                                                              "dataitemvalue", "effectivedate", "todate",
+                                                              "estimatescaleid"]),
+    }
+
+
+def _transcripts(rng, companyids, end, per_company, components):
+    events, links, basic, transcripts, comps = [], [], [], [], []
+    keydevid = transcriptid = componentid = 0
+    persons = pd.DataFrame({
+        "transcriptpersonid": np.arange(1, 201),
+        "proid": np.arange(1, 201),
+        "speakertypeid": rng.choice([1, 2, 3], 200),
+        "transcriptpersonname": [f"Speaker {i}" for i in range(1, 201)],
+    })
+    words = np.array("revenue margin growth guidance quarter demand pricing costs outlook customers".split())
+    for companyid in companyids:
+        for q in range(per_company):
+            keydevid += 1
+            calldate = end - pd.Timedelta(days=91 * q + int(rng.integers(0, 20)))
+            events.append((keydevid, calldate, calldate - pd.Timedelta(days=14)))
+            links.append((keydevid, companyid, 48))
+            basic.append((keydevid, calldate.year, (calldate.month - 1) // 3 + 1))
+            # edited copy of the call published a day later for some events
+            for version in range(2 if rng.random() < 0.3 else 1):
+                transcriptid += 1
+                transcripts.append((transcriptid, keydevid, calldate + pd.Timedelta(hours=6 + 24 * version),
+                                    8 if version else 1))
+                for order in range(1, components + 1):
+                    componentid += 1
+                    text = " ".join(rng.choice(words, int(rng.integers(20, 120))))
+                    comps.append((componentid, transcriptid, order, int(rng.integers(1, 5)),
+                                  int(rng.integers(1, 201)), text))
+    return {
+        "targetskma.ciqeventtype": pd.DataFrame([(48, "Earnings Calls"), (55, "Guidance")],
+                                                columns=["keydeveventtypeid", "keydeveventtypename"]),
+        "targetskma.ciqevent": pd.DataFrame(events, columns=["keydevid", "mostimportantdateutc", "announceddateutc"]),
+        "targetskma.ciqeventtoobjecttoeventtype": pd.DataFrame(links, columns=["keydevid", "objectid",
+                                                                               "keydeveventtypeid"]),
+        "targetskma.ciqeventcallbasicinfo": pd.DataFrame(basic, columns=["keydevid", "fiscalyear", "fiscalquarter"]),
+        "targetskma.ciqtranscript": pd.DataFrame(transcripts, columns=["transcriptid", "keydevid",
+                                                                       "transcriptcreationdateutc",
+                                                                       "transcriptcollectiontypeid"]),
+        "targetskma.ciqtranscriptcomponenttype": pd.DataFrame(
+            [(1, "Presenter Speech"), (2, "Question"), (3, "Answer"), (4, "Operator Message")],
+            columns=["transcriptcomponenttypeid", "transcriptcomponenttypename"]),
+        "targetskma.ciqtranscriptspeakertype": pd.DataFrame([(1, "Executives"), (2, "Analysts"), (3, "Operator")],
+                                                            columns=["speakertypeid", "speakertypename"]),
+        "targetskma.ciqprofessional": pd.DataFrame({"proid": np.arange(1, 201), "title": "Chief Financial Officer"}),
+        "targetskma.ciqtranscriptperson": persons,
+        "targetskma.ciqtranscriptcomponent": pd.DataFrame(comps, columns=["transcriptcomponentid", "transcriptid",
+                                                                          "componentorder",
+                                                                          "transcriptcomponenttypeid",
+                                                                          "transcriptpersonid", "componenttext"]),
+    }
+
+
+def load(conn, tables: dict, drop: bool = True):
+    """Create the synthetic schema and bulk load the generated tables.
+
+    Args:
+        conn: psycopg2 connection to the target database
+        tables: Output of `generate`
+        drop: Drop existing synthetic tables first
+    """
+    with conn.cursor() as cur:
+        if drop:
+            for name in tables:
+                cur.execute(f"DROP TABLE IF EXISTS {name} CASCADE")
+        cur.execute(SCHEMA)
+        for name, df in tables.items():
+            buf = io.StringIO()
+            df.to_csv(buf, index=False, header=False, na_rep="\\N")
+            buf.seek(0)
+            cur.copy_expert(f"COPY {name} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
+        cur.execute(INDEXES)
+    conn.commit()
+    with conn.cursor() as cur:
+        old_isolation = conn.isolation_level
+        conn.set_isolation_level(0)
+        cur.execute("ANALYZE")
+        conn.set_isolation_level(old_isolation)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="libpq connection string of the target database")
+    parser.add_argument("--companies", type=int, default=500)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--end", default=None, help="last business day of the history (default: today)")
+    args = parser.parse_args()
+
+    tables = generate(n_companies=args.companies, years=args.years, seed=args.seed, end=args.end)
+    with psycopg2.connect(args.dsn) as conn:
+        load(conn, tables)
+    conn.close()
+    for name, df in tables.items():
+        print(f"{name}: {len(df)} rows")
+
+
+if __name__ == "__main__":
+    main()
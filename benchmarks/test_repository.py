@@ -0,0 +1,110 @@
+"""Benchmarks of TaskManagerRepository methods on the synthetic database.
+
+Every scenario runs once per scale in --bench-scales. The number of result
+rows is stored in `extra_info`, so saved runs also record throughput.
+"""
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+
+import synthetic_data
+
+ROUNDS = 5
+FUNDAMENTAL_DATAITEMS = list(synthetic_data.FUNDAMENTAL_DATAITEMS)
+ESTIMATE_DATAITEMS = list(synthetic_data.ESTIMATE_DATAITEMS)
+
+
+def run(benchmark, func, *args, **kwargs):
+    result = benchmark.pedantic(func, args=args, kwargs=kwargs, rounds=ROUNDS, warmup_rounds=1)
+    benchmark.extra_info["rows"] = result if isinstance(result, int) else len(result)
+    return result
+
+
+def month_ends(end: pd.Timestamp, months: int) -> list:
+    return [d.strftime("%Y-%m-%d") for d in pd.date_range(end=end, periods=months, freq="BME")]
+
+
+def test_connection_query(benchmark, task_manager):
+    run(benchmark, task_manager.test_connection_query)
+
+
+def test_get_metadata_info(benchmark, task_manager):
+    ticker = task_manager.database.query_all("""
+        select min(t.tickersymbol) as ticker from ciqtradingitem t
+        join ciqsecurity s on t.securityid = s.securityid
+        join ciqcompany c on s.companyid = c.companyid
+        where c.countryid = 1 and t.tradingitemstatusid = 15
+        """)["ticker"].iloc[0]
+    run(benchmark, task_manager.get_metadata_info, ticker, "US")
+
+
+def test_get_dataitem_info(benchmark, task_manager):
+    run(benchmark, task_manager.get_dataitem_info, all=True)
+
+
+def test_query_global_market_cap(benchmark, task_manager, synthetic):
+    asofdate = month_ends(synthetic["end"], 2)[0]
+    run(benchmark, task_manager.query_global_market_cap, asofdate, 100, "US")
+
+
+def test_query_market_cap_universe(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.query_market_cap_universe, month_ends(synthetic["end"], 24), 100)
+
+
+def test_get_past_price(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.get_past_price, synthetic["companyids"][0])
+
+
+@pytest.mark.parametrize("backend", ["pandas", "arrow", "copy"])
+def test_get_past_prices(benchmark, make_database, synthetic, backend):
+    """Fetch and convert throughput of the result backends on the largest bulk query."""
+    if backend == "copy":
+        task_manager = TaskManagerRepository(make_database(), copy_threshold=0)
+    else:
+        task_manager = TaskManagerRepository(make_database(result_backend=backend))
+    run(benchmark, task_manager.get_past_prices, synthetic["companyids"], 1)
+
+
+@pytest.mark.parametrize("method", ["get_past_prices", "get_adjusted_prices"])
+def test_dividend_adjustment(benchmark, task_manager, synthetic, method):
+    """Server-side factor join (get_past_prices) against client-side factor lookup (get_adjusted_prices)."""
+    run(benchmark, getattr(task_manager, method), synthetic["companyids"], 5)
+
+
+def test_get_historical_fundamental(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.get_historical_fundamental, synthetic["companyids"], FUNDAMENTAL_DATAITEMS,
+        startyear=synthetic["end"].year - 3)
+
+
+def test_get_key_fundamentals(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.get_key_fundamentals, synthetic["companyids"], ESTIMATE_DATAITEMS, 3)
+
+
+def test_get_point_in_time_fundamentals(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.get_point_in_time_fundamentals, synthetic["companyids"], FUNDAMENTAL_DATAITEMS,
+        month_ends(synthetic["end"], 24))
+
+
+def test_get_estimates_panel(benchmark, task_manager, synthetic):
+    startdate = (synthetic["end"] - pd.DateOffset(years=3)).strftime("%Y-%m-%d")
+    run(benchmark, task_manager.get_estimates_panel, synthetic["companyids"], ESTIMATE_DATAITEMS, startdate)
+
+
+def test_get_companies_transcriptsid(benchmark, task_manager, synthetic):
+    since = (synthetic["end"] - pd.DateOffset(years=1)).strftime("%Y-%m-%d")
+    run(benchmark, task_manager.get_companies_transcriptsid, synthetic["companyids"], since)
+
+
+def test_get_latest_transcriptid(benchmark, task_manager, synthetic):
+    run(benchmark, task_manager.get_latest_transcriptid, synthetic["companyids"])
+
+
+def test_get_transcript(benchmark, task_manager):
+    run(benchmark, task_manager.get_transcript, list(range(1, 51)))
+
+
+def test_iter_transcripts(benchmark, task_manager):
+    def consume(ids):
+        return sum(len(df) for df in task_manager.iter_transcripts(ids))
+
+    run(benchmark, consume, list(range(1, 201)))
@@ -1,5 +1,20 @@
 # import the PostgresDatabase class
 from .postgres_database import PostgresDatabase
 from .db_task_manager import TaskManagerRepository
+from .connection_pool import ConnectionPool, PoolTimeout
+from .async_postgres_database import AsyncPostgresDatabase
+from .async_task_manager import AsyncTaskManagerRepository
+from .parallel_task_manager import ParallelTaskManager, TaskResult
+from .query_cache import CachedDatabase
+from .security_index import SecurityIndex
+from .transcript_sync import TranscriptSync
+from .parquet_mirror import MirrorDatabase, ParquetMirror
+from .resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .replica_set import ReplicaSetDatabase
+from .metrics import InMemorySink, JsonLogSink, Metrics, PrometheusTextfileSink, get_metrics
 
-__all__ = ['PostgresDatabase', 'TaskManagerRepository']
+__all__ = ['PostgresDatabase', 'TaskManagerRepository', 'ConnectionPool', 'PoolTimeout',
+           'AsyncPostgresDatabase', 'AsyncTaskManagerRepository', 'ParallelTaskManager', 'TaskResult',
+           'CachedDatabase', 'SecurityIndex', 'TranscriptSync', 'MirrorDatabase', 'ParquetMirror',
+           'Metrics', 'get_metrics', 'InMemorySink', 'PrometheusTextfileSink', 'JsonLogSink',
+           'RetryPolicy', 'CircuitBreaker', 'CircuitOpenError', 'ReplicaSetDatabase']
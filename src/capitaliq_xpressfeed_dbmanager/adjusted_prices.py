@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# days since epoch fit in 20 bits until the year 4840, trading item ids in the remaining 43
+_DAY_BITS = 20
+
+
+def _day_numbers(dates) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def _group_starts(ids: np.ndarray) -> np.ndarray:
+    """Boolean mask of the first row of each run of equal ids."""
+    starts = np.ones(len(ids), dtype=bool)
+    starts[1:] = ids[1:] != ids[:-1]
+    return starts
+
+
+def lookup_div_adj_factors(prices: pd.DataFrame, factors: pd.DataFrame) -> np.ndarray:
+    """Find the dividend adjustment factor of every price row with one `searchsorted`.
+
+    A factor applies from `fromdate` to `todate` (inclusive, open-ended if
+    NULL) of its trading item. Rows without a factor get 1.
+
+    Args:
+        prices: Rows with tradingitemid and pricedate
+        factors: Rows of ciqPriceEquityDivAdjFactor (tradingitemid, fromdate, todate, divadjfactor)
+
+    Returns:
+        np.ndarray: Factor per price row, float64
+    """
+    if prices.empty or factors.empty:
+        return np.ones(len(prices))
+    factors = factors.sort_values(["tradingitemid", "fromdate"], kind="stable")
+    factor_items = factors["tradingitemid"].to_numpy(dtype=np.int64)
+    factor_keys = (factor_items << _DAY_BITS) + _day_numbers(factors["fromdate"])
+    todate = pd.to_datetime(factors["todate"])
+    factor_ends = np.where(todate.isna(), np.iinfo(np.int64).max, _day_numbers(todate.fillna(pd.Timestamp(0))))
+
+    price_items = prices["tradingitemid"].to_numpy(dtype=np.int64)
+    price_days = _day_numbers(prices["pricedate"])
+    # last interval starting on or before the price date
+    index = np.searchsorted(factor_keys, (price_items << _DAY_BITS) + price_days, side="right") - 1
+    safe = np.clip(index, 0, None)
+    found = (index >= 0) & (factor_items[safe] == price_items) & (factor_ends[safe] >= price_days)
+    values = factors["divadjfactor"].to_numpy(dtype=np.float64)
+    return np.where(found, values[safe], 1.0)
+
+
+def adjusted_returns(prices: pd.DataFrame, factors: pd.DataFrame) -> pd.DataFrame:
+    """Add dividend-adjusted closes, daily log returns and total-return indices to raw prices.
+
+    Args:
+        prices: Raw prices with tradingitemid, pricedate and priceclose, for any number of trading items
+        factors: Dividend adjustment factor intervals of those trading items
+
+    Returns:
+        pd.DataFrame: `prices` sorted by (tradingitemid, pricedate) with divadjfactor,
+            divadjclose, logreturn (NaN on each item's first day) and totalreturn
+            (1.0 on each item's first day)
+    """
+    df = prices.sort_values(["tradingitemid", "pricedate"], kind="stable").reset_index(drop=True)
+    factor = lookup_div_adj_factors(df, factors)
+    adjusted = df["priceclose"].to_numpy(dtype=np.float64) * factor
+
+    starts = _group_starts(df["tradingitemid"].to_numpy())
+    log_close = np.log(adjusted)
+    log_return = np.empty_like(log_close)
+    log_return[1:] = log_close[1:] - log_close[:-1]
+    log_return[starts] = np.nan
+    # index of each row's first row in its trading item
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(df)), 0))
+    total_return = adjusted / adjusted[first] if len(df) else adjusted
+
+    return df.assign(divadjfactor=factor, divadjclose=adjusted, logreturn=log_return, totalreturn=total_return)
@@ -0,0 +1,154 @@
+import json
+from typing import Iterator, List
+
+import pandas as pd
+import psycopg2.extensions
+
+from .pg_types import ARRAY_ELEMENT_OIDS, column_kind
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+# NUMERIC values are parsed straight into floats instead of decimal.Decimal
+NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "NUMERIC_AS_FLOAT",
+    lambda value, cur: float(value) if value is not None else None,
+)
+
+
+def require_pyarrow():
+    """Raise a helpful error if pyarrow is not installed."""
+    if pa is None:
+        raise ImportError("The arrow result backend requires pyarrow: pip install 'capitaliq-xpressfeed-dbmanager[arrow]'")
+
+
+def arrow_type(type_code: int) -> "pa.DataType":
+    """Return the Arrow type of a column with PostgreSQL type OID `type_code`.
+
+    Arrays become Arrow lists; json and all other types are kept as strings.
+    """
+    require_pyarrow()
+    kind = column_kind(type_code)
+    if kind == "array":
+        return pa.list_(arrow_type(ARRAY_ELEMENT_OIDS[type_code]))
+    types = {
+        "bool": pa.bool_(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+        "text": pa.string(),
+        "json": pa.string(),
+        "other": pa.string(),
+    }
+    return types[kind]
+
+
+def arrow_schema(description) -> "pa.Schema":
+    """Build an Arrow schema from a psycopg2 cursor description.
+
+    json and jsonb columns are tagged with the field metadata `pg_type: json`.
+
+    Args:
+        description: `cursor.description` of an executed query
+
+    Returns:
+        pa.Schema: Schema with native Arrow types for each column
+    """
+    require_pyarrow()
+    fields = []
+    for desc in description:
+        metadata = {"pg_type": "json"} if column_kind(desc[1]) == "json" else None
+        fields.append(pa.field(desc[0], arrow_type(desc[1]), metadata=metadata))
+    return pa.schema(fields)
+
+
+def _to_arrow_value(value, field: "pa.Field"):
+    if value is None:
+        return None
+    if field.metadata and field.metadata.get(b"pg_type") == b"json":
+        # psycopg2 parses json into Python objects; store them as JSON text
+        return json.dumps(value)
+    if pa.types.is_list(field.type):
+        if pa.types.is_floating(field.type.value_type):
+            # numeric arrays are parsed into decimal.Decimal elements
+            return [None if v is None else float(v) for v in value]
+        return value
+    if pa.types.is_string(field.type) and not isinstance(value, str):
+        # intervals, uuids and other types are kept in their text form
+        return str(value)
+    return value
+
+
+def rows_to_batch(rows: List[tuple], schema: "pa.Schema") -> "pa.RecordBatch":
+    """Convert fetched rows into a record batch following `schema`.
+
+    Args:
+        rows: Rows returned by `fetchmany`/`fetchall`
+        schema: Target schema from `arrow_schema`
+
+    Returns:
+        pa.RecordBatch: Columnar batch
+    """
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_string(field.type) or pa.types.is_list(field.type):
+            values = [_to_arrow_value(v, field) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_batches(cur, chunksize: int) -> Iterator["pa.RecordBatch"]:
+    """Fetch an executed cursor in record batches of `chunksize` rows.
+
+    Args:
+        cur: Cursor on which the query has been executed
+        chunksize: Rows per batch
+
+    Yields:
+        pa.RecordBatch: Consecutive batches; none if the result is empty
+    """
+    schema = None
+    while True:
+        rows = cur.fetchmany(chunksize)
+        if schema is None:
+            schema = arrow_schema(cur.description)
+        if not rows:
+            break
+        yield rows_to_batch(rows, schema)
+
+
+def fetch_table(cur, chunksize: int = 100000) -> "pa.Table":
+    """Fetch the whole result of an executed cursor into an Arrow table.
+
+    Args:
+        cur: Cursor on which the query has been executed
+        chunksize: Rows converted per batch
+
+    Returns:
+        pa.Table: Result table
+    """
+    batches = list(iter_batches(cur, chunksize))
+    if not batches:
+        return arrow_schema(cur.description).empty_table()
+    return pa.Table.from_batches(batches)
+
+
+def table_to_pandas(table: "pa.Table") -> pd.DataFrame:
+    """Convert an Arrow table to pandas, avoiding copies where possible.
+
+    Args:
+        table: Arrow table; it must not be used afterwards
+
+    Returns:
+        pd.DataFrame: Frame with datetime64 dates and float64 numerics
+    """
+    return table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+
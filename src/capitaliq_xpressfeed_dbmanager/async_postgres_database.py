@@ -0,0 +1,106 @@
+from contextlib import asynccontextmanager
+from typing import Tuple
+
+import pandas as pd
+
+from .base_database import AsyncBaseDatabase
+from .logger import get_logger, log_query
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # pragma: no cover - optional dependency
+    make_conninfo = None
+    AsyncConnectionPool = None
+
+# Initialize logger
+logger = get_logger(__name__)
+
+
+class AsyncPostgresDatabase(AsyncBaseDatabase):
+    """Asyncio Postgres database on psycopg 3 with an async connection pool.
+
+    Queries use the same `%s` placeholders as `PostgresDatabase`, so the
+    repository SQL is shared between the sync and async backends.
+    """
+
+    def __init__(self, dbname: str, user: str, password: str = "", host: str = "localhost", port: int = 5432,
+                 pool_minsize: int = 1, pool_maxsize: int = 10, pool_max_idle: float = 300.0,
+                 pool_max_lifetime: float = 3600.0):
+        """Initialize database with configuration. Call `open` (or use `async with`) before querying.
+
+        Args:
+            dbname: Database name
+            user: Database user
+            password: Database password (ignored for localhost)
+            host: Database host
+            port: Database port
+            pool_minsize: Connections kept open by the pool even when idle
+            pool_maxsize: Maximum number of pooled connections, i.e. concurrent queries
+            pool_max_idle: Seconds after which surplus idle connections are closed
+            pool_max_lifetime: Seconds after which a pooled connection is recycled
+        """
+        if AsyncConnectionPool is None:
+            raise ImportError("AsyncPostgresDatabase requires psycopg 3: pip install 'capitaliq-xpressfeed-dbmanager[async]'")
+
+        if host == "localhost":
+            self.config = dict(dbname=dbname, user=user)
+        else:
+            self.config = dict(dbname=dbname, user=user, password=password, host=host, port=port)
+
+        self.pool = AsyncConnectionPool(
+            make_conninfo(**{k: str(v) for k, v in self.config.items()}),
+            min_size=pool_minsize,
+            max_size=pool_maxsize,
+            max_idle=pool_max_idle,
+            max_lifetime=pool_max_lifetime,
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        self._dbname = dbname
+        self._host = host
+
+    async def open(self):
+        """Open the pool and wait until `pool_minsize` connections are ready."""
+        await self.pool.open(wait=True)
+        logger.info("Successfully connected to database %s@%s", self._dbname, self._host)
+
+    async def close(self):
+        """Close all pooled connections."""
+        await self.pool.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @asynccontextmanager
+    async def get_connection(self):
+        """Check out a connection from the pool.
+
+        Yields:
+            Connection: psycopg AsyncConnection
+        """
+        async with self.pool.connection() as conn:
+            yield conn
+
+    async def query_all(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Execute a query and return all results.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cur:
+                log_query(logger, "Executing query", query)
+                await cur.execute(query, params or None)
+                result = await cur.fetchall()
+                logger.info("Query executed successfully! Total rows: %d", len(result))
+                column_names = [desc.name for desc in cur.description]
+        return pd.DataFrame(result, columns=column_names)
@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+
+import pandas as pd
+
+from .base_database import AsyncBaseDatabase
+from .db_task_manager import (
+    PAST_PRICE_COLUMNS,
+    _company_transcriptsid_sql,
+    _format_past_price,
+    _past_price_sql,
+    _security_info_sql,
+    _single_security,
+    _transcript_sql,
+)
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncTaskManagerRepository:
+    """Asyncio counterpart of TaskManagerRepository for concurrent fan-out.
+
+    Shares the SQL and post-processing of the sync repository, so the
+    methods return the same DataFrame shapes. At most `max_concurrency`
+    queries run at a time, however many calls are gathered.
+    """
+
+    def __init__(self, database: AsyncBaseDatabase, max_concurrency: int = 10):
+        """Initialize repository with database connection.
+
+        Args:
+            database: Async database instance for data access
+            max_concurrency: Maximum number of queries in flight; keep it at or
+                below the pool size of the database
+        """
+        self.database = database
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def _limit(self) -> asyncio.Semaphore:
+        """Return the concurrency semaphore of the running event loop.
+
+        Semaphores bind to the loop they first wait in, so a new one is
+        created when the repository is reused under another loop (e.g. a
+        second `asyncio.run`).
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        async with self._limit():
+            return await self.database.query_all(sql, params)
+
+    async def gather(self, method: Callable[..., Awaitable], args: Iterable, return_exceptions: bool = False) -> list:
+        """Call a repository method for every argument and collect the results in order.
+
+        Args:
+            method: Bound async repository method, e.g. `repo.get_past_price`
+            args: Iterable of arguments; tuples are unpacked as positional arguments
+            return_exceptions: If True, failed calls return their exception instead
+                of cancelling the whole batch
+
+        Returns:
+            list: Results in the order of `args`
+        """
+        calls = [method(*a) if isinstance(a, tuple) else method(a) for a in args]
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+
+    async def get_security_info(self, ticker: str, country: str) -> pd.DataFrame:
+        """Get company, security, and trading item information for a ticker, see `TaskManagerRepository`"""
+        return await self._query(*_security_info_sql(ticker, country))
+
+    async def get_metadata_info(self, ticker: str, country: str) -> pd.Series:
+        """Get the single primary security row for a ticker, see `TaskManagerRepository`"""
+        return _single_security(await self.get_security_info(ticker, country), ticker)
+
+    async def get_company_transcriptsid(self, companyid: int, last_refresh_day: str) -> pd.DataFrame:
+        """Get the latest transcript per earnings call of a company, see `TaskManagerRepository`"""
+        return await self._query(*_company_transcriptsid_sql(companyid, last_refresh_day))
+
+    async def get_transcript(self, ls_transcript_ids) -> pd.DataFrame:
+        """Get transcript components given a list of transcript ids, see `TaskManagerRepository`"""
+        return await self._query(*_transcript_sql(ls_transcript_ids))
+
+    async def get_past_price(self, companyid: int, traling_x_years: int = 5) -> pd.DataFrame:
+        """Get dividend-adjusted past prices of a company, see `TaskManagerRepository`"""
+        sql, params = _past_price_sql("c.companyId = %s", int(companyid), traling_x_years)
+        return _format_past_price(await self._query(sql, params), PAST_PRICE_COLUMNS)
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, List
-from contextlib import contextmanager
+from typing import Iterator, Tuple, List
+from contextlib import asynccontextmanager, contextmanager
 
 class BaseDatabase(ABC):
     """Base database"""
@@ -29,3 +29,57 @@ class BaseDatabase(ABC):
         """
         pass
 
+    def query_iter(self, query: str, params: Tuple = (), chunksize: int = 10000) -> Iterator:
+        """Execute a query and yield the results in chunks of `chunksize` rows.
+
+        The default implementation slices the result of `query_all`; backends
+        that support server-side cursors should override it to bound memory.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+            chunksize: Number of rows per chunk
+
+        Yields:
+            Chunks of the query result
+        """
+        result = self.query_all(query, params)
+        if len(result) == 0:
+            yield result
+        for start in range(0, len(result), chunksize):
+            yield result[start:start + chunksize]
+
+    def close(self):
+        """Release resources held by the database (e.g. pooled connections)."""
+        pass
+
+
+class AsyncBaseDatabase(ABC):
+    """Base database for asyncio backends"""
+
+    @asynccontextmanager
+    @abstractmethod
+    async def get_connection(self):
+        """Get database connection as async context manager.
+
+        Yields:
+            Connection: Database connection
+        """
+        yield
+
+    @abstractmethod
+    async def query_all(self, query: str, params: Tuple = ()):
+        """Execute a query and return all results.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        pass
+
+    async def close(self):
+        """Release resources held by the database (e.g. pooled connections)."""
+        pass
@@ -0,0 +1,194 @@
+import datetime
+from decimal import Decimal
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Column type policies:
+#   "category"             always categorical
+#   "text"                 categorical if at most half of the values are distinct, else left as is
+#   "datetime"             datetime64
+#   "int8" ... "int64"     integers, downcast only if all values fit (nullable if there are NULLs)
+#   "float32"/"float64"    floats, NUMERIC Decimals included
+#   ("float64", 4)         floats rounded to the given number of decimals
+# Columns without a policy get the defaults of `compact_frame`.
+COLUMN_TYPES = {
+    "companyid": "int32",
+    "tradingitemid": "int32",
+    "securityid": "int32",
+    "transcriptid": "int32",
+    "transcriptcomponentid": "int32",
+    "transcriptpersonid": "int32",
+    "keydevid": "int32",
+    "dataitemid": "int32",
+    "currencyid": "int16",
+    "exchangeid": "int16",
+    "countryid": "int16",
+    "companytypeid": "int16",
+    "periodtypeid": "int8",
+    "primaryflag": "int8",
+    "tradingitemstatusid": "int16",
+    "transcriptcollectiontypeid": "int16",
+    "transcriptcomponenttypeid": "int16",
+    "estimatescaleid": "int16",
+    "componentorder": "int16",
+    "fiscalyear": "int16",
+    "fiscalquarter": "int8",
+    "calendaryear": "int16",
+    "calendarquarter": "int8",
+    "companyname": "text",
+    "tickersymbol": "text",
+    "securityname": "category",
+    "currency": "category",
+    "exchange": "category",
+    "country": "category",
+    "countrycode": "category",
+    "formtype": "category",
+    "dataitemname": "category",
+    "dataitemdescription": "text",
+    "tradingitemstatusname": "category",
+    "transcriptcomponenttypename": "category",
+    "transcriptpersonname": "category",
+    "speakertypename": "category",
+    "title": "category",
+    "pricingdate": "datetime",
+    "pricedate": "datetime",
+    "periodenddate": "datetime",
+    "filingdate": "datetime",
+    "instancedate": "datetime",
+    "marketcap": "float64",
+    "usdmarketcap": "float64",
+    "dataitemvalue": "float64",
+}
+
+# per repository method: column policies on top of COLUMN_TYPES
+COMPACT_SCHEMAS: Dict[str, Dict[str, object]] = {
+    "query_global_market_cap": {"marketcap": ("float64", 4), "usdmarketcap": ("float64", 2)},
+    "query_market_cap_universe": {"marketcap": ("float64", 4), "usdmarketcap": ("float64", 2)},
+    "get_security_info": {},
+    "get_company_transcriptsid": {},
+    "get_companies_transcriptsid": {},
+    "get_transcript": {},
+    "get_act_q_ref_co": {},
+    "get_estimates": {},
+    "get_estimates_panel": {},
+    "get_historical_fundamental": {},
+    "get_point_in_time_fundamentals": {},
+    "get_key_fundamentals": {},
+    "get_past_price": {"volume": "float64"},
+    "get_past_prices": {"volume": "float64"},
+    "get_past_priceclose": {},
+    "get_adjusted_prices": {"volume": "float64"},
+    "get_dataitem_info": {"dataitemname": "text"},
+}
+
+_INT_DTYPES = ("int8", "int16", "int32", "int64")
+
+
+def _first_value(series: pd.Series):
+    valid = series.first_valid_index()
+    return None if valid is None else series.loc[valid]
+
+
+def _to_int(series: pd.Series, dtype: str) -> pd.Series:
+    if not (pd.api.types.is_numeric_dtype(series) or series.dtype == object):
+        return series
+    if series.dtype == object:
+        series = pd.to_numeric(series)
+    if pd.api.types.is_float_dtype(series) and not series.dropna().mod(1).eq(0).all():
+        return series
+    # try the requested width, then wider ones
+    for candidate in _INT_DTYPES[_INT_DTYPES.index(dtype):]:
+        info = np.iinfo(candidate)
+        if series.empty or (series.min() >= info.min and series.max() <= info.max):
+            return series.astype(candidate.capitalize() if series.hasnans else candidate)
+    return series
+
+
+def _compact_column(series: pd.Series, spec) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    decimals = None
+    if isinstance(spec, tuple):
+        spec, decimals = spec
+    if spec == "category":
+        return series.astype("category")
+    if spec == "text":
+        if series.nunique(dropna=True) <= len(series) // 2:
+            return series.astype("category")
+        return series
+    if spec == "datetime":
+        return series if pd.api.types.is_datetime64_any_dtype(series) else pd.to_datetime(series)
+    if spec in _INT_DTYPES:
+        return _to_int(series, spec)
+    if spec in ("float32", "float64"):
+        series = series.astype(spec)
+        return series.round(decimals) if decimals is not None else series
+    raise ValueError(f"Unknown column type policy {spec!r} for column {series.name}")
+
+
+def _default_spec(series: pd.Series):
+    """Policy for a column without an explicit one, inferred from its values."""
+    if series.dtype == object:
+        value = _first_value(series)
+        if isinstance(value, Decimal):
+            return "float64"
+        if isinstance(value, datetime.date):
+            return "datetime"
+        if isinstance(value, str):
+            return "text"
+        return None
+    if pd.api.types.is_string_dtype(series):
+        return "text"
+    if pd.api.types.is_integer_dtype(series) and str(series.name).endswith("id"):
+        return "int32"
+    return None
+
+
+def compact_frame(df: pd.DataFrame, schema: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+    """Convert a query result into memory-compact dtypes.
+
+    Columns are converted by their policy in `schema` (default COLUMN_TYPES).
+    Other columns are inferred: NUMERIC Decimals become float64,
+    `datetime.date` values become datetime64, low-cardinality text becomes
+    categorical and integer `...id` columns are downcast to int32 where they fit.
+
+    Args:
+        df: Query result
+        schema: Column name -> type policy, see COLUMN_TYPES
+
+    Returns:
+        pd.DataFrame: Frame with compact dtypes
+    """
+    schema = COLUMN_TYPES if schema is None else schema
+    columns = {}
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        spec = schema.get(column) if column in schema else _default_spec(series)
+        if spec is not None:
+            series = _compact_column(series, spec)
+        columns[position] = series
+    result = pd.concat(columns, axis=1) if columns else df.copy()
+    result.columns = df.columns
+    result.index = df.index
+    return result
+
+
+def method_schemas(overrides: Optional[Dict[str, Dict[str, object]]] = None) -> Dict[str, Dict[str, object]]:
+    """Build the per-method column policies, with `overrides` applied per column.
+
+    Args:
+        overrides: Method -> column -> policy, e.g. {"get_past_prices": {"priceclose": ("float32", 4)}}
+
+    Returns:
+        dict: Method -> complete column policies
+    """
+    overrides = overrides or {}
+    unknown = set(overrides) - set(COMPACT_SCHEMAS)
+    if unknown:
+        raise ValueError(f"No compact schema for methods: {sorted(unknown)}")
+    return {
+        method: {**COLUMN_TYPES, **schema, **overrides.get(method, {})}
+        for method, schema in COMPACT_SCHEMAS.items()
+    }
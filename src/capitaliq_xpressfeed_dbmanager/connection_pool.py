@@ -0,0 +1,222 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from .logger import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class _ConnectionInfo:
+    """Bookkeeping for a connection owned by the pool."""
+
+    __slots__ = ("created_at", "last_used")
+
+    def __init__(self, now: float):
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are reused in LIFO order so that the hot ones stay warm and
+    the surplus ones age out through idle recycling.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        minsize: int = 1,
+        maxsize: int = 10,
+        max_idle: float = 300.0,
+        max_lifetime: float = 3600.0,
+        health_check_after: float = 5.0,
+        timeout: float = 30.0,
+        connect: Optional[Callable] = None,
+    ):
+        """Initialize the pool. No connection is opened until `open` or `getconn`.
+
+        Args:
+            config: Keyword arguments passed to `psycopg2.connect`
+            minsize: Number of connections kept open even when idle
+            maxsize: Maximum number of connections open at the same time
+            max_idle: Seconds after which an idle connection above `minsize` is closed
+            max_lifetime: Seconds after which a connection is closed instead of reused
+            health_check_after: Connections idle for longer than this are pinged
+                with `SELECT 1` on checkout (0 pings on every checkout)
+            timeout: Seconds `getconn` waits for a free connection
+            connect: Connection factory, defaults to `psycopg2.connect`
+        """
+        if minsize < 0 or maxsize < 1 or minsize > maxsize:
+            raise ValueError("pool sizes must satisfy 0 <= minsize <= maxsize and maxsize >= 1")
+
+        self.config = config
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._connect = connect or psycopg2.connect
+
+        self._cond = threading.Condition()
+        self._idle: List = []
+        self._info: Dict[int, _ConnectionInfo] = {}
+        self._size = 0
+        self._closed = False
+
+    def open(self):
+        """Open `minsize` connections up front; raises if the database is unreachable."""
+        conns = [self.getconn() for _ in range(max(self.minsize, 1))]
+        for conn in conns:
+            self.putconn(conn)
+
+    def getconn(self):
+        """Check out a healthy connection, opening a new one if the pool has room.
+
+        Returns:
+            Connection: psycopg2 connection, to be given back with `putconn`
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            expired = []
+            try:
+                with self._cond:
+                    while True:
+                        if self._closed:
+                            raise PoolTimeout("connection pool is closed")
+                        expired += self._prune_idle()
+                        if self._idle:
+                            conn = self._idle.pop()
+                            break
+                        if self._size < self.maxsize:
+                            self._size += 1
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(f"no free connection after {self.timeout}s (maxsize={self.maxsize})")
+                        self._cond.wait(remaining)
+            finally:
+                # network I/O, so outside the lock
+                for old in expired:
+                    self._close_quietly(old)
+
+            if conn is None:
+                return self._new_connection()
+            if self._is_usable(conn):
+                self._info[id(conn)].last_used = time.monotonic()
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn, discard: bool = False):
+        """Give a connection back to the pool.
+
+        Args:
+            conn: Connection obtained from `getconn`
+            discard: Close the connection instead of reusing it
+        """
+        info = self._info.get(id(conn))
+        if info is None:
+            conn.close()
+            return
+
+        if not discard and not conn.closed:
+            try:
+                # query_all never commits, so end the implicit read transaction
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or self._closed or now - info.created_at > self.max_lifetime:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            info.last_used = now
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """Return the number of open and idle connections."""
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "maxsize": self.maxsize}
+
+    def _new_connection(self):
+        try:
+            conn = self._connect(**self.config)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._info[id(conn)] = _ConnectionInfo(time.monotonic())
+        return conn
+
+    def _is_usable(self, conn) -> bool:
+        if conn.closed:
+            return False
+        info = self._info[id(conn)]
+        now = time.monotonic()
+        if now - info.created_at > self.max_lifetime:
+            return False
+        if now - info.last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning("Discarding broken pooled connection: %s", e)
+            return False
+
+    def _discard(self, conn):
+        self._info.pop(id(conn), None)
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _prune_idle(self) -> List:
+        # called with the lock held; the oldest idle connections sit at the front.
+        # Returns the expired connections, which the caller closes after releasing the lock.
+        now = time.monotonic()
+        expired = []
+        while self._idle and self._size > self.minsize:
+            info = self._info[id(self._idle[0])]
+            if now - info.last_used <= self.max_idle:
+                break
+            conn = self._idle.pop(0)
+            self._info.pop(id(conn), None)
+            self._size -= 1
+            expired.append(conn)
+        return expired
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
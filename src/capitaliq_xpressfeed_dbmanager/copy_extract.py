@@ -0,0 +1,114 @@
+import io
+import re
+from typing import List, Tuple
+from uuid import uuid4
+
+import pandas as pd
+
+from .pg_types import column_kind
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pa_csv = None
+
+# marker used for NULL in the COPY output so that empty strings survive the round trip
+COPY_NULL = "\\N"
+# a text value equal to COPY_NULL is written quoted; quotes inside quoted fields are doubled,
+# so a single quote after a delimiter or line start always opens a field
+_QUOTED_NULL = re.compile(rb'(^|,)"\\N"(?=,|\r?\n|$)', re.MULTILINE)
+
+
+def copy_statement(query: str) -> str:
+    """Wrap a SELECT statement in a `COPY ... TO STDOUT` CSV export.
+
+    Args:
+        query: Fully bound SELECT statement
+
+    Returns:
+        str: COPY statement
+    """
+    return f"COPY (\n{strip_statement(query)}\n) TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+
+def strip_statement(query: str) -> str:
+    """Remove surrounding whitespace and trailing semicolons so the query can be nested."""
+    return query.strip().rstrip(";").rstrip()
+
+
+def read_copy_csv(buf: io.BytesIO, columns: List[Tuple[str, int]]) -> pd.DataFrame:
+    """Parse the CSV output of `copy_statement` into typed columns.
+
+    pyarrow's multithreaded CSV reader is used when it is installed, otherwise
+    the frame is parsed as strings by pandas and converted column by column.
+    Either way only an unquoted COPY_NULL is NULL: quoted it is the text `\\N`,
+    and empty fields are empty strings.
+
+    Args:
+        buf: Buffer holding the COPY output
+        columns: (name, type OID) pairs taken from `cursor.description`
+
+    Returns:
+        pd.DataFrame: Typed result
+    """
+    names = [name for name, _ in columns]
+    kinds = [column_kind(type_code) for _, type_code in columns]
+    if buf.getbuffer().nbytes == 0:
+        return pd.DataFrame([], columns=names)
+
+    if pa_csv is not None:
+        arrow_types = {
+            "bool": pa.bool_(),
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("us"),
+            "timestamptz": pa.string(),
+            "text": pa.string(),
+            "json": pa.string(),
+            "array": pa.string(),
+            "other": pa.string(),
+        }
+        table = pa_csv.read_csv(
+            buf,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={f"f{i}": arrow_types[kind] for i, kind in enumerate(kinds)},
+                null_values=[COPY_NULL],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+                true_values=["t"],
+                false_values=["f"],
+            ),
+        )
+        df = table.to_pandas(date_as_object=False)
+        converted = {"timestamptz"}
+    else:
+        data = buf.getvalue()
+        # pandas cannot tell quoted from unquoted fields: set quoted COPY_NULL values aside
+        placeholder = None
+        if _QUOTED_NULL.search(data):
+            placeholder = f"quoted-null-{uuid4().hex}"
+            data = _QUOTED_NULL.sub(rb'\1"' + placeholder.encode() + rb'"', data)
+        df = pd.read_csv(io.BytesIO(data), header=None, dtype=str, keep_default_na=False, na_values=[COPY_NULL])
+        if placeholder is not None:
+            df = df.replace(placeholder, COPY_NULL)
+        converted = {"bool", "int", "float", "date", "timestamp", "timestamptz"}
+
+    df.columns = names
+    for i, kind in enumerate(kinds):
+        if kind not in converted:
+            continue
+        col = df.iloc[:, i]
+        if kind == "bool":
+            col = col.map({"t": True, "f": False})
+        elif kind in ("int", "float"):
+            col = pd.to_numeric(col)
+        elif kind == "timestamptz":
+            col = pd.to_datetime(col, utc=True, format="ISO8601")
+        else:
+            col = pd.to_datetime(col)
+        df.isetitem(i, col)
+    return df
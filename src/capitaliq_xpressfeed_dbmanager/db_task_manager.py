@@ -1,19 +1,434 @@
 from .logger import get_logger
+from .adjusted_prices import adjusted_returns
 from .base_database import BaseDatabase
+from .compact import compact_frame, method_schemas
+from .memoize import Memoizer, memoize_methods
+from .metrics import track_methods
+from .point_in_time import fundamentals_as_of
+from functools import wraps
+from typing import Iterator
 import pandas as pd
 
 logger = get_logger(__name__)
 
+
+def _round_floats(df: pd.DataFrame, decimals: dict) -> pd.DataFrame:
+    """Cast the given columns to float and round them, in one pass.
+
+    Columns that are already float (e.g. from the arrow or COPY backends)
+    are not converted again.
+
+    Args:
+        df: Query result
+        decimals: Column name -> number of decimals
+
+    Returns:
+        pd.DataFrame: Frame with rounded float columns
+    """
+    to_cast = {col: float for col in decimals if df[col].dtype != float}
+    if to_cast:
+        df = df.astype(to_cast)
+    return df.round(decimals)
+
+
+def _id_list(ids) -> list[int]:
+    """Normalize an iterable of ids (e.g. numpy integers) into a list of ints for array parameters."""
+    return [int(id) for id in ids]
+
+
+def _market_cap_universe_sql(dates: list[str], mktcap_thres: float, countries, fuzzy_days: int) -> tuple[str, tuple]:
+    params = [dates, fuzzy_days, fuzzy_days, mktcap_thres]
+    if countries is None:
+        country_filter = ""
+    else:
+        country_filter = "AND cg.isocountry2 = ANY(%s)"
+        params.append(list(countries))
+
+    # latest market cap within the fuzzy window per (asofdate, company) first, then the
+    # company/security filters and the conversion at the latest exchange rate in the window
+    sql = f"""
+        WITH latest AS (
+            SELECT DISTINCT ON (d.asofdate, mc.companyid)
+                d.asofdate, mc.companyid, mc.marketcap, mc.pricingdate
+            FROM unnest(%s::date[]) AS d(asofdate)
+            JOIN ciqmarketcap mc ON mc.pricingdate BETWEEN d.asofdate - %s::int AND d.asofdate
+            ORDER BY d.asofdate, mc.companyid, mc.pricingdate DESC
+        )
+        SELECT
+            latest.asofdate,
+            latest.companyid,
+            latest.marketcap,
+            latest.pricingdate,
+            round(latest.marketcap / fx.priceclose, 2) as usdmarketcap,
+            c.companyname,
+            ti.tickersymbol,
+            cur.isocode as currency,
+            ex.exchangesymbol as exchange,
+            cg.isocountry2 as country
+        FROM latest
+        JOIN ciqcompany c ON latest.companyid = c.companyid
+        JOIN ciqsecurity s ON latest.companyid = s.companyid
+        JOIN ciqtradingitem ti ON s.securityid = ti.securityid
+        JOIN LATERAL (
+            SELECT er.priceclose FROM ciqexchangerate er
+            WHERE er.currencyid = ti.currencyid
+            AND er.pricedate BETWEEN latest.asofdate - %s::int AND latest.asofdate
+            AND er.latestsnapflag = 1
+            ORDER BY er.pricedate DESC
+            LIMIT 1
+        ) fx ON true
+        JOIN ciqcurrency cur ON ti.currencyid = cur.currencyid
+        JOIN ciqexchange ex ON ti.exchangeid = ex.exchangeid
+        JOIN ciqcountrygeo cg ON c.countryid = cg.countryid
+        WHERE latest.marketcap / fx.priceclose >= %s
+        AND c.companytypeid in (4, 5)
+        AND s.primaryflag = 1
+        AND ti.primaryflag = 1
+        {country_filter}
+        ORDER BY latest.asofdate, usdmarketcap DESC
+    """
+    return sql, tuple(params)
+
+
+def _security_info_sql(ticker: str, country: str) -> tuple[str, tuple]:
+    params = (ticker,)
+    if country == "all":
+        country_filter = ""
+    else:
+        country_filter = "and cg.isocountry2 = %s"
+        params += (country,)
+    sql = f"""
+    select t.*, s.*, c.*, upper(cg.isocountry2) as countrycode, tis.*
+    from ciqtradingitem t
+    join ciqsecurity s on t.securityid = s.securityid
+    join ciqcompany c on s.companyid = c.companyid
+    join ciqcountrygeo cg on c.countryid = cg.countryid
+    join ciqtradingitemstatus tis on t.tradingitemstatusid = tis.tradingitemstatusid
+    where t.tickersymbol = %s
+    {country_filter}
+    and
+    t.primaryflag = 1
+    and
+    s.primaryflag = 1
+    and 
+    -- 4: delisted, 5: expired; 11: inactive; 8: merged
+    t.tradingitemstatusid not in (4, 5, 8, 11)
+    """
+    return sql, params
+
+
+def _single_security(df: pd.DataFrame, ticker: str) -> pd.Series:
+    if len(df) > 1 or len(df) == 0:
+        raise Exception(f"Multiple or no security found for {ticker}")
+    return df.iloc[0]
+
+
+def _company_transcriptsid_sql(companyid: int, last_refresh_day: str,
+                               after_transcriptid: int = None) -> tuple[str, tuple]:
+    if after_transcriptid is None:
+        datestart = pd.to_datetime(last_refresh_day).strftime("%Y-%m-%d")
+        since_filter = "t.transcriptCreationDateUTC > %s::timestamp"
+        since_params = (datestart,)
+    else:
+        # high-water mark: transcripts created after the last one seen, ties broken by id
+        datestart = pd.to_datetime(last_refresh_day).isoformat()
+        since_filter = "(t.transcriptCreationDateUTC, t.transcriptId) > (%s::timestamp, %s)"
+        since_params = (datestart, int(after_transcriptid))
+
+    # latest version per earnings call (keyDevId), i.e. the one with the latest creation date
+    sql = f"""
+        SELECT * FROM (
+            SELECT DISTINCT ON (t.keyDevId)
+            t.transcriptId, t.transcriptCreationDateUTC, ete.objectId companyid, t.keyDevId, t.transcriptCollectionTypeId,
+            e.mostImportantDateUTC as EarningsCallDateUTC, e.announcedDateUTC,
+            eb.fiscalyear, eb.fiscalquarter
+            FROM targetskma.ciqTranscript t
+            JOIN targetskma.ciqEvent e ON e.keyDevId = t.keyDevId
+            JOIN targetskma.ciqEventToObjectToEventType ete ON ete.keyDevId = t.keyDevId
+            JOIN targetskma.ciqEventType et ON et.keyDevEventTypeId = ete.keyDevEventTypeId
+            JOIN targetskma.ciqeventcallbasicinfo eb on eb.keyDevId = t.keyDevId
+            WHERE et.keyDevEventTypeId='48' --Earnings Calls
+            AND ete.objectId = %s
+            AND {since_filter}
+            ORDER BY t.keyDevId, t.transcriptCreationDateUTC DESC, t.transcriptId DESC
+        ) latest
+        ORDER BY EarningsCallDateUTC asc, keyDevId;
+        """
+    return sql, (int(companyid),) + since_params
+
+
+def _companies_transcriptsid_sql(companyids: list[int], since: list[str],
+                                 after_transcriptids: list) -> tuple[str, tuple]:
+    # one (companyid, since, after_transcriptid) row per company; a NULL transcript id means
+    # "created strictly after since", otherwise (creation date, id) must sort after the pair
+    sql = """
+        SELECT * FROM (
+            SELECT DISTINCT ON (ete.objectId, t.keyDevId)
+            t.transcriptId, t.transcriptCreationDateUTC, ete.objectId companyid, t.keyDevId, t.transcriptCollectionTypeId,
+            e.mostImportantDateUTC as EarningsCallDateUTC, e.announcedDateUTC,
+            eb.fiscalyear, eb.fiscalquarter
+            FROM unnest(%s::bigint[], %s::timestamp[], %s::bigint[]) AS hwm(companyid, since, transcriptid)
+            JOIN targetskma.ciqEventToObjectToEventType ete ON ete.objectId = hwm.companyid
+            JOIN targetskma.ciqEventType et ON et.keyDevEventTypeId = ete.keyDevEventTypeId
+            JOIN targetskma.ciqTranscript t ON t.keyDevId = ete.keyDevId
+            JOIN targetskma.ciqEvent e ON e.keyDevId = t.keyDevId
+            JOIN targetskma.ciqeventcallbasicinfo eb on eb.keyDevId = t.keyDevId
+            WHERE et.keyDevEventTypeId='48' --Earnings Calls
+            AND (t.transcriptCreationDateUTC, t.transcriptId) > (hwm.since, hwm.transcriptid)
+            ORDER BY ete.objectId, t.keyDevId, t.transcriptCreationDateUTC DESC, t.transcriptId DESC
+        ) latest
+        ORDER BY companyid, EarningsCallDateUTC asc, keyDevId;
+        """
+    since = [pd.to_datetime(day).isoformat() for day in since]
+    after_transcriptids = [None if pd.isna(tid) else int(tid) for tid in after_transcriptids]
+    return sql, (_id_list(companyids), since, after_transcriptids)
+
+
+def _transcript_sql(ls_transcript_ids) -> tuple[str, tuple]:
+    sql = """
+    select tc.transcriptComponentId, tc.transcriptId, tc.componentOrder, tc.transcriptComponentTypeId, 
+    tc.transcriptPersonId, CAST(tc.componentText AS TEXT) AS componentText, tct.transcriptComponentTypeName, tp.transcriptPersonName, tst.speakerTypeName, pb.title
+    from targetskma.ciqTranscriptComponent tc
+    LEFT JOIN targetskma.ciqTranscriptPerson tp on tc.transcriptPersonId = tp.transcriptPersonId
+    LEFT JOIN targetskma.ciqTranscriptSpeakerType tst on tst.speakerTypeId = tp.speakerTypeId
+    LEFT JOIN targetskma.ciqProfessional pb on pb.proId= tp.proId
+    LEFT JOIN targetskma.ciqTranscriptComponentType tct on tc.transcriptComponentTypeId = tct.transcriptComponentTypeId
+    where tc.transcriptId = ANY(%s)
+    order by transcriptId, componentOrder
+    """
+    return sql, (_id_list(ls_transcript_ids),)
+
+
+def _historical_fundamental_sql(ls_ids, ls_dataitemid, periodtypeid, startyear) -> tuple[str, tuple]:
+    startdate = pd.to_datetime(f"{startyear}-01-01").strftime("%Y-%m-%d")
+
+    sql = """
+            SELECT 
+            fp.companyId, 
+            fi.periodEndDate,
+            fi.filingDate,
+            fi.formtype,
+            fi.currencyid,
+            fp.periodTypeId, 
+            fp.calendarQuarter, 
+            fp.calendarYear,
+            fd.dataItemId,
+            fd.dataItemValue,
+            fid.instanceDate,
+            di.dataitemname
+
+            FROM ciqFinPeriod fp 
+            join ciqFinInstance fi on fi.financialPeriodId = fp.financialPeriodId 
+            join ciqFinInstanceDate fid on fid.financialInstanceId = fi.financialInstanceId
+            join ciqFinInstanceToCollection ic on ic.financialInstanceId = fi.financialInstanceId 
+            join ciqFinCollectionData fd on fd.financialCollectionId = ic.financialCollectionId 
+            join ciqdataitem di on di.dataitemid = fd.dataItemId
+
+            WHERE fd.dataItemId = ANY(%s)
+            AND    fp.companyId = ANY(%s)
+            AND    fp.calendarYear >= %s
+            AND    fp.periodTypeId = ANY(%s) --quarterly 
+            AND  fi.periodEndDate >= %s
+
+        """
+    return sql, (_id_list(ls_dataitemid), _id_list(ls_ids), int(startyear), _id_list(periodtypeid), startdate)
+
+
+def _act_q_ref_co_sql(ls_ids, dataitemids, startdate) -> tuple[str, tuple]:
+    datestart = pd.to_datetime(startdate).strftime("%Y-%m-%d")
+
+    sql = """
+        select 
+        EP.companyId
+        , EP.periodTypeId
+        , EP.periodenddate
+        , EP.fiscalyear
+        , EP.fiscalquarter
+        , ED.dataitemid
+        , ED.currencyId
+        , ED.dataItemValue
+        , ED.effectiveDate
+        , ED.toDate
+        , ED.estimatescaleid
+        , di.dataitemname
+
+        from ciqEstimatePeriod EP
+        --- link the core estimate table to data table
+        --------------------------------------------------------------
+        join ciqEstimateConsensus EC 
+        on EC.estimatePeriodId = EP.estimatePeriodId
+        join ciqEstimateNumericData ED
+        on ED.estimateConsensusId = EC.estimateConsensusId
+        join ciqdataitem di on di.dataitemid = ED.dataitemid
+        --------------------------------------------------------------
+        where EP.companyId = ANY(%s)
+        and EP.periodTypeId = 2 -- Quarter 
+        and ED.dataItemId = ANY(%s)
+        and EP.periodenddate > %s
+        and ED.toDate > '2030-01-01'
+
+        order by EP.companyId, EP.fiscalquarter
+    """
+    return sql, (_id_list(ls_ids), _id_list(dataitemids), datestart)
+
+
+def _past_price_sql(company_filter: str, company_param, traling_x_years: int,
+                    adjust: bool = True) -> tuple[str, tuple]:
+    # enddate should be today
+    enddate = pd.Timestamp.now().strftime("%Y-%m-%d")
+    # startdate should be today - 1 year
+    startdate = (pd.Timestamp.now() - pd.Timedelta(days=365 * traling_x_years)).strftime("%Y-%m-%d")
+
+    adjusted_columns = _ADJUSTED_COLUMNS if adjust else ""
+    adjustment_join = _ADJUSTMENT_JOIN if adjust else ""
+    sql = f"""
+    SELECT 
+    c.companyid
+    ,ti.tradingItemId
+    ,ti.currencyid
+    ,mi.priceDate
+    ,mi.priceClose
+    ,mi.priceOpen
+    ,mi.priceHigh
+    ,mi.priceLow
+    ,mi.volume
+    ,mi.vwap
+    {adjusted_columns}
+    FROM ciqCompany c
+    JOIN ciqSecurity s on s.companyid = c.companyid
+    JOIN ciqTradingItem ti on ti.securityId=s.securityId
+    JOIN miadjprice mi on mi.tradingItemId=ti.tradingItemId
+    {adjustment_join}
+    WHERE {company_filter}
+    AND s.primaryflag=1 -- empirically makes sense to have these primary flag, lost about 0.03%% data
+    AND ti.primaryflag=1
+    AND mi.priceDate >= %s
+    AND mi.priceDate <= %s
+    ORDER BY c.companyid, mi.priceDate asc;
+    """
+    return sql, (company_param, startdate, enddate)
+
+
+_ADJUSTED_COLUMNS = """
+    ,(mi.priceClose*COALESCE(daf.divAdjFactor,1)) divAdjClose
+    ,COALESCE(daf.divAdjFactor,1) as divAdjFactor
+"""
+
+_ADJUSTMENT_JOIN = """
+    left join ciqPriceEquityDivAdjFactor daf on mi.tradingItemId=daf.tradingItemId
+    and daf.fromDate<=mi.priceDate --Find dividend adjustment factor on pricing date
+    and (daf.toDate is null or daf.toDate>=mi.priceDate)
+"""
+
+
+def _div_adj_factor_sql(tradingitemids, startdate: str) -> tuple[str, tuple]:
+    sql = """
+    SELECT tradingItemId, fromDate, toDate, divAdjFactor
+    FROM ciqPriceEquityDivAdjFactor
+    WHERE tradingItemId = ANY(%s)
+    AND (toDate is null or toDate >= %s)
+    ORDER BY tradingItemId, fromDate
+    """
+    return sql, (_id_list(tradingitemids), startdate)
+
+
+PAST_PRICE_COLUMNS = ['pricedate', 'priceclose', 'priceopen', 'pricehigh', 'pricelow', 'volume', 'vwap', 'divadjclose', 'divadjfactor']
+
+
+def _format_past_price(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    _df = df[columns]
+    # for price, should keep just two digits
+    _df = _round_floats(_df, {'priceclose': 2, 'priceopen': 2, 'pricehigh': 2, 'pricelow': 2,
+                              'volume': 2, 'vwap': 2, 'divadjclose': 2, 'divadjfactor': 4})
+    _df['pricedate'] = pd.to_datetime(_df['pricedate'])
+    return _df
+
+
+def _dataitem_info_sql(dataitemids: list[int] = None, all: bool = False) -> tuple[str, tuple]:
+    if all:
+        return """
+        select * from ciqdataitem
+        """, ()
+    return """
+        select * from ciqdataitem where dataitemid = ANY(%s)
+        """, (_id_list(dataitemids),)
+
+
+def _compacting(method, schema: dict):
+    """Wrap a repository method so that DataFrame results get compact dtypes."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        result = method(*args, **kwargs)
+        return compact_frame(result, schema) if isinstance(result, pd.DataFrame) else result
+    return wrapper
+
+
+# read-only lookups whose results can be memoized (generators are streamed and never memoized)
+MEMOIZABLE_METHODS = (
+    "query_global_market_cap", "query_market_cap_universe", "get_security_info", "get_metadata_info",
+    "get_company_transcriptsid", "get_companies_transcriptsid", "get_latest_transcriptid", "get_transcript",
+    "get_act_q_ref_co", "get_estimates", "get_estimates_panel", "get_historical_fundamental",
+    "get_point_in_time_fundamentals", "get_key_fundamentals", "get_past_price", "get_past_prices",
+    "get_past_priceclose", "get_adjusted_prices", "get_dataitem_info",
+)
+
+
+@track_methods
 class TaskManagerRepository:
     """Repository for handling task operations with api."""
 
-    def __init__(self, database: BaseDatabase):
+    def __init__(self, database: BaseDatabase, copy_threshold: int = None, memoize=False,
+                 memo_maxsize: int = 1024, memo_ttl: float = 300.0, compact: bool = False,
+                 compact_schemas: dict = None):
         """Initialize repository with database connection.
 
         Args:
             database: Database instance for data access
+            copy_threshold: If set, bulk queries whose estimated row count is at
+                least this many rows are fetched with `COPY` instead of a cursor
+                (requires a database with `query_copy`, e.g. PostgresDatabase)
+            memoize: True to memoize the results of all MEMOIZABLE_METHODS in
+                process, or the names of the methods to memoize; see `self.memo`
+            memo_maxsize: Maximum number of memoized results
+            memo_ttl: Seconds a memoized result is reused
+            compact: If True, results are returned with memory-compact dtypes (categorical
+                text, datetime64 dates, float NUMERIC, downcast ids), see `compact.COMPACT_SCHEMAS`
+            compact_schemas: Per-method column type overrides for `compact`,
+                e.g. {"get_past_prices": {"priceclose": ("float32", 4)}}
         """
         self.database = database
+        self.copy_threshold = copy_threshold
+        self.compact_schemas = None
+        if compact:
+            self.compact_schemas = method_schemas(compact_schemas)
+            for name, schema in self.compact_schemas.items():
+                setattr(self, name, _compacting(getattr(self, name), schema))
+        self.memo = None
+        if memoize:
+            names = MEMOIZABLE_METHODS if memoize is True else list(memoize)
+            unknown = set(names) - set(MEMOIZABLE_METHODS)
+            if unknown:
+                raise ValueError(f"Methods cannot be memoized: {sorted(unknown)}")
+            self.memo = memoize_methods(self, names, Memoizer(maxsize=memo_maxsize, ttl=memo_ttl))
+
+    def _query_bulk(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """Run a potentially large query, switching to COPY above `copy_threshold`."""
+        if self.copy_threshold is not None and hasattr(self.database, "query_copy"):
+            estimated_rows = self.database.estimate_rows(sql, params)
+            if estimated_rows >= self.copy_threshold:
+                logger.info("Using COPY extraction for ~%d rows", estimated_rows)
+                return self.database.query_copy(sql, params)
+        return self.database.query_all(sql, params)
+
+    def _query_ids(self, sql: str, params: tuple, id_param: int = 0) -> pd.DataFrame:
+        """Run a query filtering on an id list with the database's id set execution, if it has one.
+
+        Ids are sorted first, so chunked results stay in the order of queries sorted by that id.
+        """
+        if not hasattr(self.database, "query_id_set"):
+            return self._query_bulk(sql, params)
+        params = params[:id_param] + (sorted(set(params[id_param])),) + params[id_param + 1:]
+        return self.database.query_id_set(sql, params, id_param, run=self._query_bulk)
 
     def test_connection_query(self) -> pd.DataFrame:
         """Test the connection to the database.
@@ -45,6 +460,8 @@ class TaskManagerRepository:
         else:
             all_countries = False
 
+        params = []
+
         # Common SELECT fields and table joins for both scenarios
         query = """
             SELECT 
@@ -78,31 +495,34 @@ class TaskManagerRepository:
 
         # Date conditions differ based on allow_fuzzy
         if allow_fuzzy:
-            query += f"""
-                ciqmarketcap.pricingdate BETWEEN DATE('{asofdate}') - INTERVAL '3 days' AND '{asofdate}'
+            query += """
+                ciqmarketcap.pricingdate BETWEEN %s::date - INTERVAL '3 days' AND %s::date
             """
+            params += [asofdate, asofdate]
         else:
-            query += f"""
-                ciqmarketcap.pricingdate = '{asofdate}'
+            query += """
+                ciqmarketcap.pricingdate = %s::date
             """
+            params.append(asofdate)
 
         # add country filter if not all countries
         if all_countries:
             pass
         else:
-            query += f"""
+            query += """
                 AND 
-                    ciqcountrygeo.isocountry2 = '{country}'
+                    ciqcountrygeo.isocountry2 = %s
             """
+            params.append(country)
 
         # Common WHERE conditions for both scenarios
-        query += f"""
+        query += """
             AND
-                ciqexchangerate.pricedate = '{asofdate}'
+                ciqexchangerate.pricedate = %s::date
             AND
                 ciqexchangerate.latestsnapflag = 1
             AND
-                ciqmarketcap.marketcap / ciqexchangerate.priceclose >= {mktcap_thres}
+                ciqmarketcap.marketcap / ciqexchangerate.priceclose >= %s
             AND
                 ciqcompany.companytypeid in (4, 5)
             AND 
@@ -112,10 +532,47 @@ class TaskManagerRepository:
             ORDER BY
                 ciqmarketcap.pricingdate DESC, usdmarketcap DESC
         """
+        params += [asofdate, mktcap_thres]
 
-        return self.database.query_all(query)
+        return self.database.query_all(query, tuple(params))
     
 
+    def query_market_cap_universe(self, dates, mktcap_thres: float, countries=None, allow_fuzzy: bool = False,
+                                  chunksize: int = 60) -> pd.DataFrame:
+        """Query the companies above a market cap threshold for many dates at once.
+
+        One set-based query per `chunksize` dates instead of one query per date. For each
+        date and company it takes the latest market cap within the window (the date itself,
+        or the 3 days before it with `allow_fuzzy`) and converts it at the latest USD rate
+        (latestsnapflag = 1) of the trading item currency within the same window. Unlike
+        `query_global_market_cap`, a fuzzy window yields one row per company, not one per
+        pricing date, and the rate does not have to be from the as-of date itself.
+
+        Args:
+            dates: As-of dates, e.g. month ends
+            mktcap_thres: The market cap threshold (in million USD)
+            countries: Country code or list of country codes; None or "Global" for all countries
+            allow_fuzzy: If True, use the latest market cap within 3 days before each date
+            chunksize: Number of dates per query
+        Returns:
+            pd.DataFrame: One row per (asofdate, companyid) with market cap, USD market cap and
+                company details, ordered by date and descending USD market cap
+        """
+        dates = sorted(set(pd.to_datetime(list(dates)).strftime("%Y-%m-%d")))
+        if countries == "Global":
+            countries = None
+        elif isinstance(countries, str):
+            countries = [countries]
+
+        frames = []
+        for start in range(0, max(len(dates), 1), chunksize):
+            sql, params = _market_cap_universe_sql(dates[start:start + chunksize], mktcap_thres, countries,
+                                                   3 if allow_fuzzy else 0)
+            frames.append(self._query_bulk(sql, params))
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df['asofdate'] = pd.to_datetime(df['asofdate'])
+        return df
+
     def get_security_info(self, ticker: str, country: str) -> pd.DataFrame:
         """Get company, security, and trading item information for a ticker
         
@@ -125,28 +582,7 @@ class TaskManagerRepository:
         Returns:
             pd.DataFrame: Security information
         """
-        if country == "all":
-            country_filter = ""
-        else:
-            country_filter = f"and cg.isocountry2 = '{country}'"
-        sql = f"""
-        select t.*, s.*, c.*, upper(cg.isocountry2) as countrycode, tis.*
-        from ciqtradingitem t
-        join ciqsecurity s on t.securityid = s.securityid
-        join ciqcompany c on s.companyid = c.companyid
-        join ciqcountrygeo cg on c.countryid = cg.countryid
-        join ciqtradingitemstatus tis on t.tradingitemstatusid = tis.tradingitemstatusid
-        where t.tickersymbol = '{ticker}'
-        {country_filter}
-        and
-        t.primaryflag = 1
-        and
-        s.primaryflag = 1
-        and 
-        -- 4: delisted, 5: expired; 11: inactive; 8: merged
-        t.tradingitemstatusid not in (4, 5, 8, 11)
-        """
-        return self.database.query_all(sql)
+        return self.database.query_all(*_security_info_sql(ticker, country))
 
     def get_metadata_info(self, ticker: str, country: str) -> int:
         """Get company id for a given ticker
@@ -157,49 +593,73 @@ class TaskManagerRepository:
         Returns:
             int: Company id
         """
-        _df = self.get_security_info(ticker, country)
-
-        if len(_df) > 1 or len(_df) == 0:
-            raise Exception(f"Multiple or no security found for {ticker}")
-        else:
-            return _df.iloc[0]
+        return _single_security(self.get_security_info(ticker, country), ticker)
 
 
-    def get_company_transcriptsid(self, companyid: int, last_refresh_day: str) -> pd.DataFrame:
+    def get_company_transcriptsid(self, companyid: int, last_refresh_day: str,
+                                  after_transcriptid: int = None) -> pd.DataFrame:
         """
-        Get the transcripts of given companies id from start date to end date
+        Get the latest transcript per earnings call of a company created after a date
         Args:
             companyid (int): company id e.g. 11686323
-        
+            last_refresh_day (str): only transcripts created after this day (or timestamp)
+            after_transcriptid (int): high-water mark; if given, only transcripts created after
+                (last_refresh_day, after_transcriptid) are returned
+
         Returns:
-            pd.DataFrame: Transcript metadata
+            pd.DataFrame: Transcript metadata, one row per keydevid, ordered by earnings call date
         """
-        datestart = pd.to_datetime(last_refresh_day).strftime("%Y-%m-%d")
+        return self.database.query_all(*_company_transcriptsid_sql(companyid, last_refresh_day, after_transcriptid))
 
-        sql = f"""
-            SELECT t.transcriptId, t.transcriptCreationDateUTC, ete.objectId companyid, t.keyDevId, t.transcriptCollectionTypeId,
-            e.mostImportantDateUTC as EarningsCallDateUTC, e.announcedDateUTC,
-            eb.fiscalyear, eb.fiscalquarter
-            FROM targetskma.ciqTranscript t
-            JOIN targetskma.ciqEvent e ON e.keyDevId = t.keyDevId
-            JOIN targetskma.ciqEventToObjectToEventType ete ON ete.keyDevId = t.keyDevId
-            JOIN targetskma.ciqEventType et ON et.keyDevEventTypeId = ete.keyDevEventTypeId
-            JOIN targetskma.ciqeventcallbasicinfo eb on eb.keyDevId = t.keyDevId
-            WHERE et.keyDevEventTypeId='48' --Earnings Calls
-            AND ete.objectId = {companyid}   
-            AND t.transcriptCreationDateUTC > '{datestart}'
-            ORDER BY e.mostImportantDateUTC asc;
-            """
+    def get_companies_transcriptsid(self, companyids: list[int], last_refresh_day,
+                                    after_transcriptids: list = None, chunksize: int = 1000) -> pd.DataFrame:
+        """
+        Get the latest transcript per earnings call for many companies with a few chunked queries
+        Args:
+            companyids (list): list of company ids
+            last_refresh_day (str or list): only transcripts created after this day (or timestamp);
+                either one value for all companies or one per company
+            after_transcriptids (list): optional high-water mark transcript id per company (None for
+                companies without one), see `get_company_transcriptsid`
+            chunksize (int): number of companies per query
+        Returns:
+            pd.DataFrame: Transcript metadata, one row per (companyid, keydevid), ordered by
+                companyid and earnings call date
+        """
+        companyids = _id_list(companyids)
+        since = [last_refresh_day] * len(companyids) if isinstance(last_refresh_day, str) else list(last_refresh_day)
+        after = [None] * len(companyids) if after_transcriptids is None else list(after_transcriptids)
+        if not len(since) == len(after) == len(companyids):
+            raise ValueError("last_refresh_day and after_transcriptids must have one value per company")
+
+        frames = []
+        for start in range(0, max(len(companyids), 1), chunksize):
+            end = start + chunksize
+            frames.append(self.database.query_all(
+                *_companies_transcriptsid_sql(companyids[start:end], since[start:end], after[start:end])))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def get_latest_transcriptid(self, companyids, last_refresh_day: str = None):
+        """
+        Get the transcript id of the most recent earnings call of one or many companies
+        Args:
+            companyids (int or list): company id, or list of company ids
+            last_refresh_day (str): only look at transcripts created after this day (default: one year ago)
 
-        df = self.database.query_all(sql)
-        et_ref = df.sort_values(['keydevid', 'transcriptcreationdateutc']).drop_duplicates('keydevid', keep='last') # get the max id, that is with latest transcriptcreationdateutc
-        return et_ref
+        Returns:
+            int for a single company; pd.Series of transcript ids indexed by companyid for a list
+                (companies without transcripts are left out)
+        """
+        if last_refresh_day is None:
+            last_refresh_day = (pd.Timestamp.now() - pd.Timedelta(days=365)).strftime("%Y-%m-%d")
+        if not isinstance(companyids, (list, tuple, set, pd.Series, pd.Index)):
+            df = self.get_company_transcriptsid(companyids, last_refresh_day)
+            if df.empty:
+                raise Exception(f"No transcript found for {companyids} since {last_refresh_day}")
+            return int(df['transcriptid'].iloc[-1])
 
-    def get_latest_transcriptid(self, companyids: list[int], last_refresh_day: str) -> int:
-        # last refresh day should be today - 1 year
-        last_refresh_day = (pd.Timestamp.now() - pd.Timedelta(days=365)).strftime("%Y-%m-%d")
-        df = self.get_company_transcriptsid(companyids, last_refresh_day)
-        return df.tail(1)['transcriptid'].values[0]
+        df = self.get_companies_transcriptsid(list(companyids), last_refresh_day)
+        return df.groupby('companyid')['transcriptid'].last()
 
     def get_transcript(self, ls_transcript_ids):
         """
@@ -209,169 +669,189 @@ class TaskManagerRepository:
         Returns:
             pd.DataFrame: Transcript data
         """
-        sql = f"""
-        select tc.transcriptComponentId, tc.transcriptId, tc.componentOrder, tc.transcriptComponentTypeId, 
-        tc.transcriptPersonId, CAST(tc.componentText AS TEXT) AS componentText, tct.transcriptComponentTypeName, tp.transcriptPersonName, tst.speakerTypeName, pb.title
-        from targetskma.ciqTranscriptComponent tc
-        LEFT JOIN targetskma.ciqTranscriptPerson tp on tc.transcriptPersonId = tp.transcriptPersonId
-        LEFT JOIN targetskma.ciqTranscriptSpeakerType tst on tst.speakerTypeId = tp.speakerTypeId
-        LEFT JOIN targetskma.ciqProfessional pb on pb.proId= tp.proId
-        LEFT JOIN targetskma.ciqTranscriptComponentType tct on tc.transcriptComponentTypeId = tct.transcriptComponentTypeId
-        where transcriptId in ({', '.join([str(id) for id in ls_transcript_ids])}) 
-        order by transcriptId, componentOrder
-        """
+        return self._query_ids(*_transcript_sql(ls_transcript_ids))
 
-        return self.database.query_all(sql)
+    def iter_transcripts(self, ls_transcript_ids, id_chunksize: int = 200,
+                         chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Stream transcripts one at a time, see `get_transcript`
+        Args:
+            ls_transcript_ids (list): list of transcriptid
+            id_chunksize (int): number of transcripts per query
+            chunksize (int): number of component rows fetched per round trip
+        Yields:
+            pd.DataFrame: components of one transcript in componentOrder, in transcriptid order
+        """
+        ids = sorted(set(_id_list(ls_transcript_ids)))
+        for start in range(0, len(ids), id_chunksize):
+            pending = None
+            for df in self.database.query_iter(*_transcript_sql(ids[start:start + id_chunksize]), chunksize=chunksize):
+                if pending is not None:
+                    df = pd.concat([pending, df], ignore_index=True)
+                if df.empty:
+                    continue
+                # the last transcript of a chunk may continue in the next one
+                boundaries = df.index[df['transcriptid'].ne(df['transcriptid'].shift())].tolist()
+                for begin, end in zip(boundaries[:-1], boundaries[1:]):
+                    yield df.iloc[begin:end].reset_index(drop=True)
+                pending = df.iloc[boundaries[-1]:].reset_index(drop=True)
+            if pending is not None and not pending.empty:
+                yield pending
 
 
     def get_act_q_ref_co(self, ls_ids, dataitemids, startdate):
-        datestart = pd.to_datetime(startdate).strftime("%Y-%m-%d")
-
-        sql = f"""
-            select 
-            EP.periodTypeId
-            , EP.periodenddate
-            , EP.fiscalyear
-            , EP.fiscalquarter
-            , ED.dataitemid
-            , ED.currencyId
-            , ED.dataItemValue
-            , ED.effectiveDate
-            , ED.toDate
-            , ED.estimatescaleid
-            , di.dataitemname
-
-            from ciqEstimatePeriod EP
-            --- link the core estimate table to data table
-            --------------------------------------------------------------
-            join ciqEstimateConsensus EC 
-            on EC.estimatePeriodId = EP.estimatePeriodId
-            join ciqEstimateNumericData ED
-            on ED.estimateConsensusId = EC.estimateConsensusId
-            join ciqdataitem di on di.dataitemid = ED.dataitemid
-            --------------------------------------------------------------
-            where EP.companyId IN ({', '.join([str(id) for id in ls_ids])})
-            and EP.periodTypeId = 2 -- Quarter 
-            and ED.dataItemId in ({', '.join([str(id) for id in dataitemids])})
-            and EP.periodenddate > '{datestart}'
-            and ED.toDate > '2030-01-01'
-
-            order by 4
-        """
-
-        return self.database.query_all(sql)
+        return self._query_ids(*_act_q_ref_co_sql(ls_ids, dataitemids, startdate))
+
+    def get_estimates(self, companyids: list[int], dataitemids: list[int], startdate: str,
+                      chunksize: int = 500) -> pd.DataFrame:
+        """
+        Get current quarterly estimate/actual values for many companies with a few chunked queries
+        Args:
+            companyids (list): list of company ids
+            dataitemids (list): list of estimate data item ids, e.g. [100186, 100284]
+            startdate (str): only periods ending after this date
+            chunksize (int): number of companies per query
+        Returns:
+            pd.DataFrame: long frame, one row per (companyid, periodenddate, dataitemid), with
+                float values, datetime64 dates and a categorical dataitemname
+        """
+        companyids = _id_list(companyids)
+        frames = []
+        for start in range(0, max(len(companyids), 1), chunksize):
+            frames.append(self._query_bulk(*_act_q_ref_co_sql(companyids[start:start + chunksize], dataitemids, startdate)))
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        df = df.astype({'dataitemvalue': float, 'dataitemname': 'category'})
+        df['periodenddate'] = pd.to_datetime(df['periodenddate'])
+        # several current values for the same period: keep the most recently effective one
+        df = df.sort_values(['companyid', 'periodenddate', 'dataitemid', 'effectivedate'], kind='stable')
+        return df.drop_duplicates(['companyid', 'periodenddate', 'dataitemid'], keep='last').reset_index(drop=True)
+
+    def get_estimates_panel(self, companyids: list[int], dataitemids: list[int], startdate: str,
+                            chunksize: int = 500) -> pd.DataFrame:
+        """
+        Get a (companyid, periodenddate) x data item panel of quarterly estimates, see `get_estimates`
+        Args:
+            companyids (list): list of company ids
+            dataitemids (list): list of estimate data item ids
+            startdate (str): only periods ending after this date
+            chunksize (int): number of companies per query
+        Returns:
+            pd.DataFrame: values indexed by (companyid, periodenddate), one column per data item
+                named from ciqdataitem
+        """
+        df = self.get_estimates(companyids, dataitemids, startdate, chunksize=chunksize)
+        df['dataitemname'] = df['dataitemname'].cat.remove_unused_categories()
+        return df.pivot(index=['companyid', 'periodenddate'], columns='dataitemname', values='dataitemvalue')
 
     def get_historical_fundamental(self, ls_ids, ls_dataitemid, periodtypeid = [1, 2], startyear = 2007):
 
         """
         @author: zheng
         """    
-        startdate = pd.to_datetime(f"{startyear}-01-01").strftime("%Y-%m-%d")
-
-        sql = f"""
-                SELECT 
-                fp.companyId, 
-                fi.periodEndDate,
-                fi.filingDate,
-                fi.formtype,
-                fi.currencyid,
-                fp.periodTypeId, 
-                fp.calendarQuarter, 
-                fp.calendarYear,
-                fd.dataItemId,
-                fd.dataItemValue,
-                fid.instanceDate,
-                di.dataitemname
-                
-                FROM ciqFinPeriod fp 
-                join ciqFinInstance fi on fi.financialPeriodId = fp.financialPeriodId 
-                join ciqFinInstanceDate fid on fid.financialInstanceId = fi.financialInstanceId
-                join ciqFinInstanceToCollection ic on ic.financialInstanceId = fi.financialInstanceId 
-                join ciqFinCollectionData fd on fd.financialCollectionId = ic.financialCollectionId 
-                join ciqdataitem di on di.dataitemid = fd.dataItemId
-                
-                WHERE fd.dataItemId in ({', '.join([str(id) for id in ls_dataitemid])})  
-                AND    fp.companyId in ({', '.join([str(id) for id in ls_ids])})
-                AND    fp.calendarYear >= '{startyear}'
-                AND    fp.periodTypeId in ({', '.join([str(id) for id in periodtypeid])}) --quarterly 
-                AND  fi.periodEndDate >= '{startdate}'
-                
-            """
+        sql, params = _historical_fundamental_sql(ls_ids, ls_dataitemid, periodtypeid, startyear)
         
-        df = self.database.query_all(sql)   
+        df = self._query_ids(sql, params, id_param=1)
 
         # round the dataitemvalue to 2 decimal places
-        df['dataitemvalue'] = df['dataitemvalue'].astype(float).round(2)
-        return df
+        return _round_floats(df, {'dataitemvalue': 2})
+
+    def iter_historical_fundamental(self, ls_ids, ls_dataitemid, periodtypeid = [1, 2], startyear = 2007,
+                                    chunksize: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        Stream historical fundamentals in chunks, see `get_historical_fundamental`
+        Args:
+            chunksize (int): number of rows per yielded DataFrame
+        Yields:
+            pd.DataFrame: chunk of fundamental data
+        """
+        sql, params = _historical_fundamental_sql(ls_ids, ls_dataitemid, periodtypeid, startyear)
+
+        for df in self.database.query_iter(sql, params, chunksize=chunksize):
+            yield _round_floats(df, {'dataitemvalue': 2})
+
+    def get_point_in_time_fundamentals(self, companyids: list[int], dataitemids: list[int], dates,
+                                       periodtypeid: int = 2, lookback_years: int = 2) -> pd.DataFrame:
+        """
+        Get the fundamentals known as of each date, without look-ahead
+        Args:
+            companyids (list): list of company ids
+            dataitemids (list): list of financial data item ids
+            dates (list): as-of dates, e.g. rebalancing dates
+            periodtypeid (int): 1 annual, 2 quarterly
+            lookback_years (int): years of filings before the first date to look at
+        Returns:
+            pd.DataFrame: latest filed value per (date, companyid) and data item name, see `fundamentals_as_of`
+        """
+        dates = pd.to_datetime(list(dates))
+        startyear = dates.min().year - lookback_years
+        df = self.get_historical_fundamental(companyids, dataitemids, periodtypeid=[periodtypeid], startyear=startyear)
+        return fundamentals_as_of(df, dates, companyids)
 
     def get_key_fundamentals(self, companyids: list[int], dataitemids: list[int], traling_x_years: int = 5) -> pd.DataFrame:
         # today - trailing x years
         startdate = (pd.Timestamp.now() - pd.Timedelta(days=365 * traling_x_years)).strftime("%Y-%m-%d")
         if dataitemids is None:
             dataitemids = [100186, 100284, 100179]
-        _df = self.get_act_q_ref_co(companyids, dataitemids, startdate)
+        _df = self.get_estimates(companyids, dataitemids, startdate)
 
-        # pivot so that the periodenddate is the index
-        _df = _df.pivot(index='periodenddate', columns='dataitemid', values='dataitemvalue').reset_index()
+        # pivot so that (companyid, periodenddate) is the index
+        _df = _df.pivot(index=['companyid', 'periodenddate'], columns='dataitemid', values='dataitemvalue').reset_index()
         _df.rename(columns={100186: 'Revenue', 100284: 'EPS', 100179: 'Normalized EPS'}, inplace=True)
-        _df['Revenue'] = _df['Revenue'].astype(float).round(3)
-        _df['EPS'] = _df['EPS'].astype(float).round(3)
-        _df['Normalized EPS'] = _df['Normalized EPS'].astype(float).round(3)
-        _df['periodenddate'] = pd.to_datetime(_df['periodenddate'])
-        return _df
+        return _round_floats(_df, {col: 3 for col in ['Revenue', 'EPS', 'Normalized EPS'] if col in _df.columns})
 
     def get_past_price(self, companyid: int, traling_x_years: int = 5) -> pd.DataFrame:
 
-        # enddate should be today
-        enddate = pd.Timestamp.now().strftime("%Y-%m-%d")
-        # startdate should be today - 1 year
+        sql, params = _past_price_sql("c.companyId = %s", int(companyid), traling_x_years)
+        return _format_past_price(self._query_bulk(sql, params), PAST_PRICE_COLUMNS)
+
+    def get_past_prices(self, companyids: list[int], traling_x_years: int = 5, chunksize: int = 500) -> pd.DataFrame:
+        """
+        Get past prices for many companies with a few chunked queries
+        Args:
+            companyids (list): list of company ids
+            traling_x_years (int): trailing x years
+            chunksize (int): number of companies per query
+        Returns:
+            pd.DataFrame: long-format prices with companyid, tradingitemid, currencyid and the
+                columns of `get_past_price`, sorted by companyid and pricedate
+        """
+        companyids = list(dict.fromkeys(int(id) for id in companyids))
+        frames = []
+        for i in range(0, max(len(companyids), 1), chunksize):
+            sql, params = _past_price_sql("c.companyId = ANY(%s)", companyids[i:i + chunksize], traling_x_years)
+            frames.append(self._query_bulk(sql, params))
+        return _format_past_price(pd.concat(frames, ignore_index=True), ['companyid', 'tradingitemid', 'currencyid'] + PAST_PRICE_COLUMNS)
+
+    def get_adjusted_prices(self, companyids: list[int], traling_x_years: int = 5, chunksize: int = 500) -> pd.DataFrame:
+        """
+        Get dividend-adjusted prices, daily log returns and total-return indices for many companies
+        Raw prices and the dividend adjustment factor intervals are fetched separately and the
+        factors are applied client-side (see `adjusted_prices.adjusted_returns`), instead of the
+        per-row range join of `get_past_prices`
+        Args:
+            companyids (list): list of company ids
+            traling_x_years (int): trailing x years
+            chunksize (int): number of companies per query
+        Returns:
+            pd.DataFrame: the columns of `get_past_prices` plus logreturn (NaN on the first day) and
+                totalreturn (1.0 on the first day), sorted by companyid and pricedate
+        """
+        companyids = list(dict.fromkeys(int(id) for id in companyids))
         startdate = (pd.Timestamp.now() - pd.Timedelta(days=365 * traling_x_years)).strftime("%Y-%m-%d")
+        frames = []
+        for i in range(0, max(len(companyids), 1), chunksize):
+            sql, params = _past_price_sql("c.companyId = ANY(%s)", companyids[i:i + chunksize], traling_x_years,
+                                          adjust=False)
+            frames.append(self._query_bulk(sql, params))
+        prices = pd.concat(frames, ignore_index=True)
+        factors = self._query_ids(*_div_adj_factor_sql(prices['tradingitemid'].unique(), startdate))
+
+        df = adjusted_returns(prices, factors).sort_values(['companyid', 'pricedate'], kind='stable')
+        columns = ['companyid', 'tradingitemid', 'currencyid'] + PAST_PRICE_COLUMNS
+        result = _format_past_price(df.reset_index(drop=True), columns)
+        return result.assign(logreturn=df['logreturn'].to_numpy(), totalreturn=df['totalreturn'].to_numpy())
 
-        sql = f"""
-        SELECT 
-        c.companyid
-        ,ti.tradingItemId
-        ,ti.currencyid
-        ,mi.priceDate
-        ,mi.priceClose
-        ,mi.priceOpen
-        ,mi.priceHigh
-        ,mi.priceLow
-        ,mi.volume
-        ,mi.vwap
-
-        ,(mi.priceClose*COALESCE(daf.divAdjFactor,1)) divAdjClose
-        ,COALESCE(daf.divAdjFactor,1) as divAdjFactor
-
-        FROM ciqCompany c
-        JOIN ciqSecurity s on s.companyid = c.companyid
-        JOIN ciqTradingItem ti on ti.securityId=s.securityId
-        JOIN miadjprice mi on mi.tradingItemId=ti.tradingItemId
-
-        left join ciqPriceEquityDivAdjFactor daf on mi.tradingItemId=daf.tradingItemId
-        and daf.fromDate<=mi.priceDate --Find dividend adjustment factor on pricing date
-        and (daf.toDate is null or daf.toDate>=mi.priceDate)
-
-        WHERE c.companyId = {companyid}
-        AND s.primaryflag=1 -- empirically makes sense to have these primary flag, lost about 0.03% data
-        AND ti.primaryflag=1
-        AND mi.priceDate >= '{startdate}'
-        AND mi.priceDate <= '{enddate}'
-        ORDER BY mi.priceDate asc;
-        """
-        _df = self.database.query_all(sql)[['pricedate', 'priceclose', 'priceopen', 'pricehigh', 'pricelow', 'volume', 'vwap', 'divadjclose', 'divadjfactor']]
-        # for price, should keep just two digits
-        _df['priceclose'] = _df['priceclose'].astype(float).round(2)
-        _df['priceopen'] = _df['priceopen'].astype(float).round(2)
-        _df['pricehigh'] = _df['pricehigh'].astype(float).round(2)
-        _df['pricelow'] = _df['pricelow'].astype(float).round(2)
-        _df['volume'] = _df['volume'].astype(float).round(2)
-        _df['vwap'] = _df['vwap'].astype(float).round(2)
-        _df['divadjclose'] = _df['divadjclose'].astype(float).round(2)
-        _df['divadjfactor'] = _df['divadjfactor'].astype(float).round(4)
-        _df['pricedate'] = pd.to_datetime(_df['pricedate'])
-        return _df
-    
     def get_past_priceclose(self, companyid: int, traling_x_years: int = 5) -> pd.DataFrame:
         """
         Get past price close for a given company id
@@ -393,12 +873,17 @@ class TaskManagerRepository:
         Returns:
             pd.DataFrame: Dataitem info
         """
-        if all:
-            sql = f"""
-            select * from ciqdataitem
-            """
-        else:
-            sql = f"""
-            select * from ciqdataitem where dataitemid in ({', '.join([str(id) for id in dataitemids])})
-            """
-        return self.database.query_all(sql)
+        sql, params = _dataitem_info_sql(dataitemids, all)
+        return self._query_ids(sql, params) if params else self.database.query_all(sql, params)
+
+    def iter_dataitem_info(self, dataitemids: list[int] = None, all: bool = False,
+                           chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Stream dataitem info in chunks, see `get_dataitem_info`
+        Args:
+            chunksize (int): number of rows per yielded DataFrame
+        Yields:
+            pd.DataFrame: chunk of dataitem info
+        """
+        sql, params = _dataitem_info_sql(dataitemids, all)
+        yield from self.database.query_iter(sql, params, chunksize=chunksize)
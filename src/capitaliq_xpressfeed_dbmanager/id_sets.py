@@ -0,0 +1,61 @@
+import re
+from typing import List, Tuple
+
+# id lists up to this size are sent as one array parameter
+ID_SET_CHUNKSIZE = 5000
+# above this size ids are loaded into a temp table instead of being sent in chunks
+ID_SET_TEMP_TABLE_THRESHOLD = 50000
+
+_PLACEHOLDER = re.compile(r"%s")
+_ANY_BEFORE = re.compile(r"=\s*ANY\s*\(\s*$", re.IGNORECASE)
+_ANY_AFTER = re.compile(r"^\s*\)")
+
+
+def id_set_strategy(n_ids: int, chunksize: int = ID_SET_CHUNKSIZE,
+                    temp_table_threshold: int = ID_SET_TEMP_TABLE_THRESHOLD) -> str:
+    """Pick how an id set of `n_ids` ids is sent: "array", "chunks" or "temp_table"."""
+    if n_ids <= chunksize:
+        return "array"
+    if n_ids <= temp_table_threshold:
+        return "chunks"
+    return "temp_table"
+
+
+def chunk_params(params: Tuple, id_param: int, chunksize: int) -> List[Tuple]:
+    """Split the id array at `params[id_param]` into chunks of `chunksize` ids.
+
+    Returns:
+        list[tuple]: One parameter tuple per chunk
+    """
+    ids = params[id_param]
+    return [
+        params[:id_param] + (ids[start:start + chunksize],) + params[id_param + 1:]
+        for start in range(0, max(len(ids), 1), chunksize)
+    ]
+
+
+def join_id_table(query: str, params: Tuple, id_param: int, table: str) -> Tuple[str, Tuple]:
+    """Replace the `= ANY(%s)` filter bound to `params[id_param]` by a semi-join on `table`.
+
+    Args:
+        query: SQL with `%s` placeholders
+        params: Query parameters
+        id_param: Index of the id array parameter
+        table: Table with an `id` column holding the ids
+
+    Returns:
+        tuple: (query, params) without the id array parameter
+
+    Raises:
+        ValueError: If that parameter is not used as `= ANY(%s)`
+    """
+    placeholders = list(_PLACEHOLDER.finditer(query))
+    if id_param >= len(placeholders):
+        raise ValueError(f"Query has no parameter {id_param}")
+    match = placeholders[id_param]
+    before = _ANY_BEFORE.search(query[:match.start()])
+    after = _ANY_AFTER.search(query[match.end():])
+    if before is None or after is None:
+        raise ValueError(f"Parameter {id_param} is not used as '= ANY(%s)'")
+    sql = f"{query[:before.start()]}IN (SELECT id FROM {table}){query[match.end() + after.end():]}"
+    return sql, params[:id_param] + params[id_param + 1:]
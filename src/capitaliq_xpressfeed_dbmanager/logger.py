@@ -1,33 +1,52 @@
+import atexit
 import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
 import sys
+import threading
 import time
 from collections.abc import Callable
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import wraps
 import asyncio
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
 # Configure logging levels based on environment
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # Options: json, text
+# Query text in logs: whitespace is collapsed, text beyond the limit is cut, and only a sample is logged
+LOG_QUERY_MAX_CHARS = int(os.getenv("LOG_QUERY_MAX_CHARS", "1000"))
+LOG_QUERY_SAMPLE_RATE = float(os.getenv("LOG_QUERY_SAMPLE_RATE", "1.0"))
+
+PACKAGE_LOGGER = "capitaliq_xpressfeed_dbmanager"
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Library default: no output until the application configures logging
+logging.getLogger(PACKAGE_LOGGER).addHandler(logging.NullHandler())
+
+_lock = threading.Lock()
+_handlers = []
+_listener = None
 
-# Create logs directory if it doesn't exist
-os.makedirs("logs", exist_ok=True)
 
-# Configure root logger
-root_logger = logging.getLogger()
-root_logger.setLevel(LOG_LEVEL)
+def _dumps(record: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(record, default=str).decode()
+    return json.dumps(record, default=str)
 
-# Clear existing handlers to avoid duplication
-if root_logger.handlers:
-    root_logger.handlers.clear()
 
 # Custom JSON formatter
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         log_record = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat(),
             "level": record.levelname,
             "message": record.getMessage(),
             "module": record.module,
@@ -38,64 +57,158 @@ class JsonFormatter(logging.Formatter):
         # Add exception info if available
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record["exception"] = record.exc_text
 
         # Add extra fields from record
         if hasattr(record, "extra"):
             log_record.update(record.extra)
 
-        return json.dumps(log_record)
-
-# Create console handler
-console_handler = logging.StreamHandler(sys.stdout)
-if LOG_FORMAT.lower() == "json":
-    console_handler.setFormatter(JsonFormatter())
-else:
-    console_handler.setFormatter(
-        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    )
-root_logger.addHandler(console_handler)
-
-# Create file handler for all logs
-file_handler = logging.FileHandler(f"logs/thefunscreener_{datetime.now().strftime('%Y%m%d')}.log")
-if LOG_FORMAT.lower() == "json":
-    file_handler.setFormatter(JsonFormatter())
-else:
-    file_handler.setFormatter(
-        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    )
-root_logger.addHandler(file_handler)
-
-# Create separate file handler for errors
-error_handler = logging.FileHandler(f"logs/thefunscreener_errors_{datetime.now().strftime('%Y%m%d')}.log")
-error_handler.setLevel(logging.ERROR)
-if LOG_FORMAT.lower() == "json":
-    error_handler.setFormatter(JsonFormatter())
-else:
-    error_handler.setFormatter(
-        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    )
-root_logger.addHandler(error_handler)
+        return _dumps(log_record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that only resolves the message on the calling thread.
+
+    The stock handler formats the whole record before queueing it; here the
+    JSON/text formatting is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = None, fmt: str = None, log_dir: str = "logs", console: bool = True,
+                      files: bool = True, use_queue: bool = True, query_max_chars: int = None,
+                      query_sample_rate: float = None):
+    """Install console and file handlers on the root logger.
+
+    Nothing is configured when the package is imported; applications call
+    this once at startup (calling it again replaces the handlers). With
+    `use_queue`, log calls only put records on a queue and a background
+    thread formats and writes them.
+
+    Args:
+        level: Root log level (default: $LOG_LEVEL or INFO)
+        fmt: "json" or "text" (default: $LOG_FORMAT or json)
+        log_dir: Directory of the daily log files
+        console: Log to stdout
+        files: Log to a daily file and a daily error file in `log_dir`
+        use_queue: Format and write records on a background thread
+        query_max_chars: Characters of query text kept in query logs
+        query_sample_rate: Fraction of queries whose text is logged
+    """
+    global _listener, LOG_QUERY_MAX_CHARS, LOG_QUERY_SAMPLE_RATE
+    level = (level or LOG_LEVEL).upper()
+    fmt = (fmt or LOG_FORMAT).lower()
+    if query_max_chars is not None:
+        LOG_QUERY_MAX_CHARS = query_max_chars
+    if query_sample_rate is not None:
+        LOG_QUERY_SAMPLE_RATE = query_sample_rate
+
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    if files:
+        os.makedirs(log_dir, exist_ok=True)
+        day = datetime.now().strftime('%Y%m%d')
+        handlers.append(logging.FileHandler(os.path.join(log_dir, f"thefunscreener_{day}.log"), delay=True))
+        error_handler = logging.FileHandler(os.path.join(log_dir, f"thefunscreener_errors_{day}.log"), delay=True)
+        error_handler.setLevel(logging.ERROR)
+        handlers.append(error_handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    with _lock:
+        shutdown_logging()
+        root_logger = logging.getLogger()
+        root_logger.setLevel(level)
+        if use_queue:
+            records = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+            _listener.start()
+            installed = [_QueueHandler(records)]
+        else:
+            installed = handlers
+        for handler in installed:
+            root_logger.addHandler(handler)
+        _handlers[:] = installed + (handlers if use_queue else [])
+
+
+def shutdown_logging():
+    """Flush queued records and remove the handlers installed by `configure_logging`."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root_logger = logging.getLogger()
+    for handler in _handlers:
+        root_logger.removeHandler(handler)
+        handler.close()
+    _handlers.clear()
+
+
+atexit.register(shutdown_logging)
+
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the specified name."""
     return logging.getLogger(name)
 
+
+class QueryText:
+    """Query text that is only cleaned up and truncated if the record is emitted."""
+
+    __slots__ = ("query",)
+
+    def __init__(self, query: str):
+        self.query = query
+
+    def __str__(self) -> str:
+        text = " ".join(str(self.query).split())
+        if len(text) > LOG_QUERY_MAX_CHARS:
+            return f"{text[:LOG_QUERY_MAX_CHARS]}... [{len(text) - LOG_QUERY_MAX_CHARS} chars truncated]"
+        return text
+
+
+def log_query(logger: logging.Logger, message: str, query: str, level: int = logging.INFO):
+    """Log query text lazily, subject to sampling and truncation.
+
+    Args:
+        logger: Logger of the calling module
+        message: Prefix, e.g. "Executing query"
+        query: SQL text
+        level: Log level
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_QUERY_SAMPLE_RATE < 1.0 and random.random() >= LOG_QUERY_SAMPLE_RATE:
+        return
+    logger.log(level, "%s: %s", message, QueryText(query), stacklevel=2)
+
 def log_execution_time(func: Callable) -> Callable:
     """Decorator to log function execution time."""
     @wraps(func)
     def sync_wrapper(*args, **kwargs):
         logger = get_logger(func.__module__)
         start_time = time.time()
-        logger.info(f"Starting {func.__name__}")
+        logger.info("Starting %s", func.__name__)
         try:
             result = func(*args, **kwargs)
             execution_time = time.time() - start_time
-            logger.info(f"Completed {func.__name__} in {execution_time:.2f}s")
+            logger.info("Completed %s in %.2fs", func.__name__, execution_time)
             return result
         except Exception as e:
             execution_time = time.time() - start_time
             logger.error(
-                f"Failed {func.__name__} after {execution_time:.2f}s",
+                "Failed %s after %.2fs", func.__name__, execution_time,
                 exc_info=True,
                 extra={"error_type": type(e).__name__}
             )
@@ -105,16 +218,16 @@ def log_execution_time(func: Callable) -> Callable:
     async def async_wrapper(*args, **kwargs):
         logger = get_logger(func.__module__)
         start_time = time.time()
-        logger.info(f"Starting {func.__name__}")
+        logger.info("Starting %s", func.__name__)
         try:
             result = await func(*args, **kwargs)
             execution_time = time.time() - start_time
-            logger.info(f"Completed {func.__name__} in {execution_time:.2f}s")
+            logger.info("Completed %s in %.2fs", func.__name__, execution_time)
             return result
         except Exception as e:
             execution_time = time.time() - start_time
             logger.error(
-                f"Failed {func.__name__} after {execution_time:.2f}s",
+                "Failed %s after %.2fs", func.__name__, execution_time,
                 exc_info=True,
                 extra={"error_type": type(e).__name__}
             )
@@ -135,7 +248,7 @@ def log_api_call(func: Callable) -> Callable:
 
         # Log request
         logger.info(
-            f"API call to {func.__name__}",
+            "API call to %s", func.__name__,
             extra={"request_params": str(kwargs)}
         )
 
@@ -149,7 +262,7 @@ def log_api_call(func: Callable) -> Callable:
                 response_str = response_str[:1000] + "... [truncated]"
 
             logger.info(
-                f"API response from {func.__name__}",
+                "API response from %s", func.__name__,
                 extra={
                     "execution_time": f"{execution_time:.2f}s",
                     "response": response_str
@@ -159,7 +272,7 @@ def log_api_call(func: Callable) -> Callable:
         except Exception as e:
             execution_time = time.time() - start_time
             logger.error(
-                f"API call to {func.__name__} failed",
+                "API call to %s failed", func.__name__,
                 exc_info=True,
                 extra={
                     "execution_time": f"{execution_time:.2f}s",
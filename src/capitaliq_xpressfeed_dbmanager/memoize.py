@@ -0,0 +1,180 @@
+import copy
+import datetime
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_argument(value):
+    """Turn an argument into a hashable key part that is equal for equivalent inputs.
+
+    Numpy scalars become Python scalars, lists/arrays/Series become tuples,
+    sets become sorted tuples and midnight timestamps become "YYYY-MM-DD"
+    strings, so `[24937]`, `np.array([24937])` and `(24937,)` share a key,
+    as do "2024-01-31" and `pd.Timestamp("2024-01-31")`.
+    """
+    if isinstance(value, np.generic) and not isinstance(value, np.datetime64):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime.date, np.datetime64)):
+        value = pd.Timestamp(value)
+        return value.strftime("%Y-%m-%d") if value == value.normalize() else value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return ("set",) + tuple(sorted((normalize_argument(v) for v in value), key=repr))
+    if isinstance(value, dict):
+        return ("dict",) + tuple(sorted((str(k), normalize_argument(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray, pd.Series, pd.Index)):
+        return tuple(normalize_argument(v) for v in value)
+    hash(value)
+    return value
+
+
+def _copy(value):
+    """Copy mutable results so callers cannot change what is cached."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index, np.ndarray)):
+        return value.copy()
+    if isinstance(value, (list, dict, set)):
+        return copy.deepcopy(value)
+    return value
+
+
+class _Pending:
+    """A call in flight that identical concurrent calls wait for."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Memoizer:
+    """Bounded TTL/LRU memo of repository method results with in-flight request coalescing.
+
+    Identical concurrent calls (same method, same normalized arguments) wait
+    for the first one instead of querying the database again. Results are
+    copied on the way in and out, so callers may modify what they get.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0):
+        """Initialize the memo.
+
+        Args:
+            maxsize: Maximum number of memoized results; the least recently used are evicted
+            ttl: Seconds a result is reused (None: until evicted or cleared)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disabled = set()
+        self._entries = OrderedDict()
+        self._inflight: Dict[tuple, _Pending] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def wrap(self, method: Callable, name: Optional[str] = None) -> Callable:
+        """Memoize a (bound) method under `name`, default its `__name__`."""
+        name = name or method.__name__
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if name in self.disabled:
+                return method(*args, **kwargs)
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (name,) + tuple((k, normalize_argument(v)) for k, v in bound.arguments.items())
+            except TypeError:
+                # unhashable or invalid arguments: not memoized
+                return method(*args, **kwargs)
+            return self._call(key, method, args, kwargs)
+
+        return wrapper
+
+    def _call(self, key: tuple, method: Callable, args, kwargs):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return _copy(entry[1])
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = _Pending()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return _copy(pending.value)
+
+        try:
+            value = method(*args, **kwargs)
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            pending.value = _copy(value)
+            with self._lock:
+                self._entries[key] = (time.monotonic(), pending.value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.done.set()
+
+    def enable(self, *names: str):
+        """Memoize the given methods again."""
+        self.disabled.difference_update(names)
+
+    def disable(self, *names: str):
+        """Always call the given methods, e.g. while their tables are being updated."""
+        self.disabled.update(names)
+        self.clear(*names)
+
+    def clear(self, *names: str):
+        """Drop memoized results, of the given methods only if any are named."""
+        with self._lock:
+            if not names:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in names]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        """Return hit, miss, coalesced and eviction counts and the number of entries."""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+def memoize_methods(obj, names: Iterable[str], memoizer: Memoizer) -> Memoizer:
+    """Replace the given methods of `obj` by memoized versions on the instance.
+
+    Calls between the methods (e.g. `get_past_priceclose` calling
+    `get_past_price`) go through the instance and are memoized too.
+    """
+    names = list(names)
+    for name in names:
+        setattr(obj, name, memoizer.wrap(getattr(obj, name), name))
+    logger.debug("Memoizing %s on %s", names, type(obj).__name__)
+    return memoizer
@@ -0,0 +1,438 @@
+import bisect
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+PHASES = ("connect", "execute", "fetch", "build")
+
+# seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+def query_fingerprint(query: str) -> str:
+    """Return a short stable id of a query's text, ignoring whitespace."""
+    return hashlib.sha1(" ".join(query.split()).encode()).hexdigest()[:12]
+
+
+@dataclass
+class QueryMetrics:
+    """Timings and sizes of one database call."""
+
+    operation: str
+    fingerprint: str
+    query: str
+    method: Optional[str] = None
+    connect: float = 0.0
+    execute: float = 0.0
+    fetch: float = 0.0
+    build: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    error: Optional[str] = None
+    plan: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+    _lap: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def total(self) -> float:
+        return self.connect + self.execute + self.fetch + self.build
+
+    def lap(self, phase: str):
+        """Add the time since the previous lap to `phase`."""
+        now = time.perf_counter()
+        setattr(self, phase, getattr(self, phase) + now - self._lap)
+        self._lap = now
+
+    def skip(self):
+        """Leave the time since the previous lap out, e.g. time a stream's consumer held it."""
+        self._lap = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record.pop("_lap")
+        record["total"] = self.total
+        return record
+
+
+class _UnrecordedQuery:
+    """Stands in for QueryMetrics when no sink or method call would see them."""
+
+    rows = 0
+    bytes = 0
+    execute = 0.0
+    plan = None
+
+    def lap(self, phase: str):
+        pass
+
+    def skip(self):
+        pass
+
+
+@dataclass
+class MethodMetrics:
+    """Wall time of one repository method call and the queries it issued."""
+
+    method: str
+    elapsed: float = 0.0
+    queries: int = 0
+    rows: int = 0
+    bytes: int = 0
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# the repository method call the current thread/task is in, if any
+_current_call: ContextVar[Optional[MethodMetrics]] = ContextVar("capitaliq_current_call", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class MetricsSink:
+    """Receives metrics; subclasses override what they need."""
+
+    def record_query(self, metrics: QueryMetrics):
+        pass
+
+    def record_method(self, metrics: MethodMetrics):
+        pass
+
+    def flush(self):
+        pass
+
+
+class InMemorySink(MetricsSink):
+    """Keeps the most recent records and per-method histograms in memory."""
+
+    def __init__(self, maxlen: int = 10000):
+        self.queries = deque(maxlen=maxlen)
+        self.methods = deque(maxlen=maxlen)
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record_query(self, metrics: QueryMetrics):
+        with self._lock:
+            self.queries.append(metrics)
+            for phase in PHASES + ("total",):
+                value = metrics.total if phase == "total" else getattr(metrics, phase)
+                self._histogram(metrics.method or metrics.operation, phase).observe(value)
+
+    def record_method(self, metrics: MethodMetrics):
+        with self._lock:
+            self.methods.append(metrics)
+            self._histogram(metrics.method, "method").observe(metrics.elapsed)
+
+    def summary(self) -> pd.DataFrame:
+        """Per repository method (or database operation outside one): calls and mean/max phase times.
+
+        Returns:
+            pd.DataFrame: One row per method, slowest total time first
+        """
+        with self._lock:
+            records = [m.to_dict() for m in self.queries]
+        if not records:
+            return pd.DataFrame()
+        df = pd.DataFrame(records)
+        df["method"] = df["method"].fillna(df["operation"])
+        summary = df.groupby("method").agg(
+            queries=("total", "size"),
+            total=("total", "sum"),
+            mean=("total", "mean"),
+            max=("total", "max"),
+            **{f"mean_{phase}": (phase, "mean") for phase in PHASES},
+            rows=("rows", "sum"),
+            bytes=("bytes", "sum"),
+            errors=("error", "count"),
+        )
+        return summary.sort_values("total", ascending=False)
+
+    def slow_queries(self, n: int = 10) -> List[QueryMetrics]:
+        """Return the `n` slowest recorded queries."""
+        with self._lock:
+            return sorted(self.queries, key=lambda m: m.total, reverse=True)[:n]
+
+    def _histogram(self, method: str, phase: str) -> Histogram:
+        key = (method, phase)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        return self.histograms[key]
+
+
+class PrometheusTextfileSink(InMemorySink):
+    """Writes the histograms in the Prometheus text format for node_exporter's textfile collector.
+
+    The file is rewritten atomically at most every `interval` seconds and on `flush`.
+    """
+
+    def __init__(self, path: str, interval: float = 15.0, prefix: str = "capitaliq"):
+        super().__init__(maxlen=1)
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self.rows: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._written = 0.0
+
+    def record_query(self, metrics: QueryMetrics):
+        super().record_query(metrics)
+        method = metrics.method or metrics.operation
+        with self._lock:
+            self.rows[method] = self.rows.get(method, 0) + metrics.rows
+            self.bytes[method] = self.bytes.get(method, 0) + metrics.bytes
+            if metrics.error:
+                self.errors[method] = self.errors.get(method, 0) + 1
+        self._maybe_write()
+
+    def record_method(self, metrics: MethodMetrics):
+        super().record_method(metrics)
+        self._maybe_write()
+
+    def flush(self):
+        self._write()
+
+    def _maybe_write(self):
+        if time.time() - self._written >= self.interval:
+            self._write()
+
+    def _write(self):
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_query_seconds Time per query phase, by repository method.",
+            f"# TYPE {p}_query_seconds histogram",
+        ]
+        method_lines = [
+            f"# HELP {p}_method_seconds Wall time of repository method calls.",
+            f"# TYPE {p}_method_seconds histogram",
+        ]
+        with self._lock:
+            for (method, phase), histogram in sorted(self.histograms.items()):
+                if phase == "method":
+                    name, labels, target = f"{p}_method_seconds", f'method="{method}"', method_lines
+                else:
+                    name, labels, target = f"{p}_query_seconds", f'method="{method}",phase="{phase}"', lines
+                for bound, count in zip(histogram.buckets, histogram.cumulative()):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    target.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+                target.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                target.append(f"{name}_count{{{labels}}} {histogram.count}")
+            for metric, values, help_text in (
+                ("query_rows_total", self.rows, "Rows returned by queries."),
+                ("query_bytes_total", self.bytes, "Bytes of the result frames built from queries."),
+                ("query_errors_total", self.errors, "Failed queries."),
+            ):
+                method_lines.append(f"# HELP {p}_{metric} {help_text}")
+                method_lines.append(f"# TYPE {p}_{metric} counter")
+                for method, value in sorted(values.items()):
+                    method_lines.append(f'{p}_{metric}{{method="{method}"}} {value}')
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines + method_lines) + "\n")
+        os.replace(tmp, self.path)
+        self._written = time.time()
+
+
+class JsonLogSink(MetricsSink):
+    """Logs every record as structured fields on the package's JSON log."""
+
+    def __init__(self, level: int = 20, methods_only: bool = False):
+        self.level = level
+        self.methods_only = methods_only
+        self._logger = get_logger(f"{__name__}.events")
+
+    def record_query(self, metrics: QueryMetrics):
+        if not self.methods_only:
+            self._logger.log(self.level, "query metrics", extra={"extra": {"metrics": "query", **metrics.to_dict()}})
+
+    def record_method(self, metrics: MethodMetrics):
+        self._logger.log(self.level, "method metrics", extra={"extra": {"metrics": "method", **metrics.to_dict()}})
+
+
+class Metrics:
+    """Dispatches query and method metrics to the configured sinks.
+
+    With `explain_slow_queries`, queries whose execute phase takes longer
+    than `slow_query_seconds` are run again under
+    `EXPLAIN (ANALYZE, BUFFERS)` and the plan is attached to their metrics.
+    Note that this executes the slow query a second time.
+    """
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None, slow_query_seconds: Optional[float] = None,
+                 explain_slow_queries: bool = False, query_text_length: int = 300):
+        """Initialize the metrics.
+
+        Args:
+            sinks: Sinks receiving the records
+            slow_query_seconds: Execute time from which a query counts as slow (logged as a warning)
+            explain_slow_queries: Capture EXPLAIN (ANALYZE, BUFFERS) plans of slow queries
+            query_text_length: Characters of the query text kept in the records
+        """
+        self.sinks = list(sinks or [])
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow_queries = explain_slow_queries
+        self.query_text_length = query_text_length
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks) or self.slow_query_seconds is not None
+
+    def add_sink(self, sink: MetricsSink) -> MetricsSink:
+        self.sinks.append(sink)
+        return sink
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def is_slow(self, metrics: QueryMetrics) -> bool:
+        return self.slow_query_seconds is not None and metrics.execute >= self.slow_query_seconds
+
+    @contextmanager
+    def measure(self, operation: str, query: str):
+        """Time one database call; phases are marked with `QueryMetrics.lap`.
+
+        Without sinks, a slow query threshold or a tracked method call around
+        it, the call is not timed and a stand-in record is yielded.
+
+        Args:
+            operation: Database method, e.g. "query_all"
+            query: SQL text
+
+        Yields:
+            QueryMetrics: Record to fill in; it is dispatched when the block exits
+        """
+        call = _current_call.get()
+        if call is None and not self.enabled:
+            # nothing reads the record: skip fingerprinting and timing
+            yield _UnrecordedQuery()
+            return
+        metrics = QueryMetrics(operation=operation, fingerprint=query_fingerprint(query),
+                               query=" ".join(query.split())[:self.query_text_length])
+        if call is not None:
+            metrics.method = call.method
+        try:
+            yield metrics
+        except Exception as e:
+            metrics.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if call is not None:
+                call.queries += 1
+                call.rows += metrics.rows
+                call.bytes += metrics.bytes
+            if self.is_slow(metrics):
+                logger.warning("Slow query %s in %s: execute %.2fs, total %.2fs, %d rows", metrics.fingerprint,
+                               metrics.method or operation, metrics.execute, metrics.total, metrics.rows)
+            for sink in self.sinks:
+                sink.record_query(metrics)
+
+    def explain(self, conn, metrics: QueryMetrics, query: str, params: Tuple):
+        """Attach the EXPLAIN (ANALYZE, BUFFERS) plan of a slow query to its metrics."""
+        if not (self.explain_slow_queries and self.is_slow(metrics)):
+            return
+        from .copy_extract import strip_statement
+
+        try:
+            cur = conn.cursor()
+            cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {strip_statement(query)}", params or None)
+            metrics.plan = "\n".join(row[0] for row in cur.fetchall())
+            logger.warning("Plan of slow query %s:\n%s", metrics.fingerprint, metrics.plan)
+        except Exception as e:
+            conn.rollback()
+            logger.warning("Could not explain slow query %s: %s", metrics.fingerprint, e)
+
+    def record_method(self, metrics: MethodMetrics):
+        for sink in self.sinks:
+            sink.record_method(metrics)
+
+
+# process-wide metrics used by databases and repositories unless they are given their own
+default_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide `Metrics`."""
+    return default_metrics
+
+
+def track_method(func):
+    """Attribute the queries issued inside a repository method to that method.
+
+    Nested tracked calls (e.g. `get_metadata_info` calling `get_security_info`)
+    are attributed to the outermost one. Generator methods are left untouched.
+    Method metrics go to the `metrics` of the instance's database, or to
+    `default_metrics` if it has none.
+    """
+    if inspect.isgeneratorfunction(func) or inspect.iscoroutinefunction(func):
+        return func
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        metrics = getattr(getattr(self, "database", None), "metrics", None)
+        if not isinstance(metrics, Metrics):
+            metrics = default_metrics
+        if _current_call.get() is not None or not metrics.enabled:
+            return func(self, *args, **kwargs)
+        call = MethodMetrics(method=func.__name__)
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        except Exception as e:
+            call.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            call.elapsed = time.perf_counter() - start
+            _current_call.reset(token)
+            metrics.record_method(call)
+
+    return wrapper
+
+
+def track_methods(cls):
+    """Class decorator applying `track_method` to every public method."""
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(value):
+            setattr(cls, name, track_method(value))
+    return cls
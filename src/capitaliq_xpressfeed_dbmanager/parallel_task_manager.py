@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+from .db_task_manager import TaskManagerRepository
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one repository call run by ParallelTaskManager."""
+
+    method: str
+    args: tuple
+    kwargs: dict
+    value: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ParallelTaskManager:
+    """Run independent repository queries concurrently on a bounded thread pool.
+
+    Every query checks out its own connection, so with a pooled
+    PostgresDatabase each worker holds one pooled connection while it runs
+    (the pool should allow at least `max_workers` connections). Results are
+    returned in submission order and errors are captured per task instead of
+    aborting the batch.
+    """
+
+    def __init__(self, repository: TaskManagerRepository, max_workers: int = 8):
+        """Initialize the executor.
+
+        Args:
+            repository: Repository whose methods are run
+            max_workers: Number of worker threads, i.e. concurrent queries
+        """
+        self.repository = repository
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ciq-query")
+
+        pool = getattr(repository.database, "pool", None)
+        if pool is not None and pool.maxsize < max_workers:
+            logger.warning("Connection pool maxsize %d is below max_workers %d, workers will wait for connections",
+                           pool.maxsize, max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Wait for running tasks and stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+    def run(self, tasks: Iterable[tuple]) -> List[TaskResult]:
+        """Run heterogeneous repository calls concurrently.
+
+        Args:
+            tasks: Iterable of (method name, args tuple[, kwargs dict]), e.g.
+                ("get_past_price", (24937,), {"traling_x_years": 1})
+
+        Returns:
+            list[TaskResult]: One result per task, in submission order
+        """
+        results = []
+        futures = []
+        for task in tasks:
+            method, args = task[0], tuple(task[1]) if len(task) > 1 else ()
+            kwargs = dict(task[2]) if len(task) > 2 else {}
+            result = TaskResult(method=method, args=args, kwargs=kwargs)
+            results.append(result)
+            futures.append(self._executor.submit(self._call, result))
+        for future in futures:
+            future.result()
+
+        failed = sum(not result.ok for result in results)
+        if failed:
+            logger.warning("%d of %d parallel tasks failed", failed, len(results))
+        return results
+
+    def map(self, method: str, args: Iterable, **kwargs) -> List[TaskResult]:
+        """Call one repository method for many arguments concurrently.
+
+        Args:
+            method: Repository method name, e.g. "get_past_price"
+            args: Iterable of arguments; tuples are unpacked as positional arguments
+            **kwargs: Keyword arguments passed to every call
+
+        Returns:
+            list[TaskResult]: One result per argument, in order
+        """
+        return self.run((method, a if isinstance(a, tuple) else (a,), kwargs) for a in args)
+
+    def get_past_price(self, companyids: Iterable[int], traling_x_years: int = 5) -> List[TaskResult]:
+        """Fan `get_past_price` out over a list of companies.
+
+        Args:
+            companyids: Company ids
+            traling_x_years: Trailing years of prices
+
+        Returns:
+            list[TaskResult]: One result per company, in order
+        """
+        return self.map("get_past_price", companyids, traling_x_years=traling_x_years)
+
+    def get_price_and_fundamentals(self, companyids: Iterable[int], dataitemids: list[int] = None,
+                                   traling_x_years: int = 5) -> List[tuple]:
+        """Run `get_past_price` and `get_key_fundamentals` side by side for each company.
+
+        Args:
+            companyids: Company ids
+            dataitemids: Estimate data item ids for `get_key_fundamentals`
+            traling_x_years: Trailing years for both queries
+
+        Returns:
+            list[tuple[TaskResult, TaskResult]]: (price, fundamentals) per company, in order
+        """
+        tasks = []
+        for companyid in companyids:
+            tasks.append(("get_past_price", (companyid,), {"traling_x_years": traling_x_years}))
+            tasks.append(("get_key_fundamentals", ([companyid], dataitemids), {"traling_x_years": traling_x_years}))
+        results = self.run(tasks)
+        return list(zip(results[::2], results[1::2]))
+
+    def _call(self, result: TaskResult):
+        start = time.perf_counter()
+        try:
+            result.value = getattr(self.repository, result.method)(*result.args, **result.kwargs)
+        except Exception as e:
+            result.error = e
+            logger.error("Parallel task %s%s failed: %s", result.method, result.args, e)
+        finally:
+            result.elapsed = time.perf_counter() - start
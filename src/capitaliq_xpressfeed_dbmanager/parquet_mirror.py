@@ -0,0 +1,249 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .arrow_backend import pa, require_pyarrow
+from .base_database import BaseDatabase
+from .logger import get_logger, log_query
+from .prepared_statements import to_numbered_placeholders
+from .query_cache import referenced_tables
+
+try:
+    import duckdb
+    import pyarrow.dataset as ds
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None
+    ds = None
+
+# Initialize logger
+logger = get_logger(__name__)
+
+# table -> (date column partitioned by month, id column hashed into buckets); tables
+# without a date column are small and re-exported as a whole on every sync
+MIRROR_TABLES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    "miadjprice": ("pricedate", "tradingitemid"),
+    "ciqmarketcap": ("pricingdate", "companyid"),
+    "ciqexchangerate": ("pricedate", None),
+    "ciqpriceequitydivadjfactor": (None, "tradingitemid"),
+    "ciqcompany": (None, None),
+    "ciqsecurity": (None, None),
+    "ciqtradingitem": (None, None),
+    "ciqcurrency": (None, None),
+    "ciqexchange": (None, None),
+    "ciqcountrygeo": (None, None),
+}
+
+
+def _partition_columns(spec: Tuple[Optional[str], Optional[str]]) -> list:
+    date_column, bucket_column = spec
+    return (["month"] if date_column else []) + (["bucket"] if bucket_column else [])
+
+
+class ParquetMirror:
+    """Incremental Parquet export of the price and market cap tables.
+
+    Each table is written under `root/<table>/` as a hive-partitioned dataset,
+    by month of its date column and by `id % buckets` of its id column. A sync
+    re-exports every month from the last exported date (minus `overlap_days`,
+    to pick up late corrections) onwards, replacing those month partitions;
+    older months are left untouched. Use `sync(full=True)` after historical
+    restatements such as split adjustments.
+    """
+
+    def __init__(self, database, root: str = "data/mirror", tables: Optional[Iterable[str]] = None,
+                 buckets: int = 16, start: str = "2000-01-01", overlap_days: int = 7):
+        """Initialize the mirror.
+
+        Args:
+            database: PostgresDatabase the tables are exported from
+            root: Directory of the Parquet store
+            tables: Tables to mirror (default: all of MIRROR_TABLES)
+            buckets: Number of id buckets per month
+            start: First date exported by an initial or full sync
+            overlap_days: Days before the last exported date that are re-exported
+        """
+        require_pyarrow()
+        self.database = database
+        self.root = root
+        self.tables = {name: MIRROR_TABLES[name] for name in (tables or MIRROR_TABLES)}
+        self.buckets = buckets
+        self.start = pd.Timestamp(start)
+        self.overlap_days = overlap_days
+        self._state_path = os.path.join(root, "_state.json")
+
+    def sync(self, full: bool = False) -> Dict[str, int]:
+        """Export new data of all mirrored tables.
+
+        Args:
+            full: Re-export everything from `start` instead of from the last exported date
+
+        Returns:
+            dict: Table -> number of rows written
+        """
+        os.makedirs(self.root, exist_ok=True)
+        state = self._load_state()
+        written = {}
+        for name, (date_column, bucket_column) in self.tables.items():
+            if date_column is None:
+                written[name] = self._export_snapshot(name, bucket_column)
+                continue
+            last = None if full or name not in state else pd.Timestamp(state[name])
+            since = self.start if last is None else max(self.start, last - pd.Timedelta(days=self.overlap_days))
+            written[name], latest = self._export_months(name, date_column, bucket_column, since)
+            if latest is not None:
+                state[name] = latest.strftime("%Y-%m-%d")
+            self._save_state(state)
+        logger.info("Mirror sync wrote %d rows: %s", sum(written.values()), written)
+        return written
+
+    def _export_months(self, name: str, date_column: str, bucket_column: Optional[str],
+                       since: pd.Timestamp) -> Tuple[int, Optional[pd.Timestamp]]:
+        total, latest = 0, None
+        end = pd.Timestamp.now().normalize() + pd.offsets.MonthBegin(1)
+        for month in pd.date_range(since.to_period("M").to_timestamp(), end, freq="MS", inclusive="left"):
+            table = self.database.query_arrow(
+                f"SELECT * FROM {name} WHERE {date_column} >= %s AND {date_column} < %s",
+                (month.strftime("%Y-%m-%d"), (month + pd.offsets.MonthBegin(1)).strftime("%Y-%m-%d")),
+            )
+            month_dir = os.path.join(self.root, name, f"month={month.strftime('%Y-%m')}")
+            shutil.rmtree(month_dir, ignore_errors=True)
+            if table.num_rows == 0:
+                continue
+            table = table.append_column("month", pa.array([month.strftime("%Y-%m")] * table.num_rows))
+            self._write(name, table, bucket_column)
+            total += table.num_rows
+            latest = pd.Timestamp(max(table[date_column].to_pylist()))
+        return total, latest
+
+    def _export_snapshot(self, name: str, bucket_column: Optional[str]) -> int:
+        table = self.database.query_arrow(f"SELECT * FROM {name}")
+        # write next to the old snapshot and swap, so readers never see a partial table
+        target = os.path.join(self.root, name)
+        staging = f"{target}.staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        self._write(name, table, bucket_column, staging)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        return table.num_rows
+
+    def _write(self, name: str, table: "pa.Table", bucket_column: Optional[str], base_dir: Optional[str] = None):
+        if bucket_column is not None:
+            buckets = np.asarray(table[bucket_column].to_numpy(zero_copy_only=False)) % self.buckets
+            table = table.append_column("bucket", pa.array(buckets.astype("int32")))
+        partitioning = _partition_columns(self.tables[name])
+        os.makedirs(base_dir or os.path.join(self.root, name), exist_ok=True)
+        ds.write_dataset(
+            table,
+            base_dir or os.path.join(self.root, name),
+            format="parquet",
+            partitioning=partitioning or None,
+            partitioning_flavor="hive" if partitioning else None,
+            existing_data_behavior="overwrite_or_ignore",
+            basename_template="part-{i}.parquet",
+        )
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self._state_path):
+            return {}
+        with open(self._state_path, "r") as f:
+            return json.load(f)
+
+    def _save_state(self, state: dict):
+        tmp = f"{self._state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._state_path)
+
+
+class MirrorDatabase(BaseDatabase):
+    """Serve repository queries from a `ParquetMirror` store through DuckDB.
+
+    Every mirrored table is exposed as a DuckDB view over its Parquet files,
+    so the repository SQL runs unchanged (`%s` placeholders are translated to
+    DuckDB's `$n`). Queries that read tables which are not mirrored go to the
+    `fallback` database if one is given.
+    """
+
+    def __init__(self, root: str = "data/mirror", fallback: Optional[BaseDatabase] = None,
+                 threads: Optional[int] = None):
+        """Open the mirror.
+
+        Args:
+            root: Directory of the Parquet store
+            fallback: Database answering queries on tables that are not mirrored
+            threads: DuckDB worker threads (default: all cores)
+        """
+        if duckdb is None:
+            raise ImportError("MirrorDatabase requires duckdb and pyarrow: "
+                              "pip install 'capitaliq-xpressfeed-dbmanager[mirror]'")
+        self.root = root
+        self.fallback = fallback
+        self._conn = duckdb.connect(":memory:")
+        if threads is not None:
+            self._conn.execute(f"SET threads = {int(threads)}")
+        self._lock = threading.Lock()
+        self.tables = set()
+        self.refresh()
+
+    def refresh(self):
+        """(Re)create the views, e.g. after tables were added to the mirror."""
+        tables = set()
+        for name, spec in MIRROR_TABLES.items():
+            path = os.path.join(self.root, name)
+            if not glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True):
+                continue
+            partitions = _partition_columns(spec)
+            exclude = f" EXCLUDE ({', '.join(partitions)})" if partitions else ""
+            files = os.path.join(path, "**", "*.parquet").replace("'", "''")
+            with self._lock:
+                self._conn.execute(
+                    f"CREATE OR REPLACE VIEW {name} AS SELECT *{exclude} "
+                    f"FROM read_parquet('{files}', hive_partitioning = {str(bool(partitions)).lower()})"
+                )
+            tables.add(name)
+        self.tables = tables
+        logger.info("Mirror at %s serves %s", self.root, sorted(tables))
+
+    @contextmanager
+    def get_connection(self):
+        """Get a DuckDB cursor; each cursor can be used from its own thread."""
+        with self._lock:
+            cur = self._conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    def query_all(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Execute a query on the mirror, or on the fallback if it reads other tables.
+
+        Args:
+            query: SQL query with `%s` placeholders
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results with lower-case column names, like PostgreSQL
+        """
+        if self.fallback is not None and not referenced_tables(query) <= self.tables:
+            return self.fallback.query_all(query, params)
+
+        sql, _ = to_numbered_placeholders(query)
+        with self.get_connection() as cur:
+            log_query(logger, "Executing query on mirror", query)
+            df = cur.execute(sql, list(params)).df()
+        df.columns = [column.lower() for column in df.columns]
+        logger.info("Query executed successfully on mirror! Total rows: %d", len(df))
+        return df
+
+    def close(self):
+        """Close DuckDB and the fallback database."""
+        self._conn.close()
+        if self.fallback is not None:
+            self.fallback.close()
@@ -0,0 +1,64 @@
+"""Mapping of PostgreSQL type OIDs (as reported in `cursor.description`) to column kinds."""
+
+# builtin type OIDs, see pg_type.dat in the PostgreSQL sources
+BOOL = 16
+CHAR = 18
+NAME = 19
+INT8 = 20
+INT2 = 21
+INT4 = 23
+TEXT = 25
+OID = 26
+FLOAT4 = 700
+FLOAT8 = 701
+BPCHAR = 1042
+VARCHAR = 1043
+NUMERIC = 1700
+DATE = 1082
+TIMESTAMP = 1114
+TIMESTAMPTZ = 1184
+JSON = 114
+JSONB = 3802
+
+INTEGER_OIDS = frozenset({INT8, INT2, INT4, OID})
+FLOAT_OIDS = frozenset({FLOAT4, FLOAT8, NUMERIC})
+TEXT_OIDS = frozenset({CHAR, NAME, TEXT, BPCHAR, VARCHAR})
+JSON_OIDS = frozenset({JSON, JSONB})
+# element type OIDs of one-dimensional arrays of the types above, by array type OID
+ARRAY_ELEMENT_OIDS = {
+    1000: BOOL, 1002: CHAR, 1003: NAME, 1005: INT2, 1007: INT4, 1009: TEXT, 1014: BPCHAR, 1015: VARCHAR,
+    1016: INT8, 1021: FLOAT4, 1022: FLOAT8, 1028: OID, 1115: TIMESTAMP, 1182: DATE, 1185: TIMESTAMPTZ,
+    1231: NUMERIC,
+}
+
+
+def column_kind(type_code: int) -> str:
+    """Classify a column by its type OID.
+
+    Args:
+        type_code: Type OID from `cursor.description`
+
+    Returns:
+        str: One of "bool", "int", "float", "date", "timestamp", "timestamptz",
+            "text", "json", "array" (see `ARRAY_ELEMENT_OIDS`) or "other"
+            (intervals, uuids, ...)
+    """
+    if type_code == BOOL:
+        return "bool"
+    if type_code in INTEGER_OIDS:
+        return "int"
+    if type_code in FLOAT_OIDS:
+        return "float"
+    if type_code == DATE:
+        return "date"
+    if type_code == TIMESTAMP:
+        return "timestamp"
+    if type_code == TIMESTAMPTZ:
+        return "timestamptz"
+    if type_code in TEXT_OIDS:
+        return "text"
+    if type_code in JSON_OIDS:
+        return "json"
+    if type_code in ARRAY_ELEMENT_OIDS:
+        return "array"
+    return "other"
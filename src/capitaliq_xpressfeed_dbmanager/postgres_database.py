@@ -1,63 +1,510 @@
-from typing import Tuple, List
+from typing import Iterator, Tuple, List
+from uuid import uuid4
+import io
+import json
+import threading
 import psycopg2
+import psycopg2.errors
 import pandas as pd
+from .arrow_backend import NUMERIC_AS_FLOAT, fetch_table, iter_batches, pq, require_pyarrow, table_to_pandas
 from .base_database import BaseDatabase
-from .logger import get_logger
+from .connection_pool import ConnectionPool
+from .id_sets import ID_SET_CHUNKSIZE, ID_SET_TEMP_TABLE_THRESHOLD, chunk_params, id_set_strategy, join_id_table
+from .copy_extract import copy_statement, read_copy_csv, strip_statement
+from .logger import get_logger, log_query
+from .metrics import Metrics, default_metrics
+from .prepared_statements import PreparedStatementConnection, execute_prepared
+from .resilience import CircuitBreaker, RetryPolicy, call_with_retry
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
 # Initialize logger
 logger = get_logger(__name__)
 
+# set while a retried call runs, so nested calls (e.g. query_all -> query_arrow) are not retried twice
+_in_retried_call = ContextVar("in_retried_call", default=False)
+
+
+def _retried(method):
+    """Run a read-only query method under the database's retry policy and circuit breaker."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _in_retried_call.get():
+            return method(self, *args, **kwargs)
+        token = _in_retried_call.set(True)
+        try:
+            return call_with_retry(lambda: method(self, *args, **kwargs), self.retry, self.circuit_breaker,
+                                   method.__name__)
+        finally:
+            _in_retried_call.reset(token)
+    return wrapper
+
+
 class PostgresDatabase(BaseDatabase):
     """Postgres database class providing PostgresQL connection handling."""
 
-    def __init__(self, dbname: str, user: str, password:str="", host: str="localhost", port: int=5432):
+    def __init__(self, dbname: str, user: str, password:str="", host: str="localhost", port: int=5432,
+                 pool: bool = False, pool_minsize: int = 1, pool_maxsize: int = 10,
+                 pool_max_idle: float = 300.0, pool_max_lifetime: float = 3600.0,
+                 result_backend: str = "pandas", prepare: bool = False, metrics: Metrics = None,
+                 statement_timeout: float = None, connect_timeout: int = None, retry: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None):
         """Initialize database with configuration.
 
         Args:
-            config: Database configuration containing connection details
+            dbname: Database name
+            user: Database user
+            password: Database password (ignored for localhost)
+            host: Database host
+            port: Database port
+            pool: If True, reuse connections from a pool instead of connecting per query
+            pool_minsize: Connections kept open by the pool even when idle
+            pool_maxsize: Maximum number of pooled connections
+            pool_max_idle: Seconds after which surplus idle connections are closed
+            pool_max_lifetime: Seconds after which a pooled connection is recycled
+            result_backend: "pandas" builds results from Python tuples (NUMERIC as
+                Decimal); "arrow" builds typed Arrow columns first (NUMERIC as float64,
+                dates as datetime64) and converts them to pandas
+            prepare: If True, parameterized queries run as server-side prepared
+                statements that are reused per connection (most useful with `pool`)
+            metrics: Where connect/execute/fetch/build timings of queries are reported
+                (default: the process-wide `metrics.default_metrics`)
+            statement_timeout: Default seconds after which the server cancels a statement
+                (None: the server setting); override per call with `timeout`
+            connect_timeout: Seconds to wait for a new connection (None: no limit)
+            retry: Retry policy for transient errors (connection failures, deadlocks,
+                serialization failures, server restarts) of read queries and of the
+                connection test (default: RetryPolicy(), i.e. 3 attempts)
+            circuit_breaker: If given, fail fast with CircuitOpenError while the
+                database keeps failing instead of letting every worker wait for it
+
+        Raises:
+            psycopg2.OperationalError: If the database cannot be reached
         """
+        if result_backend not in ("pandas", "arrow"):
+            raise ValueError(f"Unknown result backend: {result_backend}")
+        if result_backend == "arrow":
+            require_pyarrow()
+        self.result_backend = result_backend
+        self.metrics = metrics if metrics is not None else default_metrics
+
         if host == "localhost":
             self.config = dict(dbname=dbname, user=user)
         else:
             self.config = dict(dbname=dbname, user=user, password=password, host=host, port=port)
 
+        if connect_timeout is not None:
+            self.config["connect_timeout"] = int(connect_timeout)
+        if statement_timeout is not None:
+            self.config["options"] = f"-c statement_timeout={int(statement_timeout * 1000)}"
+        self.statement_timeout = statement_timeout
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self._timeout = ContextVar(f"statement_timeout_{id(self)}", default=None)
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+        self.prepare = prepare
+        if prepare:
+            self.config["connection_factory"] = PreparedStatementConnection
+
+        self.pool = None
+        if pool:
+            self.pool = ConnectionPool(
+                self.config,
+                minsize=pool_minsize,
+                maxsize=pool_maxsize,
+                max_idle=pool_max_idle,
+                max_lifetime=pool_max_lifetime,
+            )
+
         try:
-            # Test connection
-            conn = psycopg2.connect(**self.config)
-            conn.close()
-            logger.info(f"Successfully connected to database {dbname}@{host}")
+            # Test connection; in pooled mode this also warms up the pool
+            call_with_retry(self._connection_test, self.retry, self.circuit_breaker, "connect")
+            logger.info("Successfully connected to database %s@%s", dbname, host)
         except (Exception, psycopg2.DatabaseError) as e:
-            logger.error(f"Failed to connect to database {dbname}@{host}: {e}")
+            logger.error("Failed to connect to database %s@%s: %s", dbname, host, e)
+            raise
+
+    def _connection_test(self):
+        if self.pool is not None:
+            self.pool.open()
+        else:
+            psycopg2.connect(**self.config).close()
 
 
     @contextmanager
     def get_connection(self):
         """Get database connection as context manager.
 
+        In pooled mode the connection is checked out from the pool and given
+        back afterwards; connections that were lost (driver errors without a
+        SQLSTATE) are discarded, while e.g. cancelled or timed-out ones are reused.
+        While checked out, the connection's statements can be cancelled with
+        `cancel`, and a `timeout` of the caller applies to its transaction.
+
         Yields:
             Connection: Database connection
         """
-        conn = psycopg2.connect(**self.config)
+        if self.pool is None:
+            conn = psycopg2.connect(**self.config)
+            try:
+                with self._running_connection(conn):
+                    yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = self.pool.getconn()
+        broken = False
         try:
-            yield conn
+            with self._running_connection(conn):
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # errors the server answered with (QueryCanceled, ...) leave the connection usable
+            broken = bool(conn.closed) or not (isinstance(e, psycopg2.errors.QueryCanceled)
+                                               or getattr(e, "pgcode", None) is not None)
+            raise
         finally:
-            conn.close()
+            self.pool.putconn(conn, discard=broken)
+
+    @contextmanager
+    def _running_connection(self, conn):
+        timeout = self._timeout.get()
+        if timeout is not None:
+            # transaction-local, so it ends with the rollback or close after the query
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout * 1000)),))
+        with self._running_lock:
+            self._running.add(conn)
+        try:
+            yield
+        finally:
+            with self._running_lock:
+                self._running.discard(conn)
+
+    @contextmanager
+    def timeout(self, seconds: float):
+        """Limit the statements run in this context (thread or task) to `seconds`.
 
-    def query_all(self, query: str) -> List[Tuple]:
+        Overrides `statement_timeout` for every query of this database made
+        inside the block, including those of repository methods. A statement
+        hitting the limit raises `psycopg2.errors.QueryCanceled` and is not retried.
+
+        Args:
+            seconds: Statement timeout; None restores the default
+
+        Example:
+            with database.timeout(5):
+                repository.get_transcript(transcriptid)
+        """
+        token = self._timeout.set(seconds)
+        try:
+            yield
+        finally:
+            self._timeout.reset(token)
+
+    def cancel(self) -> int:
+        """Cancel the statements currently running on this database, from any thread.
+
+        The cancelled calls raise `psycopg2.errors.QueryCanceled`; their
+        connections stay usable.
+
+        Returns:
+            int: Number of connections a cancel request was sent to
+        """
+        with self._running_lock:
+            running = list(self._running)
+        for conn in running:
+            try:
+                conn.cancel()
+            except psycopg2.Error as e:
+                logger.warning("Failed to cancel a running query: %s", e)
+        logger.info("Sent cancel requests to %d running queries", len(running))
+        return len(running)
+
+    def close(self):
+        """Close all pooled connections. No-op without a pool."""
+        if self.pool is not None:
+            self.pool.closeall()
+
+    @_retried
+    def query_all(self, query: str, params: Tuple = ()) -> List[Tuple]:
         """Execute a query and return all results.
 
         Args:
             query: SQL query to execute
+            params: Query parameters
 
         Returns:
             list[tuple]: List of query results
         """
-        with self.get_connection() as conn:
+        if self.result_backend == "arrow":
+            return table_to_pandas(self.query_arrow(query, params))
+
+        with self.metrics.measure("query_all", query) as m, self.get_connection() as conn:
+            m.lap("connect")
             cur = conn.cursor()
-            logger.info(f"Executing query: {query}")
-            cur.execute(query)
+            log_query(logger, "Executing query", query)
+            self._execute(cur, query, params)
+            m.lap("execute")
             result = cur.fetchall()
-            logger.info(f"Query executed successfully! Total rows: {len(result)}")
+            m.lap("fetch")
+            logger.info("Query executed successfully! Total rows: %d", len(result))
             column_names = [desc[0] for desc in cur.description]
             df = pd.DataFrame(result, columns=column_names)
+            m.lap("build")
+            m.rows, m.bytes = len(df), int(df.memory_usage(index=False).sum())
+            self.metrics.explain(conn, m, query, params)
             return df
+
+    def _execute(self, cur, query: str, params: Tuple):
+        """Execute a query on a cursor, as a prepared statement if enabled."""
+        if self.prepare and params and isinstance(cur.connection, PreparedStatementConnection):
+            execute_prepared(cur, query, params)
+        else:
+            cur.execute(query, params or None)
+
+    @_retried
+    def query_arrow(self, query: str, params: Tuple = ()) -> "pa.Table":
+        """Execute a query and return the result as an Arrow table with native types.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+
+        Returns:
+            pa.Table: Query results
+        """
+        require_pyarrow()
+        with self.metrics.measure("query_arrow", query) as m, self.get_connection() as conn:
+            m.lap("connect")
+            cur = conn.cursor()
+            psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, cur)
+            log_query(logger, "Executing query", query)
+            self._execute(cur, query, params)
+            m.lap("execute")
+            table = fetch_table(cur)
+            m.lap("fetch")
+            logger.info("Query executed successfully! Total rows: %d", table.num_rows)
+            m.rows, m.bytes = table.num_rows, table.nbytes
+            self.metrics.explain(conn, m, query, params)
+            return table
+
+    def query_parquet(self, query: str, path: str, params: Tuple = (), chunksize: int = 100000,
+                      compression: str = "zstd") -> int:
+        """Stream the result of a query into a Parquet file.
+
+        Rows are fetched from a named server-side cursor and written one row
+        group per chunk, so memory stays bounded by `chunksize`.
+
+        Args:
+            query: SQL query to execute
+            path: Destination Parquet file
+            params: Query parameters
+            chunksize: Rows per fetch and per row group
+            compression: Parquet compression codec
+
+        Returns:
+            int: Number of rows written
+        """
+        require_pyarrow()
+        total = 0
+        with self.metrics.measure("query_parquet", query) as m, self.get_connection() as conn:
+            m.lap("connect")
+            with conn.cursor(name=f"query_parquet_{uuid4().hex}") as cur:
+                psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, cur)
+                cur.itersize = chunksize
+                log_query(logger, f"Exporting query to {path}", query)
+                cur.execute(query, params or None)
+                m.lap("execute")
+                writer = None
+                try:
+                    for batch in iter_batches(cur, chunksize):
+                        m.lap("fetch")
+                        if writer is None:
+                            writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+                        writer.write_batch(batch)
+                        m.lap("build")
+                        total += batch.num_rows
+                        m.bytes += batch.nbytes
+                    if writer is None:
+                        # empty result: still write a file with the right schema
+                        writer = pq.ParquetWriter(path, fetch_table(cur).schema, compression=compression)
+                finally:
+                    if writer is not None:
+                        writer.close()
+                    m.rows = total
+        logger.info("Query exported successfully! Total rows: %d", total)
+        return total
+
+    def query_iter(self, query: str, params: Tuple = (), chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Execute a query on a named server-side cursor and stream the results.
+
+        Only `chunksize` rows are held on the client at a time. The connection
+        stays checked out until the iterator is exhausted or closed.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+            chunksize: Number of rows per yielded DataFrame
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the result; a single empty
+                DataFrame with the result columns if the query returns no rows
+        """
+        with self.metrics.measure("query_iter", query) as m, self.get_connection() as conn:
+            m.lap("connect")
+            with conn.cursor(name=f"query_iter_{uuid4().hex}") as cur:
+                cur.itersize = chunksize
+                log_query(logger, "Streaming query", query)
+                cur.execute(query, params or None)
+                m.lap("execute")
+                total = 0
+                while True:
+                    rows = cur.fetchmany(chunksize)
+                    m.lap("fetch")
+                    column_names = [desc[0] for desc in cur.description]
+                    if not rows:
+                        break
+                    total += len(rows)
+                    df = pd.DataFrame(rows, columns=column_names)
+                    m.lap("build")
+                    m.rows, m.bytes = total, m.bytes + int(df.memory_usage(index=False).sum())
+                    yield df
+                    # the time the consumer spent on the chunk is not the query's
+                    m.skip()
+                if total == 0:
+                    yield pd.DataFrame([], columns=column_names)
+                logger.info("Query streamed successfully! Total rows: %d", total)
+
+    @_retried
+    def query_copy(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Execute a query through `COPY (...) TO STDOUT` and parse it into typed columns.
+
+        Much faster than `query_all` for large results since rows are not
+        materialized as Python tuples. Column types come from the query's
+        result description, NUMERIC columns are returned as float64.
+
+        Args:
+            query: SQL SELECT query to execute
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        with self.metrics.measure("query_copy", query) as m:
+            with self.get_connection() as conn:
+                m.lap("connect")
+                cur = conn.cursor()
+                sql = strip_statement(cur.mogrify(query, params or None).decode())
+                log_query(logger, "Copying query", sql)
+                cur.execute(f"SELECT * FROM (\n{sql}\n) AS copy_source LIMIT 0")
+                columns = [(desc[0], desc[1]) for desc in cur.description]
+                buf = io.BytesIO()
+                cur.copy_expert(copy_statement(sql), buf)
+                # COPY streams while the server executes, so both count as execute
+                m.lap("execute")
+            buf.seek(0)
+            df = read_copy_csv(buf, columns)
+            m.lap("build")
+            m.rows, m.bytes = len(df), buf.getbuffer().nbytes
+            logger.info("Query copied successfully! Total rows: %d", len(df))
+        return df
+
+    @_retried
+    def query_id_set(self, query: str, params: Tuple, id_param: int = 0, strategy: str = "auto",
+                     chunksize: int = ID_SET_CHUNKSIZE, temp_table_threshold: int = ID_SET_TEMP_TABLE_THRESHOLD,
+                     run=None) -> pd.DataFrame:
+        """Execute a query filtering on a potentially huge id set.
+
+        `params[id_param]` is the id list, used in the query as `col = ANY(%s)`.
+        Depending on its size it is sent as one array, split into chunks
+        (run in parallel on the pool if there is one), or loaded into a
+        session temp table with `COPY` and joined. Results of chunks are
+        concatenated in chunk order, so an ORDER BY only holds per chunk.
+
+        Args:
+            query: SQL query with an `= ANY(%s)` id filter
+            params: Query parameters
+            id_param: Index of the id list in `params`
+            strategy: "auto", "array", "chunks" or "temp_table"
+            chunksize: Ids per chunk; lists up to this size are sent as one array
+            temp_table_threshold: Lists above this size go through a temp table
+            run: Callable(query, params) running the array and chunk queries (default: `query_all`)
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        params = tuple(params)
+        ids = list(dict.fromkeys(int(i) for i in params[id_param]))
+        params = params[:id_param] + (ids,) + params[id_param + 1:]
+        if strategy == "auto":
+            strategy = id_set_strategy(len(ids), chunksize, temp_table_threshold)
+        run = run or self.query_all
+        logger.info("Querying %d ids as %s", len(ids), strategy)
+
+        if strategy == "array":
+            return run(query, params)
+        if strategy == "chunks":
+            chunks = chunk_params(params, id_param, chunksize)
+            if self.pool is not None and len(chunks) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(chunks), self.pool.maxsize)) as executor:
+                    # each chunk runs in a copy of the caller's context, keeping metrics attribution
+                    futures = [executor.submit(copy_context().run, run, query, p) for p in chunks]
+                    frames = [future.result() for future in futures]
+            else:
+                frames = [run(query, p) for p in chunks]
+            return pd.concat(frames, ignore_index=True)
+        if strategy != "temp_table":
+            raise ValueError(f"Unknown id set strategy: {strategy}")
+
+        table = f"id_set_{uuid4().hex}"
+        sql, rest = join_id_table(query, params, id_param, table)
+        with self.metrics.measure("query_id_set", sql) as m, self.get_connection() as conn:
+            m.lap("connect")
+            cur = conn.cursor()
+            try:
+                cur.execute(f"CREATE TEMP TABLE {table} (id bigint PRIMARY KEY) ON COMMIT DROP")
+                cur.copy_expert(f"COPY {table} (id) FROM STDIN", io.StringIO("\n".join(map(str, ids)) + "\n"))
+                # the planner needs the real size of the id set to pick hash joins
+                cur.execute(f"ANALYZE {table}")
+                log_query(logger, "Executing query", sql)
+                if self.result_backend == "arrow":
+                    psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, cur)
+                cur.execute(sql, rest or None)
+                m.lap("execute")
+                if self.result_backend == "arrow":
+                    df = table_to_pandas(fetch_table(cur))
+                    m.lap("fetch")
+                else:
+                    result = cur.fetchall()
+                    m.lap("fetch")
+                    df = pd.DataFrame(result, columns=[desc[0] for desc in cur.description])
+                    m.lap("build")
+                m.rows, m.bytes = len(df), int(df.memory_usage(index=False).sum())
+            finally:
+                # drops the temp table
+                conn.rollback()
+        logger.info("Query executed successfully! Total rows: %d", len(df))
+        return df
+
+    @_retried
+    def estimate_rows(self, query: str, params: Tuple = ()) -> int:
+        """Return the planner's row estimate for a query without executing it.
+
+        Args:
+            query: SQL query to plan
+            params: Query parameters
+
+        Returns:
+            int: Estimated number of result rows
+        """
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"EXPLAIN (FORMAT JSON) {strip_statement(query)}", params or None)
+            plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
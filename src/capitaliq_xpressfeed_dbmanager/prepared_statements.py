@@ -0,0 +1,76 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Tuple
+
+import psycopg2.extensions
+
+from .copy_extract import strip_statement
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+class PreparedStatementConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers the statements prepared on it.
+
+    Prepared statements live as long as the server session, so they pay off
+    when connections are reused, i.e. together with the connection pool.
+    """
+
+    max_prepared = 100
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = OrderedDict()
+
+
+def to_numbered_placeholders(query: str) -> Tuple[str, int]:
+    """Convert psycopg2 `%s` placeholders into PostgreSQL `$n` placeholders.
+
+    Args:
+        query: Query using `%s` placeholders (and `%%` for a literal percent sign)
+
+    Returns:
+        tuple: (query with `$1..$n` placeholders, number of placeholders)
+    """
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, query), count
+
+
+def execute_prepared(cur, query: str, params: Tuple):
+    """Execute a query as a server-side prepared statement.
+
+    The statement is prepared the first time a connection sees the query text
+    and reused afterwards, so PostgreSQL can cache its plan. The least recently
+    used statements are deallocated beyond `max_prepared` per connection.
+
+    Args:
+        cur: Cursor of a `PreparedStatementConnection`
+        query: Query using `%s` placeholders
+        params: Query parameters
+    """
+    statements = cur.connection.prepared_statements
+    name = statements.get(query)
+    if name is None:
+        sql, _ = to_numbered_placeholders(strip_statement(query))
+        name = "stmt_" + hashlib.sha1(query.encode()).hexdigest()[:16]
+        cur.execute(f"PREPARE {name} AS {sql}")
+        statements[query] = name
+        while len(statements) > cur.connection.max_prepared:
+            _, evicted = statements.popitem(last=False)
+            cur.execute(f"DEALLOCATE {evicted}")
+    else:
+        statements.move_to_end(query)
+
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+
+from .base_database import BaseDatabase
+from .logger import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+DAY = 24 * 3600
+
+# slow-changing reference tables and how long their query results stay fresh (seconds)
+DEFAULT_TTLS = {
+    "ciqdataitem": 30 * DAY,
+    "ciqcountrygeo": 30 * DAY,
+    "ciqcurrency": 30 * DAY,
+    "ciqexchange": 30 * DAY,
+    "ciqtradingitemstatus": 30 * DAY,
+    "ciqcompany": DAY,
+    "ciqsecurity": DAY,
+    "ciqtradingitem": DAY,
+}
+
+# an identifier after FROM/JOIN, and whether it is called like a function (e.g. unnest(...))
+_TABLE_REFERENCE = re.compile(r"\b(?:from|join)\s+(?:lateral\s+)?([a-z_][\w.]*)(\s*\()?", re.IGNORECASE)
+# names defined by a WITH clause: `name AS (` or `name AS [NOT] MATERIALIZED (`
+_CTE_NAME = re.compile(r"\b([a-z_]\w*)\s+as\s+(?:(?:not\s+)?materialized\s+)?\(", re.IGNORECASE)
+_NOT_TABLES = {"lateral", "only"}
+
+
+def referenced_tables(query: str) -> frozenset:
+    """Return the (schema-less, lower-case) tables a query reads from.
+
+    Table functions (`FROM unnest(...)`), keywords such as LATERAL and the
+    names of common table expressions are not tables.
+
+    Args:
+        query: SQL query
+
+    Returns:
+        frozenset: Table names following FROM or JOIN
+    """
+    ctes = {name.lower() for name in _CTE_NAME.findall(query)}
+    names = {name.lower().rsplit(".", 1)[-1] for name, call in _TABLE_REFERENCE.findall(query) if not call}
+    return frozenset(names - ctes - _NOT_TABLES)
+
+
+class CachedDatabase(BaseDatabase):
+    """Persistent query result cache in front of another database.
+
+    Results of queries that only read tables listed in `ttls` are stored in a
+    SQLite file keyed by the query text and parameters, and served from there
+    until the shortest TTL of the tables involved expires. The cache is kept
+    under `max_bytes` by evicting the least recently used entries. All other
+    queries go straight to the wrapped database.
+    """
+
+    def __init__(self, database: BaseDatabase, path: str = "cache/query_cache.sqlite",
+                 ttls: Optional[Dict[str, float]] = None, max_bytes: int = 512 * 1024 * 1024):
+        """Initialize the cache.
+
+        Args:
+            database: Database that answers cache misses
+            path: SQLite file holding the cache
+            ttls: Table name -> seconds a cached result stays fresh (default: DEFAULT_TTLS)
+            max_bytes: Maximum total size of the cached results
+        """
+        self.database = database
+        self.path = path
+        self.ttls = {k.lower(): v for k, v in (DEFAULT_TTLS if ttls is None else ttls).items()}
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                tables TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def __getattr__(self, name):
+        # expose the wrapped database's extras (query_copy, pool, ...) unchanged
+        if name == "database":
+            raise AttributeError(name)
+        return getattr(self.database, name)
+
+    @contextmanager
+    def get_connection(self):
+        """Get a connection of the wrapped database."""
+        with self.database.get_connection() as conn:
+            yield conn
+
+    def query_all(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Return the cached result of a query, or run it and cache it if cacheable.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        return self._cached(query, params, lambda: self.database.query_all(query, params))
+
+    def query_id_set(self, query: str, params: Tuple, id_param: int = 0, **kwargs) -> pd.DataFrame:
+        """Return the cached result of an id set query, or run it and cache it if cacheable.
+
+        Misses run as an id set on the wrapped database if it supports it (see
+        `PostgresDatabase.query_id_set`), else with `query_all`.
+
+        Args:
+            query: SQL query with an `= ANY(%s)` id filter
+            params: Query parameters
+            id_param: Index of the id list in `params`
+            **kwargs: Passed to the wrapped database's `query_id_set`
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        if not hasattr(self.database, "query_id_set"):
+            return self.query_all(query, params)
+        # chunks must not go through `run` (e.g. the repository), which would cache each of them again
+        kwargs.pop("run", None)
+        return self._cached(query, params, lambda: self.database.query_id_set(query, params, id_param, **kwargs))
+
+    def query_iter(self, query: str, params: Tuple = (), chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Stream a query from the wrapped database; streamed results are not cached."""
+        return self.database.query_iter(query, params, chunksize)
+
+    def invalidate(self, table: Optional[str] = None) -> int:
+        """Drop cached results.
+
+        Args:
+            table: Only drop results that read this table; everything if None
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            if table is None:
+                cur = self._conn.execute("DELETE FROM entries")
+            else:
+                cur = self._conn.execute("DELETE FROM entries WHERE tables LIKE ?", (f"%,{table.lower()},%",))
+        if table is None:
+            logger.info("Invalidated %d cached queries", cur.rowcount)
+        else:
+            logger.info("Invalidated %d cached queries reading %s", cur.rowcount, table)
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        """Return the number of entries and bytes in the cache."""
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def close(self):
+        """Close the cache file and the wrapped database."""
+        self._conn.close()
+        self.database.close()
+
+    def _cached(self, query: str, params: Tuple, run) -> pd.DataFrame:
+        tables = referenced_tables(query)
+        if not tables or not tables <= self.ttls.keys():
+            return run()
+
+        key = self._key(query, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                logger.debug("Query cache hit for %s", tables)
+                return pickle.loads(row[1])
+
+        df = run()
+        payload = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return df
+        expires_at = now + min(self.ttls[table] for table in tables)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, "," + ",".join(sorted(tables)) + ",", expires_at, now, len(payload), payload),
+            )
+            self._evict()
+        return df
+
+    def _key(self, query: str, params: Tuple) -> str:
+        normalized = " ".join(query.split())
+        return hashlib.sha256(f"{normalized}\x00{params!r}".encode()).hexdigest()
+
+    def _evict(self):
+        # called with the lock held
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
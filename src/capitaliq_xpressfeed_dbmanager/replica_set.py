@@ -0,0 +1,328 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Iterator, List, Sequence, Tuple, Union
+
+import pandas as pd
+import psycopg2
+
+from .base_database import BaseDatabase
+from .id_sets import ID_SET_CHUNKSIZE, ID_SET_TEMP_TABLE_THRESHOLD, chunk_params, id_set_strategy
+from .logger import get_logger
+from .postgres_database import PostgresDatabase
+from .resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry, is_transient
+
+# Initialize logger
+logger = get_logger(__name__)
+
+ROUTING_POLICIES = ("round_robin", "least_outstanding")
+
+_NO_RETRY = RetryPolicy(attempts=1)
+
+
+class _Replica:
+    """One endpoint of the replica set, connected lazily."""
+
+    def __init__(self, host: str, port: int, breaker: CircuitBreaker):
+        self.host = host
+        self.port = port
+        self.breaker = breaker
+        self.database = None
+        self.outstanding = 0
+        self.queries = 0
+        self.failures = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+def _parse_host(host: Union[str, Tuple[str, int]]) -> Tuple[str, int]:
+    if isinstance(host, tuple):
+        return host[0], int(host[1])
+    name, sep, port = host.rpartition(":")
+    if sep and port.isdigit():
+        return name, int(port)
+    return host, 5432
+
+
+class ReplicaSetDatabase(BaseDatabase):
+    """Read-only database spread over several Postgres endpoints (e.g. read replicas).
+
+    Every query goes to one endpoint, picked round-robin or by the fewest
+    queries in flight. An endpoint whose queries keep failing with connection
+    errors or statement timeouts is ejected for `eject_seconds`, after which a
+    single trial query decides whether it rejoins. Queries that fail with a
+    transient error fail over to the next endpoint. Use `pinned` to run a
+    sequence of queries on a single endpoint, e.g. to read from one consistent
+    snapshot while replicas lag behind by different amounts.
+
+    Only reads are routed, so the endpoints must serve the same data; point
+    writes at the primary with a plain `PostgresDatabase`.
+    """
+
+    def __init__(self, dbname: str, user: str, password: str = "",
+                 hosts: Sequence[Union[str, Tuple[str, int]]] = ("localhost",), routing: str = "round_robin",
+                 eject_after: int = 3, eject_seconds: float = 30.0,
+                 factory: Callable[..., BaseDatabase] = PostgresDatabase, **database_kwargs):
+        """Initialize the replica set and connect to every endpoint.
+
+        Args:
+            dbname: Database name
+            user: Database user
+            password: Database password
+            hosts: Endpoints as "host", "host:port" or (host, port)
+            routing: "round_robin" or "least_outstanding" (fewest queries in flight)
+            eject_after: Consecutive failures after which an endpoint is ejected
+            eject_seconds: Seconds an ejected endpoint gets no queries
+            factory: Creates the database of one endpoint (default: PostgresDatabase)
+            **database_kwargs: Passed to `factory` for every endpoint, e.g. pool=True
+                or statement_timeout=60; `retry` defaults to a single attempt per
+                endpoint, since failed queries move on to the next endpoint
+
+        Raises:
+            Exception: The last connection error, if no endpoint can be reached
+        """
+        if routing not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy: {routing}")
+        if not hosts:
+            raise ValueError("ReplicaSetDatabase needs at least one host")
+        self.routing = routing
+        self.factory = factory
+        self.config = dict(dbname=dbname, user=user, password=password)
+        self.database_kwargs = {"retry": _NO_RETRY, **database_kwargs}
+        self.replicas = [_Replica(*_parse_host(host), CircuitBreaker(eject_after, eject_seconds)) for host in hosts]
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._pinned = ContextVar(f"pinned_replica_{id(self)}", default=None)
+        self._timeout = ContextVar(f"replica_timeout_{id(self)}", default=None)
+
+        errors = []
+        for replica in self.replicas:
+            try:
+                self._database(replica)
+            except Exception as e:
+                errors.append(e)
+                logger.warning("Replica %s is unavailable: %s", replica.name, e)
+        if len(errors) == len(self.replicas):
+            raise errors[-1]
+        logger.info("Connected to %d of %d replicas of %s", len(self.replicas) - len(errors), len(self.replicas),
+                    dbname)
+
+    def _database(self, replica: _Replica) -> BaseDatabase:
+        if replica.database is None:
+            # counts towards the endpoint's ejection like a failed query
+            database = call_with_retry(
+                lambda: self.factory(**self.config, host=replica.host, port=replica.port, **self.database_kwargs),
+                _NO_RETRY, replica.breaker, f"connect to {replica.name}")
+            with self._lock:
+                if replica.database is None:
+                    replica.database = database
+                else:
+                    database.close()
+        return replica.database
+
+    def _candidates(self) -> List[_Replica]:
+        """Endpoints to try for the next query, in order."""
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return [pinned]
+        healthy = [replica for replica in self.replicas if replica.breaker.state != "open"]
+        if not healthy:
+            raise CircuitOpenError(f"all {len(self.replicas)} replicas are ejected")
+        start = next(self._counter) % len(healthy)
+        ordered = healthy[start:] + healthy[:start]
+        if self.routing == "least_outstanding":
+            with self._lock:
+                ordered.sort(key=lambda replica: replica.outstanding)
+        return ordered
+
+    @contextmanager
+    def _checkout(self, replica: _Replica):
+        with self._lock:
+            replica.outstanding += 1
+            replica.queries += 1
+        try:
+            timeout = self._timeout.get()
+            database = self._database(replica)
+            if timeout is None:
+                yield database
+            else:
+                with database.timeout(timeout):
+                    yield database
+        finally:
+            with self._lock:
+                replica.outstanding -= 1
+
+    def _route(self, method: str, *args, **kwargs):
+        """Call `method` on the first endpoint that answers, failing over on transient errors."""
+        candidates = self._candidates()
+        for position, replica in enumerate(candidates):
+            try:
+                with self._checkout(replica) as database:
+                    return call_with_retry(lambda: getattr(database, method)(*args, **kwargs), _NO_RETRY,
+                                           replica.breaker, f"{method} on {replica.name}")
+            except (CircuitOpenError, psycopg2.Error) as e:
+                if isinstance(e, psycopg2.Error):
+                    with self._lock:
+                        replica.failures += 1
+                    if not is_transient(e):
+                        raise
+                if position == len(candidates) - 1:
+                    raise
+                logger.warning("Replica %s failed, retrying %s on %s: %s", replica.name, method,
+                               candidates[position + 1].name, e)
+
+    @contextmanager
+    def pinned(self):
+        """Run all queries of this context (thread or task) on one endpoint.
+
+        Nested blocks keep the outer endpoint. Queries of a pinned block do
+        not fail over: if the endpoint fails, they raise.
+
+        Yields:
+            str: The pinned endpoint as "host:port"
+        """
+        replica = self._pinned.get()
+        if replica is not None:
+            yield replica.name
+            return
+        token = self._pinned.set(self._candidates()[0])
+        try:
+            yield self._pinned.get().name
+        finally:
+            self._pinned.reset(token)
+
+    @contextmanager
+    def timeout(self, seconds: float):
+        """Limit the statements run in this context to `seconds`, on whichever endpoint they run.
+
+        Args:
+            seconds: Statement timeout; None restores the default
+        """
+        token = self._timeout.set(seconds)
+        try:
+            yield
+        finally:
+            self._timeout.reset(token)
+
+    @contextmanager
+    def get_connection(self):
+        """Get a connection to the next endpoint.
+
+        Yields:
+            Connection: Database connection
+        """
+        with self._checkout(self._candidates()[0]) as database:
+            with database.get_connection() as conn:
+                yield conn
+
+    def query_all(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Execute a query on the next endpoint and return all results.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        return self._route("query_all", query, params)
+
+    def query_arrow(self, query: str, params: Tuple = ()):
+        """Execute a query on the next endpoint, see `PostgresDatabase.query_arrow`."""
+        return self._route("query_arrow", query, params)
+
+    def query_copy(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Execute a query through COPY on the next endpoint, see `PostgresDatabase.query_copy`."""
+        return self._route("query_copy", query, params)
+
+    def query_id_set(self, query: str, params: Tuple, id_param: int = 0, strategy: str = "auto",
+                     chunksize: int = ID_SET_CHUNKSIZE, temp_table_threshold: int = ID_SET_TEMP_TABLE_THRESHOLD,
+                     run=None) -> pd.DataFrame:
+        """Execute an id set query, see `PostgresDatabase.query_id_set`.
+
+        Arrays and chunks go through `run` one by one, which routes each of
+        them on its own: chunks spread over the endpoints and fail over
+        separately. Temp tables are loaded and joined on a single endpoint.
+
+        Args:
+            query: SQL query with an `= ANY(%s)` id filter
+            params: Query parameters
+            id_param: Index of the id list in `params`
+            strategy: "auto", "array", "chunks" or "temp_table"
+            chunksize: Ids per chunk; lists up to this size are sent as one array
+            temp_table_threshold: Lists above this size go through a temp table
+            run: Callable(query, params) running the array and chunk queries (default: `query_all`)
+
+        Returns:
+            pd.DataFrame: Query results
+        """
+        params = tuple(params)
+        ids = list(dict.fromkeys(int(i) for i in params[id_param]))
+        params = params[:id_param] + (ids,) + params[id_param + 1:]
+        if strategy == "auto":
+            strategy = id_set_strategy(len(ids), chunksize, temp_table_threshold)
+        if strategy == "temp_table":
+            return self._route("query_id_set", query, params, id_param, strategy=strategy)
+        run = run or self.query_all
+        if strategy == "array":
+            return run(query, params)
+        if strategy != "chunks":
+            raise ValueError(f"Unknown id set strategy: {strategy}")
+        chunks = chunk_params(params, id_param, chunksize)
+        if self.database_kwargs.get("pool") and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), len(self.replicas))) as executor:
+                # copies of the caller's context keep pinned blocks and timeouts
+                futures = [executor.submit(copy_context().run, run, query, p) for p in chunks]
+                frames = [future.result() for future in futures]
+        else:
+            frames = [run(query, p) for p in chunks]
+        return pd.concat(frames, ignore_index=True)
+
+    def query_parquet(self, query: str, path: str, params: Tuple = (), **kwargs) -> int:
+        """Stream a query into a Parquet file from the next endpoint, see `PostgresDatabase.query_parquet`."""
+        return self._route("query_parquet", query, path, params, **kwargs)
+
+    def estimate_rows(self, query: str, params: Tuple = ()) -> int:
+        """Return the planner's row estimate of the next endpoint."""
+        return self._route("estimate_rows", query, params)
+
+    def query_iter(self, query: str, params: Tuple = (), chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Stream a query from one endpoint; streams do not fail over once started.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+            chunksize: Number of rows per yielded DataFrame
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the result
+        """
+        with self._checkout(self._candidates()[0]) as database:
+            yield from database.query_iter(query, params, chunksize)
+
+    def cancel(self) -> int:
+        """Cancel the statements currently running on every endpoint.
+
+        Returns:
+            int: Number of connections a cancel request was sent to
+        """
+        return sum(replica.database.cancel() for replica in self.replicas if replica.database is not None)
+
+    def stats(self) -> List[dict]:
+        """Return the state, queries in flight, total queries and failures of every endpoint."""
+        with self._lock:
+            return [
+                {"host": replica.name, "state": replica.breaker.state, "connected": replica.database is not None,
+                 "outstanding": replica.outstanding, "queries": replica.queries, "failures": replica.failures}
+                for replica in self.replicas
+            ]
+
+    def close(self):
+        """Close the databases of all endpoints."""
+        for replica in self.replicas:
+            if replica.database is not None:
+                replica.database.close()
@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, TypeVar
+
+import psycopg2
+import psycopg2.errors
+
+from .logger import get_logger
+
+# Initialize logger
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# errors worth retrying: the statement did not fail because of the statement itself
+TRANSIENT_ERRORS = (
+    psycopg2.errors.SerializationFailure,   # 40001
+    psycopg2.errors.DeadlockDetected,       # 40P01
+    psycopg2.errors.TooManyConnections,     # 53300
+    psycopg2.errors.LockNotAvailable,       # 55P03
+    psycopg2.errors.AdminShutdown,          # 57P01
+    psycopg2.errors.CrashShutdown,          # 57P02
+    psycopg2.errors.CannotConnectNow,       # 57P03
+    psycopg2.errors.ConnectionException,    # class 08
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of querying while the circuit breaker is open."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a driver error is worth retrying.
+
+    Connection failures and the errors in TRANSIENT_ERRORS are transient.
+    Timeouts and cancellations (57014) are not: the query would run into the
+    same limit again.
+
+    Args:
+        error: Exception raised by psycopg2
+
+    Returns:
+        bool: True if the call may succeed when retried
+    """
+    if isinstance(error, psycopg2.errors.QueryCanceled):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # no SQLSTATE: the connection failed or was lost before the server answered
+    return getattr(error, "pgcode", None) is None and isinstance(error, (psycopg2.OperationalError,
+                                                                           psycopg2.InterfaceError))
+
+
+@dataclass
+class RetryPolicy:
+    """Retry with exponential backoff and full jitter.
+
+    Attempt n (from 0) waits a random time between 0 and
+    min(max_delay, base_delay * 2**n) before the next one, which spreads the
+    retries of many workers hitting the same failure.
+
+    Args:
+        attempts: Total number of attempts, 1 disables retries
+        base_delay: Backoff of the first retry in seconds
+        max_delay: Upper bound of the backoff in seconds
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 5.0
+
+    def __post_init__(self):
+        if self.attempts < 1:
+            raise ValueError("RetryPolicy needs at least one attempt")
+
+    def delays(self) -> Iterator[float]:
+        """Yield the sleep before each retry."""
+        for attempt in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker for one database.
+
+    After `failure_threshold` consecutive failures (transient errors and
+    statement timeouts; SQL errors prove the server is up) the circuit opens
+    and calls fail fast with CircuitOpenError for `reset_timeout` seconds.
+    Then one trial call is let through (half-open): its success closes the
+    circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """State of the circuit: "closed", "open" or "half_open"."""
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "open" if now - self._opened_at < self.reset_timeout else "half_open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (now - self._opened_at))
+            raise CircuitOpenError(f"database circuit is open after {self._failures} failures, "
+                                   f"next trial in {retry_in:.1f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Database circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            trial, self._trial_running = self._trial_running, False
+            if trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning("Database circuit opened after %d failures", self._failures)
+
+    def release(self):
+        """End a call whose outcome says nothing about the server, e.g. a local error."""
+        with self._lock:
+            self._trial_running = False
+
+
+def is_statement_timeout(error: BaseException) -> bool:
+    """Whether a QueryCanceled error came from statement_timeout rather than a cancel request."""
+    # both are SQLSTATE 57014, only the message tells them apart
+    return isinstance(error, psycopg2.errors.QueryCanceled) and "statement timeout" in str(error)
+
+
+def call_with_retry(func: Callable[[], T], retry: RetryPolicy, breaker: Optional[CircuitBreaker] = None,
+                    description: str = "query") -> T:
+    """Call `func`, retrying transient driver errors with backoff.
+
+    Transient errors and statement timeouts count as failures of the circuit
+    breaker; other SQL errors mean the server is answering and count as
+    successes. Timeouts and cancellations are never retried.
+
+    Args:
+        func: Callable running the database call
+        retry: Retry policy
+        breaker: Circuit breaker to consult and update, if any
+        description: Name of the call for the log
+
+    Returns:
+        The result of `func`
+
+    Raises:
+        CircuitOpenError: If the breaker is open
+    """
+    delays = retry.delays()
+    attempt = 1
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = func()
+        except psycopg2.Error as e:
+            transient = is_transient(e)
+            if breaker is not None:
+                if transient or is_statement_timeout(e):
+                    breaker.record_failure()
+                elif isinstance(e, psycopg2.errors.QueryCanceled):
+                    breaker.release()
+                else:
+                    breaker.record_success()
+            delay = next(delays, None) if transient else None
+            if delay is None:
+                raise
+            logger.warning("Transient error in %s (attempt %d of %d), retrying in %.2fs: %s",
+                           description, attempt, retry.attempts, delay, e)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.release()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
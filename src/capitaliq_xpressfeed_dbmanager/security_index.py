@@ -0,0 +1,167 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .base_database import BaseDatabase
+from .db_task_manager import _single_security
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_COLUMNS = ["tickersymbol", "countrycode", "companyid", "securityid", "tradingitemid",
+                 "companyname", "exchangeid", "currencyid", "tradingitemstatusid"]
+
+
+def _security_index_sql(tickers: Optional[List[str]] = None) -> Tuple[str, tuple]:
+    if tickers is None:
+        ticker_filter, params = "", ()
+    else:
+        ticker_filter, params = "and t.tickersymbol = ANY(%s)", (list(tickers),)
+    sql = f"""
+    select t.tickersymbol, upper(cg.isocountry2) as countrycode, c.companyid, s.securityid, t.tradingitemid,
+    c.companyname, t.exchangeid, t.currencyid, t.tradingitemstatusid
+    from ciqtradingitem t
+    join ciqsecurity s on t.securityid = s.securityid
+    join ciqcompany c on s.companyid = c.companyid
+    join ciqcountrygeo cg on c.countryid = cg.countryid
+    join ciqtradingitemstatus tis on t.tradingitemstatusid = tis.tradingitemstatusid
+    where t.primaryflag = 1
+    and
+    s.primaryflag = 1
+    and
+    -- 4: delisted, 5: expired; 11: inactive; 8: merged
+    t.tradingitemstatusid not in (4, 5, 8, 11)
+    {ticker_filter}
+    """
+    return sql, params
+
+
+class SecurityIndex:
+    """In-memory (ticker, country) -> company/security/trading item index.
+
+    Loads all active primary trading items with one query (the same filters
+    as `TaskManagerRepository.get_security_info`) and resolves tickers from
+    dictionaries afterwards, so resolving a watchlist costs no round trips.
+    Lookups raise the same "Multiple or no security found" error as
+    `get_metadata_info` when a ticker is missing or ambiguous.
+    """
+
+    def __init__(self, database: BaseDatabase, load: bool = True):
+        """Initialize the index.
+
+        Args:
+            database: Database to load the trading items from
+            load: Load the index immediately; otherwise on first lookup
+        """
+        self.database = database
+        self._lock = threading.Lock()
+        # (frame, (ticker, country) -> positions, ticker -> positions), swapped as a whole on refresh
+        self._state: Tuple[pd.DataFrame, Dict[Tuple[str, str], List[int]], Dict[str, List[int]]] = (
+            pd.DataFrame(columns=INDEX_COLUMNS), {}, {})
+        self._loaded = False
+        if load:
+            self.refresh()
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._state[0])
+
+    def refresh(self, tickers: Optional[Iterable[str]] = None):
+        """Reload the index from the database.
+
+        Args:
+            tickers: Only reload these tickers (e.g. after a ticker change);
+                everything if None or if the index was not loaded yet
+        """
+        if not self._loaded:
+            tickers = None
+        if tickers is not None:
+            tickers = sorted(set(tickers))
+            if not tickers:
+                return
+        df = self.database.query_all(*_security_index_sql(tickers))[INDEX_COLUMNS]
+        with self._lock:
+            if tickers is not None and self._loaded:
+                frame = self._state[0]
+                kept = frame[~frame["tickersymbol"].isin(tickers)]
+                if len(kept):
+                    kept = kept.astype({"tickersymbol": object, "countrycode": object})
+                    df = pd.concat([kept, df], ignore_index=True)
+            self._state = self._build(df.reset_index(drop=True))
+            self._loaded = True
+        if tickers is None:
+            logger.info("Security index holds %d trading items", len(self._state[0]))
+        else:
+            logger.info("Security index holds %d trading items after refreshing %d tickers", len(self._state[0]),
+                        len(tickers))
+
+    def lookup(self, ticker: str, country: str) -> pd.Series:
+        """Resolve one ticker.
+
+        Args:
+            ticker: Stock ticker symbol
+            country: ISO country code as stored in ciqcountrygeo (upper case, matched
+                exactly like `get_security_info`), or "all" for any country
+
+        Returns:
+            pd.Series: Index row with companyid, securityid, tradingitemid, ...
+        """
+        self._ensure_loaded()
+        frame, by_ticker_country, by_ticker = self._state
+        return _single_security(frame.iloc[self._positions(ticker, country, by_ticker_country, by_ticker)], ticker)
+
+    def get_companyid(self, ticker: str, country: str) -> int:
+        """Resolve one ticker to its company id."""
+        return int(self.lookup(ticker, country)["companyid"])
+
+    def lookup_many(self, tickers: Iterable, country: str = "all", errors: str = "raise") -> pd.DataFrame:
+        """Resolve many tickers at once.
+
+        Args:
+            tickers: Ticker symbols, or (ticker, country) tuples
+            country: Country used for plain ticker symbols
+            errors: "raise" to fail on missing or ambiguous tickers,
+                "ignore" to leave them out of the result
+
+        Returns:
+            pd.DataFrame: One index row per resolved ticker, in input order,
+                with the requested ticker and country prepended
+        """
+        self._ensure_loaded()
+        frame, by_ticker_country, by_ticker = self._state
+        positions, keys = [], []
+        for item in tickers:
+            ticker, ticker_country = item if isinstance(item, tuple) else (item, country)
+            found = self._positions(ticker, ticker_country, by_ticker_country, by_ticker)
+            if len(found) != 1:
+                if errors == "raise":
+                    raise Exception(f"Multiple or no security found for {ticker}")
+                logger.warning("Multiple or no security found for %s", ticker)
+                continue
+            positions.append(found[0])
+            keys.append((ticker, ticker_country))
+
+        df = frame.iloc[positions].reset_index(drop=True)
+        df.insert(0, "country", [k[1] for k in keys])
+        df.insert(0, "ticker", [k[0] for k in keys])
+        return df
+
+    @staticmethod
+    def _positions(ticker: str, country: str, by_ticker_country: dict, by_ticker: dict) -> List[int]:
+        if country == "all":
+            return by_ticker.get(ticker, [])
+        return by_ticker_country.get((ticker, country), [])
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    @staticmethod
+    def _build(df: pd.DataFrame) -> tuple:
+        by_ticker_country, by_ticker = {}, {}
+        for position, (ticker, country) in enumerate(zip(df["tickersymbol"], df["countrycode"])):
+            by_ticker_country.setdefault((ticker, country), []).append(position)
+            by_ticker.setdefault(ticker, []).append(position)
+        frame = df.astype({"tickersymbol": "category", "countrycode": "category"})
+        return frame, by_ticker_country, by_ticker
@@ -0,0 +1,117 @@
+import gzip
+import json
+from typing import Iterable
+
+import pandas as pd
+
+from .arrow_backend import pa, pq, require_pyarrow
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+TRANSCRIPT_COLUMNS = {
+    "transcriptcomponentid": "int",
+    "transcriptid": "int",
+    "componentorder": "int",
+    "transcriptcomponenttypeid": "int",
+    "transcriptpersonid": "int",
+    "componenttext": "text",
+    "transcriptcomponenttypename": "text",
+    "transcriptpersonname": "text",
+    "speakertypename": "text",
+    "title": "text",
+}
+
+
+def assemble_transcript(df: pd.DataFrame) -> dict:
+    """Turn the component rows of one transcript into a JSON-serializable record.
+
+    Args:
+        df: Components of a single transcript, as yielded by `iter_transcripts`
+
+    Returns:
+        dict: {"transcriptid": ..., "components": [{...}, ...]}
+    """
+    components = df.drop(columns="transcriptid").astype(object).where(df.notna(), None)
+    return {
+        "transcriptid": int(df["transcriptid"].iloc[0]),
+        "components": components.to_dict(orient="records"),
+    }
+
+
+def write_transcripts_jsonl(transcripts: Iterable[pd.DataFrame], path: str) -> int:
+    """Write transcripts as one JSON line each, gzip-compressed if `path` ends in .gz.
+
+    Args:
+        transcripts: Per-transcript component frames, e.g. from `iter_transcripts`
+        path: Output file
+
+    Returns:
+        int: Number of transcripts written
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    count = 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        for df in transcripts:
+            f.write(json.dumps(assemble_transcript(df), default=str, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    logger.info("Wrote %d transcripts to %s", count, path)
+    return count
+
+
+def write_transcripts_parquet(transcripts: Iterable[pd.DataFrame], path: str, row_group_size: int = 50000,
+                              compression: str = "zstd") -> int:
+    """Write transcript components to a Parquet file, one row per component.
+
+    Components are buffered until `row_group_size` rows, so memory stays bounded.
+
+    Args:
+        transcripts: Per-transcript component frames, e.g. from `iter_transcripts`
+        path: Output file
+        row_group_size: Component rows per row group
+        compression: Parquet compression codec
+
+    Returns:
+        int: Number of transcripts written
+    """
+    require_pyarrow()
+    types = {"int": pa.int64(), "text": pa.string()}
+    schema = pa.schema([pa.field(name, types[kind]) for name, kind in TRANSCRIPT_COLUMNS.items()])
+
+    count = 0
+    buffered, rows = [], 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        def flush():
+            df = pd.concat(buffered, ignore_index=True)[list(TRANSCRIPT_COLUMNS)]
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            buffered.clear()
+
+        for df in transcripts:
+            buffered.append(df)
+            rows += len(df)
+            count += 1
+            if rows >= row_group_size:
+                flush()
+                rows = 0
+        if buffered:
+            flush()
+    logger.info("Wrote %d transcripts to %s", count, path)
+    return count
+
+
+def write_transcripts(transcripts: Iterable[pd.DataFrame], path: str) -> int:
+    """Write transcripts to .parquet or (gzipped) .jsonl depending on the file name.
+
+    Args:
+        transcripts: Per-transcript component frames, e.g. from `iter_transcripts`
+        path: Output file ending in .parquet, .jsonl or .jsonl.gz
+
+    Returns:
+        int: Number of transcripts written
+    """
+    if path.endswith(".parquet"):
+        return write_transcripts_parquet(transcripts, path)
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        return write_transcripts_jsonl(transcripts, path)
+    raise ValueError(f"Unsupported transcript file type: {path}")
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .db_task_manager import TaskManagerRepository
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranscriptSyncState:
+    """Per-company transcript high-water marks persisted in a JSON file.
+
+    A mark is the (transcriptCreationDateUTC, transcriptId) of the newest
+    transcript already synced for a company.
+    """
+
+    def __init__(self, path: str):
+        """Load the state file if it exists.
+
+        Args:
+            path: JSON file holding the marks
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._marks = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._marks = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._marks)
+
+    def get(self, companyid: int) -> Optional[Tuple[pd.Timestamp, int]]:
+        """Return the high-water mark of a company, None if it was never synced."""
+        mark = self._marks.get(str(int(companyid)))
+        if mark is None:
+            return None
+        return pd.Timestamp(mark["transcriptcreationdateutc"]), int(mark["transcriptid"])
+
+    def advance(self, companyid: int, created: pd.Timestamp, transcriptid: int):
+        """Move the mark of a company forward; older marks are ignored."""
+        current = self.get(companyid)
+        if current is not None and current >= (pd.Timestamp(created), int(transcriptid)):
+            return
+        with self._lock:
+            self._marks[str(int(companyid))] = {
+                "transcriptcreationdateutc": pd.Timestamp(created).isoformat(),
+                "transcriptid": int(transcriptid),
+            }
+
+    def save(self):
+        """Write the marks atomically."""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._marks, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+class TranscriptSync:
+    """Incremental earnings call transcript discovery.
+
+    Only transcripts created after each company's high-water mark are fetched,
+    in a few set-based queries for the whole universe, so a daily refresh costs
+    work proportional to the new transcripts. A revised transcript of an
+    earnings call gets a new transcriptId and creation date, so it is picked up
+    like a new one. Companies without a mark start `initial_lookback_days` back.
+    """
+
+    def __init__(self, repository: TaskManagerRepository, state_path: str = "data/transcript_sync_state.json",
+                 initial_lookback_days: int = 365, chunksize: int = 1000):
+        """Initialize the sync.
+
+        Args:
+            repository: Repository used to query transcripts
+            state_path: JSON file holding the high-water marks
+            initial_lookback_days: How far back to look for companies never synced
+            chunksize: Number of companies per discovery query
+        """
+        self.repository = repository
+        self.state = TranscriptSyncState(state_path)
+        self.initial_lookback_days = initial_lookback_days
+        self.chunksize = chunksize
+
+    def fetch(self, companyids: Iterable[int]) -> pd.DataFrame:
+        """Get the transcripts created since the last sync, without advancing the marks.
+
+        Args:
+            companyids: Company ids
+
+        Returns:
+            pd.DataFrame: Latest new transcript per (companyid, keydevid), like `get_companies_transcriptsid`
+        """
+        initial_day = (pd.Timestamp.now() - pd.Timedelta(days=self.initial_lookback_days)).strftime("%Y-%m-%d")
+        companyids = list(companyids)
+        marks = [self.state.get(companyid) for companyid in companyids]
+        return self.repository.get_companies_transcriptsid(
+            companyids,
+            [initial_day if mark is None else mark[0] for mark in marks],
+            after_transcriptids=[None if mark is None else mark[1] for mark in marks],
+            chunksize=self.chunksize,
+        )
+
+    def commit(self, df: pd.DataFrame):
+        """Advance the marks past the transcripts in `df` (as returned by `fetch`) and save them."""
+        if not df.empty:
+            newest = df.sort_values(["transcriptcreationdateutc", "transcriptid"]).groupby("companyid").tail(1)
+            for row in newest.itertuples(index=False):
+                self.state.advance(row.companyid, row.transcriptcreationdateutc, row.transcriptid)
+        self.state.save()
+
+    def sync(self, companyids: Iterable[int]) -> pd.DataFrame:
+        """Fetch the new transcripts and advance the marks in one step.
+
+        Args:
+            companyids: Company ids
+
+        Returns:
+            pd.DataFrame: New transcripts
+        """
+        companyids = list(companyids)
+        df = self.fetch(companyids)
+        self.commit(df)
+        logger.info("Transcript sync found %d new transcripts for %d companies", len(df), len(companyids))
+        return df
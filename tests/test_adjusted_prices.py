@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from capitaliq_xpressfeed_dbmanager.adjusted_prices import adjusted_returns, lookup_div_adj_factors
+
+
+def prices(rows):
+    df = pd.DataFrame(rows, columns=["tradingitemid", "pricedate", "priceclose"])
+    df["pricedate"] = pd.to_datetime(df["pricedate"])
+    return df
+
+
+def factors(rows):
+    return pd.DataFrame(rows, columns=["tradingitemid", "fromdate", "todate", "divadjfactor"])
+
+
+def test_lookup_div_adj_factors():
+    """Test the interval lookup: inclusive bounds, open-ended last interval, gaps and other items default to 1"""
+    p = prices([
+        (1, "2023-01-01", 10.0),
+        (1, "2023-01-05", 10.0),
+        (1, "2023-01-06", 10.0),
+        (1, "2023-01-09", 10.0),
+        (1, "2023-01-10", 10.0),
+        (2, "2023-01-05", 10.0),
+        (3, "2023-01-05", 10.0),
+    ])
+    f = factors([
+        (2, "2023-01-01", None, 0.5),
+        (1, "2023-01-06", None, 0.9),
+        (1, "2023-01-02", "2023-01-05", 0.8),
+    ])
+    assert lookup_div_adj_factors(p, f).tolist() == [1.0, 0.8, 0.9, 0.9, 0.9, 0.5, 1.0]
+
+    gap = factors([(1, "2023-01-02", "2023-01-05", 0.8), (1, "2023-01-10", None, 0.9)])
+    assert lookup_div_adj_factors(p, gap).tolist() == [1.0, 0.8, 1.0, 1.0, 0.9, 1.0, 1.0]
+    assert lookup_div_adj_factors(p, factors([])).tolist() == [1.0] * 7
+
+
+def test_adjusted_returns():
+    """Test log and total returns per trading item on unsorted input"""
+    p = prices([
+        (2, "2023-01-03", 20.0),
+        (1, "2023-01-03", 11.0),
+        (1, "2023-01-02", 10.0),
+        (2, "2023-01-02", 40.0),
+        (1, "2023-01-04", 12.1),
+    ])
+    f = factors([(1, "2023-01-01", "2023-01-02", 0.5), (1, "2023-01-03", None, 1.0)])
+    df = adjusted_returns(p, f)
+
+    assert df["tradingitemid"].tolist() == [1, 1, 1, 2, 2]
+    assert df["divadjclose"].tolist() == [5.0, 11.0, 12.1, 40.0, 20.0]
+    np.testing.assert_allclose(df["totalreturn"], [1.0, 2.2, 2.42, 1.0, 0.5])
+    assert np.isnan(df["logreturn"].iloc[[0, 3]]).all()
+    np.testing.assert_allclose(df["logreturn"].iloc[[1, 2, 4]], np.log([2.2, 1.1, 0.5]))
+    np.testing.assert_allclose(np.exp(df.groupby("tradingitemid")["logreturn"].sum()), [2.42, 0.5])
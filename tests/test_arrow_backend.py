@@ -0,0 +1,60 @@
+import datetime
+import decimal
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from capitaliq_xpressfeed_dbmanager.arrow_backend import arrow_schema, rows_to_batch, table_to_pandas
+from capitaliq_xpressfeed_dbmanager.pg_types import BOOL, DATE, FLOAT8, INT4, JSONB, NUMERIC, TEXT, TIMESTAMPTZ
+
+INTERVAL = 1186
+INT4_ARRAY = 1007
+NUMERIC_ARRAY = 1231
+TEXT_ARRAY = 1009
+
+DESCRIPTION = [("id", INT4), ("price", NUMERIC), ("ratio", FLOAT8), ("active", BOOL), ("day", DATE),
+               ("created", TIMESTAMPTZ), ("name", TEXT), ("doc", JSONB), ("ids", INT4_ARRAY),
+               ("prices", NUMERIC_ARRAY), ("tags", TEXT_ARRAY), ("period", INTERVAL)]
+
+
+def test_arrow_schema_types():
+    """Test column type OIDs map to native Arrow types, arrays to lists and json to tagged strings"""
+    schema = arrow_schema(DESCRIPTION)
+    assert schema.types == [pa.int64(), pa.float64(), pa.float64(), pa.bool_(), pa.date32(),
+                            pa.timestamp("us", tz="UTC"), pa.string(), pa.string(), pa.list_(pa.int64()),
+                            pa.list_(pa.float64()), pa.list_(pa.string()), pa.string()]
+    assert schema.field("doc").metadata == {b"pg_type": b"json"}
+    assert schema.field("name").metadata is None
+
+
+def test_rows_to_batch_converts_json_arrays_and_other_types():
+    """Test json is stored as JSON text, arrays as lists and other types in their text form"""
+    created = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    rows = [
+        (1, 1.5, 0.25, True, datetime.date(2024, 1, 2), created, "a", {"a": [1, True]}, [1, None],
+         [decimal.Decimal("1.5"), None], ["x", "y"], datetime.timedelta(days=1)),
+        (None, None, None, None, None, None, None, "text", None, None, [], None),
+    ]
+    batch = rows_to_batch(rows, arrow_schema(DESCRIPTION))
+    values = batch.to_pydict()
+    assert values["id"] == [1, None]
+    assert values["created"][0] == created
+    assert [json.loads(v) for v in values["doc"]] == [{"a": [1, True]}, "text"]
+    assert values["ids"] == [[1, None], None]
+    assert values["prices"] == [[1.5, None], None]
+    assert values["tags"] == [["x", "y"], []]
+    assert values["period"] == ["1 day, 0:00:00", None]
+
+    df = table_to_pandas(pa.Table.from_batches([batch]))
+    assert str(df["day"].dtype).startswith("datetime64")
+    assert df["ratio"].dtype == "float64"
+
+
+def test_rows_to_batch_empty():
+    """Test an empty result keeps the schema"""
+    schema = arrow_schema(DESCRIPTION)
+    batch = rows_to_batch([], schema)
+    assert batch.num_rows == 0
+    assert batch.schema == schema
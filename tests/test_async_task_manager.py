@@ -0,0 +1,42 @@
+import asyncio
+
+import pandas as pd
+from capitaliq_xpressfeed_dbmanager import AsyncTaskManagerRepository
+
+
+class FakeAsyncDatabase:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def query_all(self, query, params=()):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if params[0] == "BAD":
+            raise ValueError("bad ticker")
+        return pd.DataFrame({"ticker": [params[0]]})
+
+
+def test_gather_keeps_order_and_caps_concurrency():
+    """Test gather returns results in argument order with at most max_concurrency queries in flight"""
+    database = FakeAsyncDatabase()
+    repo = AsyncTaskManagerRepository(database, max_concurrency=3)
+    tickers = [f"T{i}" for i in range(10)]
+    results = asyncio.run(repo.gather(repo.get_security_info, [(t, "US") for t in tickers]))
+    assert [r["ticker"][0] for r in results] == tickers
+    assert database.max_in_flight == 3
+
+    results = asyncio.run(repo.gather(repo.get_security_info, [("A", "US"), ("BAD", "US")], return_exceptions=True))
+    assert isinstance(results[1], ValueError)
+
+
+def test_repository_reused_across_event_loops():
+    """Test the repository works under a second asyncio.run while queries wait on the limit"""
+    database = FakeAsyncDatabase()
+    repo = AsyncTaskManagerRepository(database, max_concurrency=1)
+    for _ in range(2):
+        results = asyncio.run(repo.gather(repo.get_security_info, [("A", "US"), ("B", "US"), ("C", "US")]))
+        assert len(results) == 3
+    assert database.max_in_flight == 1
@@ -0,0 +1,49 @@
+import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+from capitaliq_xpressfeed_dbmanager.compact import compact_frame, method_schemas
+
+
+def market_cap_rows():
+    return pd.DataFrame({
+        "companyid": [24937, 18749, 24937, 18749],
+        "marketcap": [Decimal("3000000.123456"), Decimal("1500.5"), None, Decimal("1.0")],
+        "pricingdate": [datetime.date(2024, 6, 28)] * 4,
+        "country": ["US"] * 4,
+        "companyname": ["Apple Inc.", "Microsoft Corporation", "Apple Inc.", "Microsoft Corporation"],
+        "transcriptpersonid": [1.0, None, 3.0, 4.0],
+    })
+
+
+def test_compact_frame():
+    """Test the column type policies and inferred defaults"""
+    df = compact_frame(market_cap_rows(), method_schemas({"query_global_market_cap": {
+        "marketcap": ("float64", 2)}})["query_global_market_cap"])
+    assert df["companyid"].dtype == "int32"
+    assert df["marketcap"].tolist()[:2] == [3000000.12, 1500.5]
+    assert pd.api.types.is_datetime64_any_dtype(df["pricingdate"])
+    assert isinstance(df["country"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["companyname"].dtype, pd.CategoricalDtype)
+    assert df["transcriptpersonid"].dtype == "Int32"
+
+    # without a schema: Decimals, dates and id columns are still inferred
+    inferred = compact_frame(market_cap_rows(), {})
+    assert inferred["marketcap"].dtype == "float64"
+    assert inferred["companyid"].dtype == "int32"
+    assert compact_frame(pd.DataFrame({"companyid": [2**40]}))["companyid"].dtype == "int64"
+
+
+def test_repository_compact_schemas():
+    """Test that compaction is wired per method and validates overrides"""
+    class Database:
+        def query_all(self, query, params=()):
+            return pd.DataFrame({"dataitemid": [1, 2], "dataitemname": ["a", "b"],
+                                 "dataitemdescription": ["x", "y"]})
+
+    df = TaskManagerRepository(Database(), compact=True).get_dataitem_info([1, 2])
+    assert df["dataitemid"].dtype == "int32"
+    with pytest.raises(ValueError):
+        TaskManagerRepository(Database(), compact=True, compact_schemas={"iter_transcripts": {}})
@@ -0,0 +1,112 @@
+import pytest
+import psycopg2.extensions
+from capitaliq_xpressfeed_dbmanager import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def make_pool():
+    def _make(**kwargs):
+        return ConnectionPool({}, connect=lambda **_: FakeConnection(), **kwargs)
+    return _make
+
+
+def test_pool_reuses_connections(make_pool):
+    """Test a returned connection is rolled back and handed out again"""
+    pool = make_pool(minsize=1, maxsize=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert conn.rollbacks == 1
+
+
+def test_pool_times_out_when_exhausted(make_pool):
+    """Test getconn raises PoolTimeout when all connections are checked out"""
+    pool = make_pool(minsize=0, maxsize=1, timeout=0.05)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+
+def test_pool_replaces_broken_and_expired_connections(make_pool):
+    """Test broken and expired connections are closed and replaced on checkout"""
+    pool = make_pool(maxsize=2, health_check_after=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    fresh = pool.getconn()
+    assert fresh is not conn and conn.closed
+    pool.putconn(fresh)
+
+    pool.max_lifetime = 0
+    assert pool.getconn() is not fresh
+    assert fresh.closed
+
+
+def test_pool_recycles_idle_connections_above_minsize(make_pool):
+    """Test idle connections above minsize are closed after max_idle"""
+    pool = make_pool(minsize=1, maxsize=3, max_idle=0)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns:
+        pool.putconn(conn)
+    pool.getconn()
+    assert pool.stats()["size"] == 1
+
+
+def test_pool_closes_idle_connections_outside_the_lock(make_pool):
+    """Test recycled idle connections are closed after the pool lock is released"""
+    import threading
+
+    pool = make_pool(minsize=0, maxsize=2, max_idle=0)
+    locked = []
+
+    def try_lock():
+        acquired = pool._cond.acquire(timeout=0.5)
+        locked.append(not acquired)
+        if acquired:
+            pool._cond.release()
+
+    def close():
+        # another thread must be able to take the lock while the connection closes
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    conn = pool.getconn()
+    conn.close = close
+    pool.putconn(conn)
+    pool.getconn()
+    assert locked == [False]
@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import copy_extract
+from capitaliq_xpressfeed_dbmanager.copy_extract import copy_statement, read_copy_csv
+from capitaliq_xpressfeed_dbmanager.pg_types import BOOL, DATE, FLOAT8, INT4, TEXT
+
+COLUMNS = [("name", TEXT), ("id", INT4), ("price", FLOAT8), ("active", BOOL), ("day", DATE)]
+# COPY output of a text value "\N", a NULL row, an empty string and quoted fields containing "\N"
+COPY_OUTPUT = (b'"\\N",1,1.5,t,2024-01-02\n'
+               b'\\N,\\N,\\N,\\N,\\N\n'
+               b',2,2,f,2024-01-03\n'
+               b'"a,""\\N"",b",3,\\N,t,2024-01-04\n'
+               b'"x\n""\\N""",4,0.5,f,2024-01-05\n')
+
+
+@pytest.fixture(params=["pyarrow", "pandas"])
+def parser(request, monkeypatch):
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(copy_extract, "pa_csv", None)
+    return request.param
+
+
+def test_copy_statement():
+    """Test queries are wrapped in a CSV COPY with the NULL marker"""
+    assert copy_statement("SELECT 1;\n") == "COPY (\nSELECT 1\n) TO STDOUT WITH (FORMAT csv, NULL '\\N')"
+
+
+def test_read_copy_csv_nulls_and_empty_strings(parser):
+    """Test only unquoted \\N is NULL, quoted \\N and empty fields stay strings, on both parsers"""
+    df = read_copy_csv(io.BytesIO(COPY_OUTPUT), COLUMNS)
+    assert df["name"].tolist()[0] == "\\N"
+    assert pd.isna(df["name"][1])
+    assert df["name"].tolist()[2:] == ["", 'a,"\\N",b', 'x\n"\\N"']
+    assert df["id"].isna().tolist() == [False, True, False, False, False]
+    assert df["id"].dropna().tolist() == [1, 2, 3, 4]
+    assert df["price"].isna().tolist() == [False, True, False, True, False]
+    assert df["active"].tolist()[:1] + df["active"].tolist()[2:] == [True, False, True, False]
+    assert pd.isna(df["active"][1])
+    assert str(df["day"].dtype).startswith("datetime64")
+    assert df["day"][0] == pd.Timestamp("2024-01-02")
+
+
+def test_read_copy_csv_empty(parser):
+    """Test an empty COPY output gives an empty frame with the column names"""
+    df = read_copy_csv(io.BytesIO(b""), COLUMNS)
+    assert df.empty
+    assert df.columns.tolist() == [name for name, _ in COLUMNS]
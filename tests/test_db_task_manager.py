@@ -0,0 +1,50 @@
+import datetime
+from decimal import Decimal
+
+import pandas as pd
+from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+from capitaliq_xpressfeed_dbmanager.db_task_manager import PAST_PRICE_COLUMNS
+
+
+class PriceDatabase:
+    """Returns two days of unrounded Decimal prices for every company of a past price query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def query_all(self, query, params=()):
+        companyids = params[0] if isinstance(params[0], list) else [params[0]]
+        self.queries.append(params[0])
+        rows = [
+            {"companyid": companyid, "tradingitemid": companyid * 10, "currencyid": 160,
+             "pricedate": datetime.date(2024, 1, day), "priceclose": Decimal("10.1234"),
+             "priceopen": Decimal("10.005"), "pricehigh": Decimal("11.119"), "pricelow": Decimal("9.991"),
+             "volume": Decimal("1000.456"), "vwap": Decimal("10.0449"), "divadjclose": Decimal("9.87654"),
+             "divadjfactor": Decimal("0.975612")}
+            for companyid in companyids for day in (2, 3)
+        ]
+        return pd.DataFrame(rows)
+
+
+def test_get_past_prices_chunks_and_deduplicates_ids():
+    """Test companies are queried once each, in chunks, in the order given"""
+    database = PriceDatabase()
+    df = TaskManagerRepository(database).get_past_prices([3, 1, 3, "2", 4, 1, 5], chunksize=2)
+
+    assert database.queries == [[3, 1], [2, 4], [5]]
+    assert df["companyid"].tolist() == [3, 3, 1, 1, 2, 2, 4, 4, 5, 5]
+    assert df.columns.tolist() == ["companyid", "tradingitemid", "currencyid"] + PAST_PRICE_COLUMNS
+
+
+def test_get_past_prices_formats_like_get_past_price():
+    """Test the price columns are rounded and typed exactly like those of get_past_price"""
+    database = PriceDatabase()
+    repository = TaskManagerRepository(database)
+    single = repository.get_past_price(7)
+    batched = repository.get_past_prices([7])
+
+    assert database.queries == [7, [7]]
+    pd.testing.assert_frame_equal(batched[PAST_PRICE_COLUMNS], single)
+    assert single["priceclose"].tolist() == [10.12, 10.12]
+    assert single["divadjfactor"].tolist() == [0.9756, 0.9756]
+    assert pd.api.types.is_datetime64_any_dtype(single["pricedate"])
@@ -0,0 +1,26 @@
+import pytest
+from capitaliq_xpressfeed_dbmanager.id_sets import chunk_params, id_set_strategy, join_id_table
+
+
+def test_id_set_strategy():
+    """Test the automatic choice by id set size"""
+    assert id_set_strategy(10, chunksize=100, temp_table_threshold=1000) == "array"
+    assert id_set_strategy(500, chunksize=100, temp_table_threshold=1000) == "chunks"
+    assert id_set_strategy(5000, chunksize=100, temp_table_threshold=1000) == "temp_table"
+
+
+def test_chunk_params():
+    """Test that only the id parameter is split"""
+    params = ([28, 15], [1, 2, 3, 4, 5], 2020)
+    assert chunk_params(params, 1, 2) == [([28, 15], [1, 2], 2020), ([28, 15], [3, 4], 2020),
+                                          ([28, 15], [5], 2020)]
+
+
+def test_join_id_table():
+    """Test rewriting an ANY filter into a temp table semi-join"""
+    sql = "select * from t where a = ANY(%s) and b = any( %s ) and c > %s"
+    query, params = join_id_table(sql, ([1], [2], 3), 1, "ids")
+    assert query == "select * from t where a = ANY(%s) and b IN (SELECT id FROM ids) and c > %s"
+    assert params == ([1], 3)
+    with pytest.raises(ValueError):
+        join_id_table(sql, ([1], [2], 3), 2, "ids")
@@ -51,4 +51,66 @@ def test_get_historical_fundamental(task_manager):
     assert result is not None
     assert not result.empty
     assert 'dataitemname' in result.columns
-    assert 'dataitemvalue' in result.columns
\ No newline at end of file
+    assert 'dataitemvalue' in result.columns
+
+def test_iter_historical_fundamental(task_manager):
+    """Test streaming historical fundamental data in chunks"""
+    chunks = list(task_manager.iter_historical_fundamental(ls_ids=[24937, ], ls_dataitemid=[8,9], startyear=2020, periodtypeid=[1], chunksize=5))
+    assert len(chunks) > 0
+    assert all(len(chunk) <= 5 for chunk in chunks)
+    assert 'dataitemvalue' in chunks[0].columns
+
+
+def test_get_past_price_copy(database):
+    """Test getting past price data through COPY extraction"""
+    task_manager = TaskManagerRepository(database, copy_threshold=0)
+    result = task_manager.get_past_price(companyid=24937, traling_x_years=1)
+    assert not result.empty
+    assert result['priceclose'].dtype == float
+
+
+def test_arrow_backend_typed_columns(db_config):
+    """Test that the arrow backend returns native column types"""
+    task_manager = TaskManagerRepository(PostgresDatabase(**db_config, result_backend="arrow"))
+    result = task_manager.get_historical_fundamental(ls_ids=[24937, ], ls_dataitemid=[8,9], startyear=2020, periodtypeid=[1])
+    assert result['dataitemvalue'].dtype == float
+    assert str(result['periodenddate'].dtype).startswith('datetime64')
+
+
+def test_get_past_prices(task_manager):
+    """Test getting batched past price data for several companies"""
+    result = task_manager.get_past_prices(companyids=[24937, 18749], traling_x_years=1, chunksize=1)
+    assert not result.empty
+    assert set(result['companyid']) <= {24937, 18749}
+    assert 'divadjclose' in result.columns
+
+
+def test_async_get_past_price(db_config):
+    """Test fanning out past price requests on the async backend"""
+    import asyncio
+    from capitaliq_xpressfeed_dbmanager import AsyncPostgresDatabase, AsyncTaskManagerRepository
+
+    async def fetch():
+        async with AsyncPostgresDatabase(**db_config, pool_maxsize=2) as database:
+            repository = AsyncTaskManagerRepository(database, max_concurrency=2)
+            return await repository.gather(repository.get_past_price, [(24937, 1), (18749, 1)])
+
+    results = asyncio.run(fetch())
+    assert len(results) == 2
+    assert 'priceclose' in results[0].columns
+
+
+def test_query_market_cap_universe(task_manager):
+    """Test that the multi-date universe matches the single-date query"""
+    result = task_manager.query_market_cap_universe(["2024-05-31", "2024-06-28"], 1000, countries="US")
+    single = task_manager.query_global_market_cap("2024-06-28", 1000, country="US")
+    assert not result.duplicated(['asofdate', 'companyid']).any()
+    assert set(result.loc[result['asofdate'] == "2024-06-28", 'companyid']) == set(single['companyid'])
+
+
+def test_get_estimates_panel(task_manager):
+    """Test the multi-company estimates panel"""
+    result = task_manager.get_estimates_panel([24937, 18749], [100186, 100284], "2020-01-01", chunksize=1)
+    assert list(result.index.names) == ['companyid', 'periodenddate']
+    assert not result.index.duplicated().any()
+    assert set(result.index.get_level_values('companyid')) <= {24937, 18749}
@@ -0,0 +1,31 @@
+import json
+import logging
+
+from capitaliq_xpressfeed_dbmanager import logger as log_module
+from capitaliq_xpressfeed_dbmanager.logger import configure_logging, get_logger, log_query, shutdown_logging
+
+
+def test_configure_logging_writes_through_queue(tmp_path, monkeypatch):
+    """Test queued JSON file logging and query truncation"""
+    monkeypatch.setattr(logging.getLogger(), "level", logging.getLogger().level)
+    configure_logging(level="INFO", fmt="json", log_dir=str(tmp_path), console=False, query_max_chars=20)
+    try:
+        logger = get_logger("capitaliq_xpressfeed_dbmanager.test")
+        log_query(logger, "Executing query", "select *\n    from ciqcompany where companyid = %s")
+        logger.info("Total rows: %d", 3)
+    finally:
+        shutdown_logging()
+        monkeypatch.setattr(log_module, "LOG_QUERY_MAX_CHARS", 1000)
+
+    (log_file,) = [p for p in tmp_path.iterdir() if "errors" not in p.name]
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert records[0]["message"] == "Executing query: select * from ciqcom... [25 chars truncated]"
+    assert records[1]["message"] == "Total rows: 3"
+
+
+def test_log_query_sampling(monkeypatch, caplog):
+    """Test that query text is only logged for the sampled fraction"""
+    monkeypatch.setattr(log_module, "LOG_QUERY_SAMPLE_RATE", 0.0)
+    with caplog.at_level(logging.INFO):
+        log_query(get_logger("capitaliq_xpressfeed_dbmanager.test"), "Executing query", "select 1")
+    assert not caplog.records
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+from capitaliq_xpressfeed_dbmanager.memoize import Memoizer, normalize_argument
+
+
+class SlowDatabase:
+    def __init__(self):
+        self.calls = 0
+
+    def query_all(self, query, params=()):
+        self.calls += 1
+        time.sleep(0.05)
+        return pd.DataFrame({"dataitemid": [1, 2], "dataitemname": ["a", "b"]})
+
+
+def test_normalize_argument():
+    """Test that equivalent arguments share a key"""
+    assert normalize_argument([np.int64(1), 2]) == normalize_argument(np.array([1, 2])) == (1, 2)
+    assert normalize_argument(pd.Timestamp("2024-01-31")) == "2024-01-31"
+    assert normalize_argument({3, 1}) == normalize_argument({1, 3})
+
+
+def test_repository_memoization_and_coalescing():
+    """Test hits, copies, concurrent coalescing and per-method disabling"""
+    database = SlowDatabase()
+    repository = TaskManagerRepository(database, memoize=["get_dataitem_info"])
+
+    threads = [threading.Thread(target=repository.get_dataitem_info, args=([1, 2],)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert database.calls == 1
+
+    first = repository.get_dataitem_info(np.array([1, 2]))
+    first.loc[0, "dataitemname"] = "changed"
+    assert repository.get_dataitem_info(dataitemids=(1, 2)).loc[0, "dataitemname"] == "a"
+    assert database.calls == 1
+    assert repository.memo.stats()["coalesced"] + repository.memo.stats()["hits"] == 6
+
+    repository.memo.disable("get_dataitem_info")
+    repository.get_dataitem_info([1, 2])
+    assert database.calls == 2
+
+    with pytest.raises(ValueError):
+        TaskManagerRepository(database, memoize=["iter_transcripts"])
+
+
+def test_memoizer_ttl_and_size():
+    """Test expiry and LRU eviction"""
+    calls = []
+    memo = Memoizer(maxsize=1, ttl=0.05)
+    double = memo.wrap(lambda x: calls.append(x) or 2 * x, name="double")
+    double(1), double(1), double(2), double(1)
+    assert calls == [1, 2, 1]
+    time.sleep(0.06)
+    double(1)
+    assert calls == [1, 2, 1, 1]
+    assert memo.stats()["evictions"] == 2
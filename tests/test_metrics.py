@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import InMemorySink, Metrics, PrometheusTextfileSink, get_metrics
+from capitaliq_xpressfeed_dbmanager import metrics as metrics_module
+from capitaliq_xpressfeed_dbmanager.metrics import track_methods
+
+
+class TimedDatabase:
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def query_all(self, query, params=()):
+        with self.metrics.measure("query_all", query) as m:
+            m.lap("connect")
+            if "fail" in query:
+                raise ValueError("boom")
+            df = pd.DataFrame({"x": range(3)})
+            m.lap("build")
+            m.rows = len(df)
+            return df
+
+
+@track_methods
+class Repository:
+    def __init__(self, database):
+        self.database = database
+
+    def outer(self):
+        self.database.query_all("select 1")
+        return self.inner()
+
+    def inner(self):
+        return self.database.query_all("select 2")
+
+    def failing(self):
+        return self.database.query_all("select fail")
+
+
+def test_queries_are_attributed_to_the_outermost_method(monkeypatch):
+    """Test per-method attribution, method records and the summary"""
+    sink = InMemorySink()
+    monkeypatch.setattr(get_metrics(), "sinks", [sink])
+    repository = Repository(TimedDatabase(get_metrics()))
+
+    repository.outer()
+    with pytest.raises(ValueError):
+        repository.failing()
+
+    assert [m.method for m in sink.queries] == ["outer", "outer", "failing"]
+    assert sink.queries[-1].error == "ValueError: boom"
+    assert [(m.method, m.queries, m.rows) for m in sink.methods] == [("outer", 2, 6), ("failing", 1, 0)]
+    summary = sink.summary()
+    assert summary.loc["outer", "queries"] == 2
+    assert summary.loc["failing", "errors"] == 1
+    assert sink.histograms[("outer", "method")].count == 1
+
+
+def test_prometheus_textfile(monkeypatch, tmp_path):
+    """Test the histograms written for the textfile collector"""
+    path = tmp_path / "capitaliq.prom"
+    sink = PrometheusTextfileSink(str(path))
+    monkeypatch.setattr(get_metrics(), "sinks", [sink])
+    Repository(TimedDatabase(get_metrics())).outer()
+    sink.flush()
+
+    text = path.read_text()
+    assert 'capitaliq_query_seconds_count{method="outer",phase="total"} 2' in text
+    assert 'capitaliq_method_seconds_bucket{method="outer",le="+Inf"} 1' in text
+    assert 'capitaliq_query_rows_total{method="outer"} 6' in text
+
+
+def test_database_with_own_metrics(monkeypatch):
+    """Test methods are attributed and recorded on the database's own Metrics, even with the default disabled"""
+    monkeypatch.setattr(get_metrics(), "sinks", [])
+    monkeypatch.setattr(get_metrics(), "slow_query_seconds", None)
+    assert not get_metrics().enabled
+    sink = InMemorySink()
+    repository = Repository(TimedDatabase(Metrics(sinks=[sink])))
+    repository.outer()
+
+    assert [m.method for m in sink.queries] == ["outer", "outer"]
+    assert [(m.method, m.queries) for m in sink.methods] == [("outer", 2)]
+
+
+def test_measure_without_sinks_is_a_no_op(monkeypatch):
+    """Test queries are neither fingerprinted nor recorded when nothing would see them"""
+    def fingerprint(query):
+        raise AssertionError("fingerprinted an unrecorded query")
+
+    monkeypatch.setattr(metrics_module, "query_fingerprint", fingerprint)
+    df = TimedDatabase(Metrics()).query_all("select 1")
+    assert len(df) == 3
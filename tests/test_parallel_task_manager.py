@@ -0,0 +1,25 @@
+import time
+from capitaliq_xpressfeed_dbmanager import ParallelTaskManager
+
+
+class FakeDatabase:
+    pool = None
+
+
+class FakeRepository:
+    database = FakeDatabase()
+
+    def get_past_price(self, companyid, traling_x_years=5):
+        time.sleep(0.01 * (companyid % 3))
+        if companyid < 0:
+            raise ValueError("bad company id")
+        return companyid * 10
+
+
+def test_map_keeps_order_and_captures_errors():
+    """Test ordered results and per-task error capture"""
+    with ParallelTaskManager(FakeRepository(), max_workers=4) as parallel:
+        results = parallel.get_past_price([5, 4, -1, 3])
+    assert [r.value for r in results] == [50, 40, None, 30]
+    assert [r.ok for r in results] == [True, True, False, True]
+    assert isinstance(results[2].error, ValueError)
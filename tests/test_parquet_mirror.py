@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+pa = pytest.importorskip("pyarrow")
+
+from capitaliq_xpressfeed_dbmanager import MirrorDatabase, ParquetMirror
+from capitaliq_xpressfeed_dbmanager.prepared_statements import to_numbered_placeholders
+
+
+class SourceDatabase:
+    """Stands in for PostgresDatabase: runs the export queries on an in-memory DuckDB."""
+
+    def __init__(self, prices):
+        self.conn = duckdb.connect()
+        self.conn.register("prices_df", prices)
+        self.conn.execute("CREATE TABLE miadjprice AS SELECT * FROM prices_df")
+        self.conn.execute("CREATE TABLE ciqtradingitem AS SELECT 1 AS tradingitemid, 'AAA' AS tickersymbol")
+
+    def query_arrow(self, query, params=()):
+        return pa.Table.from_pandas(self.query_all(query, params), preserve_index=False)
+
+    def query_all(self, query, params=()):
+        return self.conn.execute(to_numbered_placeholders(query)[0], list(params)).df()
+
+
+def prices(start, end, ids=(1, 2, 3), close=10.0):
+    dates = pd.date_range(start, end, freq="D")
+    return pd.DataFrame([(i, d.date(), close) for i in ids for d in dates],
+                        columns=["tradingitemid", "pricedate", "priceclose"])
+
+
+def test_sync_and_query(tmp_path):
+    """Test the initial export, an incremental sync and serving queries from the mirror"""
+    root = str(tmp_path / "mirror")
+    source = SourceDatabase(prices("2024-01-01", "2024-02-29"))
+    mirror = ParquetMirror(source, root, tables=["miadjprice", "ciqtradingitem"], buckets=2, start="2024-01-01")
+    assert mirror.sync() == {"miadjprice": 3 * 60, "ciqtradingitem": 1}
+
+    database = MirrorDatabase(root, fallback=source)
+    df = database.query_all("SELECT tradingItemId, priceDate FROM miadjprice WHERE tradingitemid = ANY(%s) "
+                            "AND pricedate >= %s::date ORDER BY pricedate", ([2], "2024-02-28"))
+    assert list(df.columns) == ["tradingitemid", "pricedate"]
+    assert len(df) == 2
+
+    # new and corrected prices in February: only February is re-exported
+    source.conn.execute("UPDATE miadjprice SET priceclose = 11 WHERE pricedate >= DATE '2024-02-25'")
+    source.conn.execute("INSERT INTO miadjprice SELECT 4, DATE '2024-02-29', 12.0")
+    written = mirror.sync()
+    assert written["miadjprice"] == 3 * 29 + 1
+    totals = database.query_all("SELECT count(*) AS n, sum(priceclose) AS s FROM miadjprice")
+    assert totals["n"][0] == 3 * 60 + 1
+    assert totals["s"][0] == 10.0 * 3 * 55 + 11.0 * 3 * 5 + 12.0
+
+    # tables that are not mirrored are answered by the fallback
+    source.conn.execute("CREATE TABLE ciqcompany AS SELECT 7 AS companyid")
+    assert database.query_all("SELECT companyid FROM ciqcompany")["companyid"].tolist() == [7]
+
+
+class FailingDatabase:
+    """Fallback that must not be reached."""
+
+    def query_all(self, query, params=()):
+        raise AssertionError(f"query went to the fallback: {query}")
+
+
+def universe_source():
+    source = SourceDatabase(prices("2024-01-01", "2024-01-05"))
+    for sql in [
+        "CREATE TABLE ciqmarketcap AS SELECT * FROM (VALUES (10, DATE '2024-01-02', 5000.0), "
+        "(20, DATE '2024-01-04', 900.0), (20, DATE '2024-01-05', 3000.0)) t(companyid, pricingdate, marketcap)",
+        "CREATE TABLE ciqexchangerate AS SELECT * FROM (VALUES (1, DATE '2024-01-02', 1.0, 1), "
+        "(1, DATE '2024-01-05', 2.0, 1)) t(currencyid, pricedate, priceclose, latestsnapflag)",
+        "CREATE TABLE ciqcompany AS SELECT * FROM (VALUES (10, 'Ten', 4, 1), (20, 'Twenty', 4, 1)) "
+        "t(companyid, companyname, companytypeid, countryid)",
+        "CREATE TABLE ciqsecurity AS SELECT * FROM (VALUES (100, 10, 1), (200, 20, 1)) t(securityid, companyid, primaryflag)",
+        "DROP TABLE ciqtradingitem",
+        "CREATE TABLE ciqtradingitem AS SELECT * FROM (VALUES (1000, 100, 'TEN', 1, 1, 1), (2000, 200, 'TWY', 1, 1, 1)) "
+        "t(tradingitemid, securityid, tickersymbol, currencyid, exchangeid, primaryflag)",
+        "CREATE TABLE ciqcurrency AS SELECT 1 AS currencyid, 'USD' AS isocode",
+        "CREATE TABLE ciqexchange AS SELECT 1 AS exchangeid, 'NYSE' AS exchangesymbol",
+        "CREATE TABLE ciqcountrygeo AS SELECT 1 AS countryid, 'US' AS isocountry2",
+    ]:
+        source.conn.execute(sql)
+    return source
+
+
+UNIVERSE_TABLES = ["ciqmarketcap", "ciqexchangerate", "ciqcompany", "ciqsecurity", "ciqtradingitem", "ciqcurrency",
+                   "ciqexchange", "ciqcountrygeo"]
+
+
+def test_mirror_serves_ctes_and_lateral_joins(tmp_path):
+    """Test queries with a CTE, a table function and a LATERAL join are served by the mirror, not the fallback"""
+    root = str(tmp_path / "mirror")
+    ParquetMirror(universe_source(), root, tables=UNIVERSE_TABLES, start="2024-01-01").sync()
+    database = MirrorDatabase(root, fallback=FailingDatabase())
+
+    df = database.query_all("WITH big AS (SELECT companyid FROM ciqmarketcap WHERE marketcap > %s) "
+                            "SELECT c.companyname FROM big JOIN ciqcompany c ON c.companyid = big.companyid "
+                            "ORDER BY 1", (1000,))
+    assert df["companyname"].tolist() == ["Ten", "Twenty"]
+
+
+
+def test_market_cap_universe_on_mirror(tmp_path):
+    """Test query_market_cap_universe runs on the mirror without touching the fallback"""
+    from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+
+    root = str(tmp_path / "mirror")
+    ParquetMirror(universe_source(), root, tables=UNIVERSE_TABLES, start="2024-01-01").sync()
+    repository = TaskManagerRepository(MirrorDatabase(root, fallback=FailingDatabase()))
+
+    universe = repository.query_market_cap_universe(["2024-01-03", "2024-01-05"], 1000, allow_fuzzy=True)
+    assert list(zip(universe["asofdate"].dt.strftime("%Y-%m-%d"), universe["companyid"])) == [
+        ("2024-01-03", 10), ("2024-01-05", 10), ("2024-01-05", 20)]
+    assert universe["usdmarketcap"].tolist() == [5000.0, 2500.0, 1500.0]
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager.point_in_time import fundamentals_as_of
+
+
+def filings(rows):
+    df = pd.DataFrame(rows, columns=["companyid", "dataitemid", "periodenddate", "filingdate", "dataitemvalue"])
+    df["instancedate"] = df["filingdate"]
+    df["periodtypeid"] = 2
+    df["dataitemname"] = df["dataitemid"].map({1: "Revenue", 2: "EPS"})
+    return df
+
+
+def test_fundamentals_as_of():
+    """Test as-of values: newest period wins, late restatements of old periods are ignored"""
+    df = filings([
+        (10, 1, "2023-03-31", "2023-05-01", 100.0),
+        (10, 1, "2023-06-30", "2023-08-01", 110.0),
+        (10, 1, "2023-03-31", "2023-09-01", 90.0),   # restatement of an older period
+        (10, 1, "2023-06-30", "2023-10-01", 115.0),  # restatement of the newest period
+        (10, 2, "2023-06-30", "2023-08-01", 1.5),
+    ])
+    wide = fundamentals_as_of(df, ["2023-04-30", "2023-08-01", "2023-09-15", "2023-10-02"], companyids=[10, 20])
+
+    assert list(wide.columns) == ["Revenue", "EPS"]
+    assert len(wide) == 8
+    revenue = wide.xs(10, level="companyid")["Revenue"].tolist()
+    assert pd.isna(revenue[0])
+    assert revenue[1:] == [100.0, 110.0, 115.0]
+    assert wide.xs(20, level="companyid").isna().all().all()
+
+    known = fundamentals_as_of(df, ["2023-08-01"], include_filing_date=True)
+    assert known.loc[(pd.Timestamp("2023-08-01"), 10), "Revenue"] == 110.0
+
+
+def test_fundamentals_as_of_rejects_mixed_period_types():
+    """Test that annual and quarterly values are not mixed"""
+    df = filings([(10, 1, "2023-03-31", "2023-05-01", 100.0)])
+    df = pd.concat([df, df.assign(periodtypeid=1)])
+    with pytest.raises(ValueError):
+        fundamentals_as_of(df, ["2023-06-01"])
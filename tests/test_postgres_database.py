@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+import pytest
+from capitaliq_xpressfeed_dbmanager import InMemorySink, Metrics, PostgresDatabase
+from capitaliq_xpressfeed_dbmanager.base_database import BaseDatabase
+
+ROWS = [(i, f"name{i}") for i in range(7)]
+
+
+class FakeCursor:
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = 2000
+        self.description = None
+        self.fetches = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((self.name, query, params))
+        self.description = [("id", 23), ("name", 25)]
+        self._rows = list(self.conn.rows)
+
+    def fetchmany(self, size):
+        self.fetches.append(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    rows = ROWS
+    created = []
+
+    def __init__(self, **kwargs):
+        self.created.append(self)
+        self.closed = 0
+        self.executed = []
+        self.cursors = []
+
+    def cursor(self, name=None):
+        cur = FakeCursor(self, name)
+        self.cursors.append(cur)
+        return cur
+
+    def close(self):
+        self.closed = 1
+
+
+class ListDatabase(BaseDatabase):
+    """Database returning a fixed frame, using the default query_iter."""
+
+    def __init__(self, df):
+        self.df = df
+
+    @contextmanager
+    def get_connection(self):
+        yield None
+
+    def query_all(self, query, params=()):
+        return self.df
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    FakeConnection.rows = ROWS
+    FakeConnection.created = []
+    monkeypatch.setattr(psycopg2, "connect", FakeConnection)
+
+
+def test_base_query_iter_slices_query_all():
+    """Test the default query_iter slices the query_all result, with a short last chunk"""
+    df = pd.DataFrame({"x": range(5)})
+    chunks = list(ListDatabase(df).query_iter("select", chunksize=2))
+    assert [chunk["x"].tolist() for chunk in chunks] == [[0, 1], [2, 3], [4]]
+
+    empty = list(ListDatabase(df.iloc[:0]).query_iter("select", chunksize=2))
+    assert len(empty) == 1 and empty[0].empty
+
+
+def test_query_iter_streams_a_named_cursor():
+    """Test query_iter fetches chunks from a named server-side cursor, ending with a short one"""
+    database = PostgresDatabase("db", "user")
+    chunks = list(database.query_iter("select id, name from t where id < %s", (10,), chunksize=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert pd.concat(chunks, ignore_index=True).values.tolist() == [list(row) for row in ROWS]
+    assert chunks[0].columns.tolist() == ["id", "name"]
+    conn = FakeConnection.created[-1]
+    cur = conn.cursors[-1]
+    assert cur.name.startswith("query_iter_")
+    assert cur.itersize == 3
+    assert conn.executed == [(cur.name, "select id, name from t where id < %s", (10,))]
+    assert cur.fetches == [3, 3, 3, 3]
+    assert conn.closed == 1
+
+
+def test_query_iter_empty_result():
+    """Test an empty result yields one empty frame with the result columns"""
+    FakeConnection.rows = []
+    chunks = list(PostgresDatabase("db", "user").query_iter("select id, name from t", chunksize=3))
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert chunks[0].columns.tolist() == ["id", "name"]
+
+
+def test_query_iter_closed_early_releases_the_connection():
+    """Test closing the iterator before the end closes the connection"""
+    chunks = PostgresDatabase("db", "user").query_iter("select id, name from t", chunksize=3)
+    next(chunks)
+    assert FakeConnection.created[-1].closed == 0
+    chunks.close()
+    assert FakeConnection.created[-1].closed == 1
+
+
+def test_streams_record_query_metrics(monkeypatch, tmp_path):
+    """Test query_iter and query_parquet report their phases, rows and bytes"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(psycopg2.extensions, "register_type", lambda *args: None)
+    sink = InMemorySink()
+    database = PostgresDatabase("db", "user", metrics=Metrics(sinks=[sink]))
+
+    assert sum(len(chunk) for chunk in database.query_iter("select id, name from t", chunksize=3)) == 7
+    path = tmp_path / "t.parquet"
+    assert database.query_parquet("select id, name from t", str(path), chunksize=3) == 7
+    assert pq.read_table(path).num_rows == 7
+
+    iter_metrics, parquet_metrics = sink.queries
+    assert (iter_metrics.operation, iter_metrics.rows) == ("query_iter", 7)
+    assert (parquet_metrics.operation, parquet_metrics.rows) == ("query_parquet", 7)
+    assert iter_metrics.bytes > 0 and parquet_metrics.bytes > 0
+    assert all(m.execute > 0 and m.fetch > 0 and m.build > 0 for m in sink.queries)
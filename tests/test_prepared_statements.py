@@ -0,0 +1,8 @@
+from capitaliq_xpressfeed_dbmanager.prepared_statements import to_numbered_placeholders
+
+
+def test_to_numbered_placeholders():
+    """Test conversion of psycopg2 placeholders into PostgreSQL ones"""
+    sql, count = to_numbered_placeholders("select * from t where a = %s and b = ANY(%s) -- 5%% of data")
+    assert sql == "select * from t where a = $1 and b = ANY($2) -- 5% of data"
+    assert count == 2
@@ -0,0 +1,79 @@
+import pandas as pd
+from capitaliq_xpressfeed_dbmanager import CachedDatabase
+from capitaliq_xpressfeed_dbmanager.query_cache import referenced_tables
+
+
+class CountingDatabase:
+    def __init__(self):
+        self.calls = 0
+
+    def query_all(self, query, params=()):
+        self.calls += 1
+        return pd.DataFrame({"dataitemid": [1, 2], "call": self.calls})
+
+    def close(self):
+        pass
+
+
+def test_referenced_tables():
+    """Test extraction of the tables a query reads"""
+    sql = "select * from ciqtradingitem t join targetskma.ciqCompany c on 1=1"
+    assert referenced_tables(sql) == {"ciqtradingitem", "ciqcompany"}
+
+
+def test_cache_hits_and_invalidation(tmp_path):
+    """Test that reference queries are served from the cache until invalidated"""
+    database = CountingDatabase()
+    cache = CachedDatabase(database, path=str(tmp_path / "cache.sqlite"))
+    sql = "select * from ciqdataitem where dataitemid = ANY(%s)"
+
+    first = cache.query_all(sql, ([1, 2],))
+    second = cache.query_all(sql, ([1, 2],))
+    pd.testing.assert_frame_equal(first, second)
+    assert database.calls == 1
+
+    cache.query_all(sql, ([3],))
+    assert database.calls == 2
+    assert cache.invalidate("ciqdataitem") == 2
+    cache.query_all(sql, ([1, 2],))
+    assert database.calls == 3
+
+
+def test_cache_skips_uncached_tables_and_expired_entries(tmp_path):
+    """Test that price queries bypass the cache and TTLs are honoured"""
+    database = CountingDatabase()
+    cache = CachedDatabase(database, path=str(tmp_path / "cache.sqlite"), ttls={"ciqdataitem": 0})
+    cache.query_all("select * from miadjprice")
+    cache.query_all("select * from miadjprice")
+    cache.query_all("select * from ciqdataitem")
+    cache.query_all("select * from ciqdataitem")
+    assert database.calls == 4
+
+
+def test_referenced_tables_skips_ctes_functions_and_keywords():
+    """Test CTE names, table functions and LATERAL are not reported as tables"""
+    from capitaliq_xpressfeed_dbmanager.db_task_manager import _market_cap_universe_sql
+
+    sql = ("WITH latest AS MATERIALIZED (SELECT * FROM ciqmarketcap) SELECT * FROM unnest(%s::date[]) AS d(x) "
+           "JOIN latest ON true JOIN LATERAL (SELECT 1 FROM ciqexchangerate) fx ON true")
+    assert referenced_tables(sql) == {"ciqmarketcap", "ciqexchangerate"}
+    sql, _ = _market_cap_universe_sql(["2024-01-31"], 1000, None, 3)
+    assert referenced_tables(sql) == {"ciqmarketcap", "ciqexchangerate", "ciqcompany", "ciqsecurity", "ciqtradingitem",
+                                      "ciqcurrency", "ciqexchange", "ciqcountrygeo"}
+
+
+def test_id_set_queries_are_cached(tmp_path):
+    """Test id set queries are cached and misses run as an id set on the wrapped database"""
+    class IdSetDatabase(CountingDatabase):
+        def query_id_set(self, query, params, id_param=0, run=None):
+            assert run is None
+            return self.query_all(query, params)
+
+    database = IdSetDatabase()
+    cache = CachedDatabase(database, path=str(tmp_path / "cache.sqlite"))
+    sql = "select * from ciqdataitem where dataitemid = ANY(%s)"
+    first = cache.query_id_set(sql, ([1, 2],), 0, run=lambda query, params: None)
+    pd.testing.assert_frame_equal(first, cache.query_id_set(sql, ([1, 2],)))
+    assert database.calls == 1
+    cache.query_id_set("select * from ciqtranscript where transcriptid = ANY(%s)", ([1],))
+    assert database.calls == 2
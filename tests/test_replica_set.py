@@ -0,0 +1,134 @@
+import pandas as pd
+import psycopg2
+import pytest
+from capitaliq_xpressfeed_dbmanager import CircuitOpenError, ReplicaSetDatabase
+
+
+class FakeDatabase:
+    down = set()
+    calls = []
+
+    def __init__(self, host, port, **kwargs):
+        if host in self.down:
+            raise psycopg2.OperationalError(f"could not connect to {host}")
+        self.host = host
+
+    def query_all(self, query, params=()):
+        if self.host in self.down:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        if query == "bad sql":
+            raise psycopg2.errors.SyntaxError()
+        self.calls.append(self.host)
+        if params:
+            return pd.DataFrame({"id": params[0], "host": self.host})
+        return self.host
+
+    def query_id_set(self, query, params, id_param=0, **kwargs):
+        self.calls.append(self.host)
+        return pd.DataFrame({"id": params[id_param], "host": self.host})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def make_replicas():
+    FakeDatabase.down = set()
+    FakeDatabase.calls = []
+
+    def _make(hosts=("a", "b", "c"), **kwargs):
+        return ReplicaSetDatabase("db", "user", hosts=hosts, factory=FakeDatabase, **kwargs)
+    return _make
+
+
+def test_round_robin(make_replicas):
+    """Test round-robin routing spreads queries evenly over the hosts"""
+    replicas = make_replicas()
+    results = [replicas.query_all("select 1") for _ in range(6)]
+    assert sorted(results) == ["a", "a", "b", "b", "c", "c"]
+    assert [s["queries"] for s in replicas.stats()] == [2, 2, 2]
+
+
+def test_failover_and_ejection(make_replicas):
+    """Test failed queries move to the next host and a failing host is ejected until it rejoins"""
+    replicas = make_replicas(eject_after=2, eject_seconds=0)
+    FakeDatabase.down = {"b"}
+    assert all(replicas.query_all("select 1") in ("a", "c") for _ in range(6))
+    assert "b" not in FakeDatabase.calls
+
+    # SQL errors are not failed over
+    with pytest.raises(psycopg2.errors.SyntaxError):
+        replicas.query_all("bad sql")
+
+    # with eject_seconds=0 the host is tried again and rejoins once it answers
+    FakeDatabase.down = set()
+    for _ in range(6):
+        replicas.query_all("select 1")
+    assert "b" in FakeDatabase.calls
+    assert replicas.stats()[1]["state"] == "closed"
+
+
+def test_unavailable_hosts(make_replicas):
+    """Test a down host at startup is skipped, and all hosts down raises"""
+    FakeDatabase.down = {"a"}
+    replicas = make_replicas(eject_after=1, eject_seconds=60)
+    assert not replicas.stats()[0]["connected"]
+    assert {replicas.query_all("select 1") for _ in range(4)} == {"b", "c"}
+
+    FakeDatabase.down = {"a", "b", "c"}
+    with pytest.raises(psycopg2.OperationalError):
+        make_replicas()
+    with pytest.raises(CircuitOpenError):
+        for _ in range(3):
+            try:
+                replicas.query_all("select 1")
+            except psycopg2.OperationalError:
+                pass
+
+
+def test_pinned(make_replicas):
+    """Test pinned blocks stay on one host and do not fail over"""
+    replicas = make_replicas()
+    with replicas.pinned() as host:
+        with replicas.pinned() as inner:
+            assert inner == host
+        assert {replicas.query_all("select 1") for _ in range(5)} == {host.split(":")[0]}
+        FakeDatabase.down = {host.split(":")[0]}
+        with pytest.raises(psycopg2.OperationalError):
+            replicas.query_all("select 1")
+
+
+def test_id_set_chunks_route_on_their_own(make_replicas):
+    """Test every chunk of an id set query runs once, on the endpoint it was routed to"""
+    replicas = make_replicas()
+    runs = []
+
+    def run(query, params):
+        # like the repository's runner, calls back into the replica set
+        runs.append(len(params[0]))
+        return replicas.query_all(query, params)
+
+    result = replicas.query_id_set("select = ANY(%s)", (list(range(7)),), chunksize=2, run=run)
+    assert runs == [2, 2, 2, 1]
+    assert result["id"].tolist() == list(range(7))
+    assert result["host"].tolist() == ["a", "a", "b", "b", "c", "c", "a"]
+    assert FakeDatabase.calls == ["a", "b", "c", "a"]
+    assert [s["queries"] for s in replicas.stats()] == [2, 1, 1]
+    assert [s["outstanding"] for s in replicas.stats()] == [0, 0, 0]
+
+    # a chunk failing on a down endpoint moves on alone
+    FakeDatabase.down = {"b"}
+    result = replicas.query_id_set("select = ANY(%s)", (list(range(4)),), chunksize=2)
+    assert set(result["host"]) <= {"a", "c"}
+    assert len(result) == 4
+
+    FakeDatabase.down = set()
+    FakeDatabase.calls = []
+    result = replicas.query_id_set("select = ANY(%s)", (list(range(4)),), strategy="temp_table", run=run)
+    assert FakeDatabase.calls == [result["host"][0]]
+
+
+def test_invalid_routing(make_replicas):
+    """Test an unknown routing policy is rejected"""
+    with pytest.raises(ValueError):
+        make_replicas(routing="random")
@@ -0,0 +1,143 @@
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import pytest
+from capitaliq_xpressfeed_dbmanager import CircuitBreaker, CircuitOpenError, PostgresDatabase, RetryPolicy
+from capitaliq_xpressfeed_dbmanager.resilience import call_with_retry, is_transient
+
+
+class Flaky:
+    """Callable raising the given errors first, then returning "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+
+class FakeConnection:
+    """Connection that passes the pool's health checks."""
+
+    def __init__(self, **kwargs):
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("capitaliq_xpressfeed_dbmanager.resilience.time.sleep", lambda seconds: None)
+
+
+def test_is_transient():
+    """Test connection failures and retryable SQLSTATEs are transient, timeouts and SQL errors are not"""
+    assert is_transient(psycopg2.OperationalError("server closed the connection unexpectedly"))
+    assert is_transient(psycopg2.errors.SerializationFailure())
+    assert is_transient(psycopg2.errors.AdminShutdown())
+    assert not is_transient(psycopg2.errors.QueryCanceled("canceling statement due to statement timeout"))
+    assert not is_transient(psycopg2.errors.UndefinedTable())
+    assert not is_transient(ValueError())
+
+
+def test_retry_policy_delays():
+    """Test the jittered backoff stays within the exponential bound"""
+    delays = list(RetryPolicy(attempts=5, base_delay=0.1, max_delay=0.3).delays())
+    assert len(delays) == 4
+    assert all(0 <= d <= bound for d, bound in zip(delays, [0.1, 0.2, 0.3, 0.3]))
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+def test_call_with_retry():
+    """Test transient errors are retried up to the policy and other errors raised at once"""
+    func = Flaky(psycopg2.OperationalError(), psycopg2.errors.DeadlockDetected())
+    assert call_with_retry(func, RetryPolicy(attempts=3)) == "ok"
+    assert func.calls == 3
+
+    func = Flaky(psycopg2.OperationalError(), psycopg2.OperationalError())
+    with pytest.raises(psycopg2.OperationalError):
+        call_with_retry(func, RetryPolicy(attempts=2))
+    assert func.calls == 2
+
+    func = Flaky(psycopg2.errors.QueryCanceled("canceling statement due to statement timeout"))
+    with pytest.raises(psycopg2.errors.QueryCanceled):
+        call_with_retry(func, RetryPolicy(attempts=3))
+    assert func.calls == 1
+
+
+def test_circuit_breaker(monkeypatch):
+    """Test the breaker opens after consecutive failures, fails fast, and closes after a good trial call"""
+    now = [0.0]
+    monkeypatch.setattr("capitaliq_xpressfeed_dbmanager.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    once = RetryPolicy(attempts=1)
+
+    # a SQL error proves the server is up and resets the failure count
+    for error in (psycopg2.OperationalError(), psycopg2.errors.UndefinedTable(), psycopg2.OperationalError()):
+        with pytest.raises(psycopg2.Error):
+            call_with_retry(Flaky(error), once, breaker)
+    assert breaker.state == "closed"
+
+    with pytest.raises(psycopg2.errors.QueryCanceled):
+        call_with_retry(Flaky(psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")),
+                        once, breaker)
+    assert breaker.state == "open"
+    func = Flaky()
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(func, once, breaker)
+    assert func.calls == 0
+
+    # failed trial call opens the circuit again, a good one closes it
+    now[0] = 11
+    assert breaker.state == "half_open"
+    with pytest.raises(psycopg2.OperationalError):
+        call_with_retry(Flaky(psycopg2.OperationalError()), once, breaker)
+    assert breaker.state == "open"
+    now[0] = 22
+    assert call_with_retry(func, once, breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_connection_returns_to_pool(monkeypatch):
+    """Test PostgresDatabase keeps pooled connections after cancels and timeouts, but discards lost ones"""
+    monkeypatch.setattr(psycopg2, "connect", FakeConnection)
+    database = PostgresDatabase("db", "user", pool=True, pool_minsize=1, pool_maxsize=1)
+
+    with pytest.raises(psycopg2.errors.QueryCanceled):
+        with database.get_connection() as conn:
+            raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+    with database.get_connection() as again:
+        assert again is conn
+    assert conn.closed == 0
+
+    with pytest.raises(psycopg2.OperationalError):
+        with database.get_connection() as conn:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+    assert conn.closed == 1
+    assert database.pool.stats()["size"] == 0
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import SecurityIndex
+
+
+class FakeDatabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def query_all(self, query, params=()):
+        self.queries.append(params)
+        rows = self.rows if not params else [r for r in self.rows if r[0] in params[0]]
+        return pd.DataFrame(rows, columns=["tickersymbol", "countrycode", "companyid", "securityid", "tradingitemid",
+                                           "companyname", "exchangeid", "currencyid", "tradingitemstatusid"])
+
+
+ROWS = [
+    ("AAA", "US", 1, 10, 100, "Alpha", 1, 160, 15),
+    ("BBB", "CA", 2, 20, 200, "Beta", 2, 22, 15),
+    ("BBB", "GB", 3, 30, 300, "Beta UK", 3, 134, 15),
+]
+
+
+def test_lookup_and_ambiguity():
+    """Test single lookups and the get_metadata_info error semantics"""
+    index = SecurityIndex(FakeDatabase(ROWS))
+    assert len(index) == 3
+    assert index.get_companyid("AAA", "US") == 1
+    assert index.lookup("BBB", "GB")["tradingitemid"] == 300
+    with pytest.raises(Exception, match="Multiple or no security found for BBB"):
+        index.lookup("BBB", "all")
+    with pytest.raises(Exception, match="Multiple or no security found for CCC"):
+        index.lookup("CCC", "US")
+
+
+def test_lookup_many_and_refresh():
+    """Test batch lookups and refreshing a subset of tickers"""
+    database = FakeDatabase(ROWS)
+    index = SecurityIndex(database)
+    df = index.lookup_many(["AAA", ("BBB", "CA"), "CCC"], country="US", errors="ignore")
+    assert df["companyid"].tolist() == [1, 2]
+    assert df["ticker"].tolist() == ["AAA", "BBB"]
+
+    database.rows = ROWS + [("CCC", "US", 4, 40, 400, "Gamma", 1, 160, 15)]
+    index.refresh(["CCC"])
+    assert database.queries[-1] == (["CCC"],)
+    assert len(index) == 4
+    assert index.get_companyid("CCC", "US") == 4
+
+
+def test_refresh_before_load_loads_everything():
+    """Test a partial refresh of an index that was never loaded does a full load"""
+    database = FakeDatabase(ROWS)
+    index = SecurityIndex(database, load=False)
+    index.refresh(["AAA"])
+    assert database.queries == [()]
+    assert index.get_companyid("BBB", "CA") == 2
+
+
+def test_country_matches_get_security_info():
+    """Test countries are matched exactly like get_security_info, without case folding"""
+    index = SecurityIndex(FakeDatabase(ROWS))
+    assert index.get_companyid("AAA", "US") == 1
+    with pytest.raises(Exception, match="Multiple or no security found for AAA"):
+        index.lookup("AAA", "us")
@@ -0,0 +1,80 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+from capitaliq_xpressfeed_dbmanager import TaskManagerRepository
+from capitaliq_xpressfeed_dbmanager.transcript_export import TRANSCRIPT_COLUMNS, write_transcripts
+
+
+def transcript(transcriptid, n, personid=None):
+    return pd.DataFrame({
+        "transcriptcomponentid": range(transcriptid * 10, transcriptid * 10 + n),
+        "transcriptid": transcriptid,
+        "componentorder": range(1, n + 1),
+        "transcriptcomponenttypeid": 2,
+        "transcriptpersonid": personid,
+        "componenttext": [f"text {i}" for i in range(n)],
+        "transcriptcomponenttypename": "Question",
+        "transcriptpersonname": None,
+        "speakertypename": "Analysts",
+        "title": None,
+    })
+
+
+class StreamingDatabase:
+    """Streams the components of the requested transcripts in chunks, like a server-side cursor."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.queries = []
+
+    def query_iter(self, query, params=(), chunksize=10000):
+        ids = params[0]
+        self.queries.append(ids)
+        df = pd.concat([transcript(i, self.sizes.get(i, 0)) for i in sorted(ids)], ignore_index=True)
+        if df.empty:
+            yield df
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize].reset_index(drop=True)
+
+
+def test_iter_transcripts_across_chunk_boundaries():
+    """Test each transcript is yielded whole, once and in id order, whatever the id and row chunking"""
+    database = StreamingDatabase({1: 3, 2: 1, 3: 4, 5: 2})
+    repository = TaskManagerRepository(database)
+    transcripts = list(repository.iter_transcripts([5, 3, 1, 2, 3, 4], id_chunksize=2, chunksize=2))
+
+    assert database.queries == [[1, 2], [3, 4], [5]]
+    assert [df["transcriptid"].iloc[0] for df in transcripts] == [1, 2, 3, 5]
+    assert [len(df) for df in transcripts] == [3, 1, 4, 2]
+    assert all(df["componentorder"].tolist() == list(range(1, len(df) + 1)) for df in transcripts)
+    assert all(df.index.tolist() == list(range(len(df))) for df in transcripts)
+
+    # a single row per round trip and all ids in one query
+    transcripts = list(repository.iter_transcripts([1, 2, 3], id_chunksize=10, chunksize=1))
+    assert [len(df) for df in transcripts] == [3, 1, 4]
+    assert list(repository.iter_transcripts([9])) == []
+
+
+def test_write_jsonl_gz(tmp_path):
+    """Test that each transcript becomes one JSON line with its components"""
+    path = str(tmp_path / "transcripts.jsonl.gz")
+    assert write_transcripts(iter([transcript(1, 2, 7), transcript(2, 3)]), path) == 2
+    with gzip.open(path, "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["transcriptid"] for r in records] == [1, 2]
+    assert [c["componentorder"] for c in records[1]["components"]] == [1, 2, 3]
+    assert records[0]["components"][0]["transcriptpersonid"] == 7
+    assert records[1]["components"][0]["transcriptpersonid"] is None
+
+
+def test_write_parquet(tmp_path):
+    """Test that components are written with a fixed schema across row groups"""
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "transcripts.parquet")
+    assert write_transcripts(iter([transcript(1, 2), transcript(2, 3, 7)]), path) == 2
+    df = pd.read_parquet(path)
+    assert list(df.columns) == list(TRANSCRIPT_COLUMNS)
+    assert df["transcriptid"].tolist() == [1, 1, 2, 2, 2]
+    assert df["transcriptpersonid"].isna().sum() == 2
@@ -0,0 +1,52 @@
+import pandas as pd
+from capitaliq_xpressfeed_dbmanager import TranscriptSync
+
+
+class FakeRepository:
+    def __init__(self, transcripts):
+        self.transcripts = transcripts
+        self.calls = []
+
+    def get_companies_transcriptsid(self, companyids, last_refresh_day, after_transcriptids=None, chunksize=1000):
+        self.calls.append((companyids, last_refresh_day, after_transcriptids))
+        frames = []
+        for companyid, since, after in zip(companyids, last_refresh_day, after_transcriptids):
+            df = self.transcripts[self.transcripts["companyid"] == companyid]
+            since = pd.Timestamp(since)
+            newer = df["transcriptcreationdateutc"] > since
+            if after is not None:
+                newer |= (df["transcriptcreationdateutc"] == since) & (df["transcriptid"] > after)
+            frames.append(df[newer])
+        return pd.concat(frames, ignore_index=True)
+
+
+def transcripts(rows):
+    return pd.DataFrame(rows, columns=["transcriptid", "transcriptcreationdateutc", "companyid", "keydevid"])
+
+
+def test_sync_only_fetches_new_transcripts(tmp_path):
+    """Test that marks are persisted and later syncs only return newer transcripts"""
+    now = pd.Timestamp.now().floor("s")
+    repository = FakeRepository(transcripts([
+        (1, now - pd.Timedelta(days=10), 100, 11),
+        (2, now - pd.Timedelta(days=5), 100, 12),
+        (3, now - pd.Timedelta(days=4), 200, 21),
+    ]))
+    path = str(tmp_path / "state.json")
+
+    assert TranscriptSync(repository, path).sync([100, 200])["transcriptid"].tolist() == [1, 2, 3]
+    sync = TranscriptSync(repository, path)
+    assert sync.state.get(100) == (now - pd.Timedelta(days=5), 2)
+    assert sync.sync([100, 200]).empty
+
+    # a revised transcript of keydevid 12 and a same-timestamp transcript with a higher id
+    repository.transcripts = pd.concat([repository.transcripts, transcripts([
+        (4, now - pd.Timedelta(days=1), 100, 12),
+        (5, now - pd.Timedelta(days=4), 200, 22),
+    ])], ignore_index=True)
+    new = sync.fetch([100, 200])
+    assert new["transcriptid"].tolist() == [4, 5]
+    assert len(repository.calls) == 3
+    assert sync.state.get(100)[1] == 2
+    sync.commit(new)
+    assert TranscriptSync(repository, path).state.get(100)[1] == 4